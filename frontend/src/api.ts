@@ -7,10 +7,40 @@ const API = axios.create({
   },
 });
 
+// Query parameters accepted by the paginated list endpoints
+export interface ListParams {
+  cursor?: string;
+  limit?: number;
+  status?: string;
+  hospital_number?: string;
+  name_contains?: string;
+  hospital_number_contains?: string;
+  hospital_id?: string;
+  created_from?: string;
+  created_to?: string;
+}
+
+export interface Page<T = any> {
+  items: T[];
+  next_cursor: string | null;
+}
+
+export const PAGE_SIZE = 50;
+
+// Fetch one page of a list endpoint; pass the previous page's next_cursor to continue
+export const fetchPage = async <T = any>(
+  list: (params?: ListParams) => Promise<{ data: Page<T> }>,
+  cursor?: string | null,
+  params: ListParams = {}
+): Promise<Page<T>> => {
+  const res = await list({ limit: PAGE_SIZE, ...params, cursor: cursor ?? undefined });
+  return res.data;
+};
+
 // Donor endpoints
 export const donors = {
   create: (data: { donor_code: string }) => API.post('/donors', data),
-  list: () => API.get('/donors'),
+  list: (params?: ListParams) => API.get<Page>('/donors', { params }),
   get: (id: string) => API.get(`/donors/${id}`),
   update: (id: string, data: any) => API.put(`/donors/${id}`, data),
   approve: (id: string, data: { approver_id: string }) =>
@@ -27,7 +57,7 @@ export const donations = {
     number_of_bottles: number;
     notes?: string;
   }) => API.post('/donations', data),
-  list: () => API.get('/donations'),
+  list: (params?: ListParams) => API.get<Page>('/donations', { params }),
   getById: (donationId: string) => API.get(`/donations/by-id/${donationId}`),
   listUnacknowledged: () => API.get('/donations/unacknowledged'),
   get: (id: string) => API.get(`/donations/${id}`),
@@ -41,7 +71,7 @@ export const batches = {
     batch_code: string;
     user_id: string;
   }) => API.post('/batches', data),
-  list: () => API.get('/batches'),
+  list: (params?: ListParams) => API.get<Page>('/batches', { params }),
   get: (id: string) => API.get(`/batches/${id}`),
   getNextCode: (baseCode: string) => API.get(`/batches/next-code/${baseCode}`),
   getLabelsZpl: (id: string) => API.get(`/batches/${id}/labels/zpl`, { responseType: 'text' }),
@@ -92,7 +122,7 @@ export const samples = {
 
 // Bottle endpoints
 export const bottles = {
-  list: () => API.get('/bottles'),
+  list: (params?: ListParams) => API.get<Page>('/bottles', { params }),
   get: (id: string) => API.get(`/bottles/${id}`),
   allocate: (id: string, data: { patient_id: string; allocated_by: string }) =>
     API.post(`/bottles/${id}/allocate`, data),
@@ -123,7 +153,7 @@ export const dispatches = {
     created_by: string;
     shipper?: string;
   }) => API.post('/dispatches', data),
-  list: () => API.get('/dispatches'),
+  list: (params?: ListParams) => API.get<Page>('/dispatches', { params }),
   get: (id: string) => API.get(`/dispatches/${id}`),
   scan: (id: string, data: { barcode: string; user_id: string; scan_type: 'out' | 'in' }) =>
     API.post(`/dispatches/${id}/scan`, data),
@@ -136,6 +166,11 @@ export const dispatches = {
   exportPDF: (id: string) => API.get(`/dispatches/${id}/manifest/pdf`, { responseType: 'blob' }),
 };
 
+// Dashboard statistics
+export const stats = {
+  dashboard: () => API.get('/stats/dashboard'),
+};
+
 export const printers = {
   discover: () => API.get('/printers/discover'),
   configure: (data: { name: string; connection_type: string; address: string; port?: number; timeout?: number }) => 
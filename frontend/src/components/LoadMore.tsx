@@ -0,0 +1,21 @@
+import React from 'react';
+
+// "Load more" footer for keyset-paginated lists; hidden on the last page
+export const LoadMore: React.FC<{ cursor: string | null; loading: boolean; onLoadMore: () => void }> = ({
+  cursor,
+  loading,
+  onLoadMore,
+}) => {
+  if (!cursor) return null;
+  return (
+    <div className="p-4 text-center border-t">
+      <button
+        onClick={onLoadMore}
+        disabled={loading}
+        className="px-4 py-2 bg-blue-600 text-white rounded-lg hover:bg-blue-700 disabled:opacity-50"
+      >
+        {loading ? 'Loading...' : 'Load more'}
+      </button>
+    </div>
+  );
+};
@@ -1,5 +1,6 @@
 import { useState, useEffect } from 'react';
-import { batches, donations } from '../api';
+import { batches, donations, fetchPage } from '../api';
+import { LoadMore } from '../components/LoadMore';
 import { Plus, AlertCircle } from 'lucide-react';
 import { Link } from 'react-router-dom';
 
@@ -18,6 +19,8 @@ export const BatchList: React.FC = () => {
   const [batchList, setBatchList] = useState<Batch[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [recentDonations, setRecentDonations] = useState<Array<{ id: string; donation_id?: string; donation_date?: string }>>([]);
 
   useEffect(() => {
@@ -28,8 +31,9 @@ export const BatchList: React.FC = () => {
   const loadBatches = async () => {
     try {
       setLoading(true);
-      const res = await batches.list();
-      setBatchList(res.data || []);
+      const page = await fetchPage(batches.list);
+      setBatchList(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load batches');
     } finally {
@@ -37,28 +41,24 @@ export const BatchList: React.FC = () => {
     }
   };
 
+  const loadMoreBatches = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(batches.list, nextCursor);
+      setBatchList((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to load more batches');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const loadRecentDonations = async () => {
     try {
-      const [donationsRes, batchesRes] = await Promise.all([
-        donations.list(),
-        batches.list()
-      ]);
-      
-      const items: any[] = donationsRes.data || [];
-      const batchList: any[] = batchesRes.data || [];
-      
-      // Collect all donation IDs that are already in batches
-      const usedDonationIds = new Set<string>();
-      batchList.forEach(batch => {
-        if (batch.donation_ids && Array.isArray(batch.donation_ids)) {
-          batch.donation_ids.forEach((id: string) => usedDonationIds.add(id));
-        }
-      });
-      
-      // Filter out donations that are already used in batches
-      const availableDonations = items.filter(d => 
-        !usedDonationIds.has(d.donation_id) && !usedDonationIds.has(d.id)
-      );
+      // Donations already used in a batch move out of Accepted, so filter server-side
+      const donationsRes = await donations.list({ status: 'Accepted', limit: 10 });
+      const availableDonations: any[] = donationsRes.data.items || [];
       
       // Take last 10 by donation_date desc if available
       const sorted = availableDonations
@@ -179,6 +179,7 @@ export const BatchList: React.FC = () => {
             </tbody>
           </table>
         )}
+        {!loading && <LoadMore cursor={nextCursor} loading={loadingMore} onLoadMore={loadMoreBatches} />}
       </div>
     </div>
   );
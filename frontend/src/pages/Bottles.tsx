@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { bottles } from '../api';
+import { bottles, fetchPage } from '../api';
+import { LoadMore } from '../components/LoadMore';
 import { Droplets, Clock, User, Snowflake, CheckCircle, Trash2, XCircle } from 'lucide-react';
 
 interface Bottle {
@@ -24,6 +25,8 @@ export const BottleList: React.FC = () => {
   const [bottleList, setBottleList] = useState<Bottle[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [actionBottleId, setActionBottleId] = useState<string | null>(null);
   const [showAllocateModal, setShowAllocateModal] = useState(false);
   const [showDiscardModal, setShowDiscardModal] = useState(false);
@@ -39,8 +42,9 @@ export const BottleList: React.FC = () => {
   const loadBottles = async () => {
     try {
       setLoading(true);
-      const res = await bottles.list();
-      setBottleList(res.data || []);
+      const page = await fetchPage(bottles.list);
+      setBottleList(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load bottles');
     } finally {
@@ -48,6 +52,19 @@ export const BottleList: React.FC = () => {
     }
   };
 
+  const loadMoreBottles = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(bottles.list, nextCursor);
+      setBottleList((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to load more bottles');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleAllocate = async () => {
     if (!selectedBottle || !patientId) return;
     
@@ -260,6 +277,7 @@ export const BottleList: React.FC = () => {
               </tbody>
             </table>
           </div>
+          <LoadMore cursor={nextCursor} loading={loadingMore} onLoadMore={loadMoreBottles} />
         </div>
       )}
 
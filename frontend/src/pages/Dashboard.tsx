@@ -10,7 +10,7 @@ import {
   Check,
 } from 'lucide-react';
 import { Link } from 'react-router-dom';
-import { donors, batches, dispatches, donations } from '../api';
+import { donations, stats as statsApi } from '../api';
 import { VERSION, LAST_UPDATED } from '../version';
 
 interface DashboardStats {
@@ -56,18 +56,15 @@ export const Dashboard: React.FC = () => {
   useEffect(() => {
     const loadStats = async () => {
       try {
-        const [donorRes, batchRes, dispatchRes] = await Promise.all([
-          donors.list(),
-          batches.list(),
-          dispatches.list(),
-        ]);
+        const { data } = await statsApi.dashboard();
+        const batchCounts = data.batches.counts;
 
         setStats({
-          totalDonors: donorRes.data.length || 0,
-          activeBatches: batchRes.data.filter((b: any) => b.status === 'Pasteurising' || b.status === 'Tested').length || 0,
-          pendingApprovals: batchRes.data.filter((b: any) => b.status === 'MicroTestPending').length || 0,
-          dispatchedItems: dispatchRes.data.filter((d: any) => d.status === 'Delivered').length || 0,
-          recentActivity: `${donorRes.data.length} donors registered`,
+          totalDonors: data.donors.total || 0,
+          activeBatches: (batchCounts.Pasteurising || 0) + (batchCounts.Tested || 0),
+          pendingApprovals: batchCounts.MicroTestPending || 0,
+          dispatchedItems: data.dispatches.counts.Delivered || 0,
+          recentActivity: `${data.donors.total} donors registered`,
         });
 
         await loadNewDonations();
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { dispatches } from '../api';
+import { dispatches, fetchPage } from '../api';
+import { LoadMore } from '../components/LoadMore';
 import { Plus, FileDown } from 'lucide-react';
 import { Link } from 'react-router-dom';
 
@@ -16,6 +17,8 @@ export const DispatchList: React.FC = () => {
   const [dispatchList, setDispatchList] = useState<Dispatch[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
 
   useEffect(() => {
     loadDispatches();
@@ -24,8 +27,9 @@ export const DispatchList: React.FC = () => {
   const loadDispatches = async () => {
     try {
       setLoading(true);
-      const res = await dispatches.list();
-      setDispatchList(res.data || []);
+      const page = await fetchPage(dispatches.list);
+      setDispatchList(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load dispatches');
     } finally {
@@ -33,6 +37,19 @@ export const DispatchList: React.FC = () => {
     }
   };
 
+  const loadMoreDispatches = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(dispatches.list, nextCursor);
+      setDispatchList((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to load more dispatches');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const getStatusColor = (status: string) => {
     switch (status) {
       case 'Delivered':
@@ -127,6 +144,7 @@ export const DispatchList: React.FC = () => {
             </tbody>
           </table>
         )}
+        {!loading && <LoadMore cursor={nextCursor} loading={loadingMore} onLoadMore={loadMoreDispatches} />}
       </div>
     </div>
   );
@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
-import { donors } from '../api';
+import { donors, fetchPage } from '../api';
+import { LoadMore } from '../components/LoadMore';
 import { CheckCircle, Plus, Search, PlusCircle } from 'lucide-react';
 import { Link } from 'react-router-dom';
 
@@ -20,19 +21,30 @@ export const DonorList: React.FC = () => {
   const [donorList, setDonorList] = useState<Donor[]>([]);
   const [loading, setLoading] = useState(true);
   const [error, setError] = useState('');
+  const [nextCursor, setNextCursor] = useState<string | null>(null);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [searchName, setSearchName] = useState('');
   const [searchHospital, setSearchHospital] = useState('');
   const [approving, setApproving] = useState<string | null>(null);
 
+  // Search runs on the server, so it covers every donor, not just the loaded pages
+  const searchParams = () => ({
+    name_contains: searchName.trim() || undefined,
+    hospital_number_contains: searchHospital.trim() || undefined,
+  });
+
   useEffect(() => {
-    loadDonors();
-  }, []);
+    // Restart from the first page when the search changes, once typing pauses
+    const timer = setTimeout(loadDonors, 300);
+    return () => clearTimeout(timer);
+  }, [searchName, searchHospital]);
 
   const loadDonors = async () => {
     try {
       setLoading(true);
-      const res = await donors.list();
-      setDonorList(res.data || []);
+      const page = await fetchPage(donors.list, null, searchParams());
+      setDonorList(page.items);
+      setNextCursor(page.next_cursor);
     } catch (err: any) {
       setError(err.response?.data?.detail || 'Failed to load donors');
     } finally {
@@ -40,6 +52,19 @@ export const DonorList: React.FC = () => {
     }
   };
 
+  const loadMoreDonors = async () => {
+    try {
+      setLoadingMore(true);
+      const page = await fetchPage(donors.list, nextCursor, searchParams());
+      setDonorList((prev) => [...prev, ...page.items]);
+      setNextCursor(page.next_cursor);
+    } catch (err: any) {
+      setError(err.response?.data?.detail || 'Failed to load more donors');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   const handleApproveDonor = async (donorId: string) => {
     try {
       setApproving(donorId);
@@ -66,20 +91,6 @@ export const DonorList: React.FC = () => {
     }
   };
 
-  const filteredDonors = donorList.filter(donor => {
-    const nameMatch = (donor.first_name || '')
-      .toLowerCase()
-      .includes(searchName.toLowerCase()) ||
-      (donor.last_name || '')
-        .toLowerCase()
-        .includes(searchName.toLowerCase());
-    const hospitalMatch = (donor.hospital_number || '')
-      .toLowerCase()
-      .includes(searchHospital.toLowerCase());
-    
-    return (!searchName || nameMatch) && (!searchHospital || hospitalMatch);
-  });
-
   return (
     <div>
       <div className="flex flex-col sm:flex-row justify-between items-start sm:items-center mb-6 gap-3">
@@ -129,7 +140,7 @@ export const DonorList: React.FC = () => {
         </div>
         {(searchName || searchHospital) && (
           <div className="mt-3 text-xs lg:text-sm text-gray-600">
-            Found {filteredDonors.length} donor{filteredDonors.length !== 1 ? 's' : ''}
+            Found {donorList.length}{nextCursor ? '+' : ''} donor{donorList.length !== 1 ? 's' : ''}
           </div>
         )}
       </div>
@@ -138,9 +149,9 @@ export const DonorList: React.FC = () => {
       <div className="bg-white rounded-lg shadow overflow-hidden">
         {loading ? (
           <div className="p-6 lg:p-8 text-center text-sm lg:text-base text-gray-600">Loading donors...</div>
-        ) : filteredDonors.length === 0 ? (
+        ) : donorList.length === 0 ? (
           <div className="p-6 lg:p-8 text-center text-sm lg:text-base text-gray-600">
-            {donorList.length === 0 ? 'No donors found' : 'No donors match your search'}
+            {searchName || searchHospital ? 'No donors match your search' : 'No donors found'}
           </div>
         ) : (
           <>
@@ -160,7 +171,7 @@ export const DonorList: React.FC = () => {
               </tr>
             </thead>
             <tbody>
-              {filteredDonors.map((donor, idx) => (
+              {donorList.map((donor, idx) => (
                 <tr key={idx} className={`border-b hover:bg-gray-50 ${donor.status === 'Approved' ? 'bg-green-50' : ''}`}>
                   <td className="px-6 py-4 text-sm">
                     <Link
@@ -234,7 +245,7 @@ export const DonorList: React.FC = () => {
 
             {/* Mobile card view */}
             <div className="md:hidden divide-y">
-              {filteredDonors.map((donor) => (
+              {donorList.map((donor) => (
                 <div key={donor.id} className={`p-4 ${donor.status === 'Approved' ? 'bg-green-50' : ''}`}>
                   <div className="flex items-start justify-between mb-3">
                     <div>
@@ -316,6 +327,7 @@ export const DonorList: React.FC = () => {
             </div>
           </>
         )}
+        {!loading && <LoadMore cursor={nextCursor} loading={loadingMore} onLoadMore={loadMoreDonors} />}
       </div>
     </div>
   );
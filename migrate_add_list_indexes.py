@@ -0,0 +1,72 @@
+#!/usr/bin/env python3
+"""
+Migration script for keyset-paginated list endpoints.
+Adds bottles.created_at (backfilled from the parent batch) and the
+(created_at, id) indexes the list endpoints page through.
+Run this once to update your existing database schema.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+cursor.execute("PRAGMA table_info(bottles)")
+columns = {row[1] for row in cursor.fetchall()}
+
+migrations_needed = []
+
+if 'created_at' not in columns:
+    migrations_needed.append("ALTER TABLE bottles ADD COLUMN created_at TIMESTAMP")
+    # Existing bottles take their batch's creation time
+    migrations_needed.append(
+        "UPDATE bottles SET created_at = "
+        "COALESCE((SELECT batches.created_at FROM batches WHERE batches.id = bottles.batch_id), CURRENT_TIMESTAMP) "
+        "WHERE created_at IS NULL"
+    )
+
+migrations_needed.extend([
+    "CREATE INDEX IF NOT EXISTS ix_donors_created_at_id ON donors (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_donation_records_created_at_id ON donation_records (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_batches_created_at_id ON batches (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_bottles_created_at_id ON bottles (created_at, id)",
+    "CREATE INDEX IF NOT EXISTS ix_bottles_batch_id ON bottles (batch_id)",
+    "CREATE INDEX IF NOT EXISTS ix_dispatches_created_at_id ON dispatches (created_at, id)",
+])
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
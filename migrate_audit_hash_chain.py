@@ -0,0 +1,105 @@
+#!/usr/bin/env python3
+"""
+Migration script for the hash-chained audit log.
+Adds audit_events.seq/prev_hash/hash and the audit_chain_state table, then
+chains any existing events in timestamp order. Run this once to update your
+existing database schema; re-running only chains events still missing a seq.
+"""
+import json
+import sqlite3
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+from src.app.audit import event_hash, GENESIS_HASH, CHAIN_STATE_ID
+
+CHUNK_SIZE = 1000
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path, timeout=30)
+conn.row_factory = sqlite3.Row
+cursor = conn.cursor()
+
+cursor.execute("PRAGMA table_info(audit_events)")
+columns = {row[1] for row in cursor.fetchall()}
+
+try:
+    if 'seq' not in columns:
+        cursor.execute("ALTER TABLE audit_events ADD COLUMN seq INTEGER")
+    if 'prev_hash' not in columns:
+        cursor.execute("ALTER TABLE audit_events ADD COLUMN prev_hash VARCHAR")
+    if 'hash' not in columns:
+        cursor.execute("ALTER TABLE audit_events ADD COLUMN hash VARCHAR")
+    cursor.execute("CREATE UNIQUE INDEX IF NOT EXISTS ix_audit_events_seq ON audit_events (seq)")
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS audit_chain_state ("
+        "id INTEGER NOT NULL PRIMARY KEY, last_seq INTEGER NOT NULL, last_hash VARCHAR NOT NULL, "
+        "verified_seq INTEGER NOT NULL, verified_hash VARCHAR NOT NULL, verified_at TIMESTAMP)"
+    )
+    cursor.execute(
+        "INSERT OR IGNORE INTO audit_chain_state (id, last_seq, last_hash, verified_seq, verified_hash) "
+        "VALUES (?, 0, ?, 0, ?)",
+        (CHAIN_STATE_ID, GENESIS_HASH, GENESIS_HASH),
+    )
+    conn.commit()
+
+    chained = 0
+    while True:
+        # BEGIN IMMEDIATE so the API cannot append to the chain between reading the head and writing
+        cursor.execute("BEGIN IMMEDIATE")
+        cursor.execute("SELECT last_seq, last_hash FROM audit_chain_state WHERE id = ?", (CHAIN_STATE_ID,))
+        seq, prev_hash = cursor.fetchone()
+        cursor.execute(
+            "SELECT * FROM audit_events WHERE seq IS NULL ORDER BY timestamp, id LIMIT ?",
+            (CHUNK_SIZE,),
+        )
+        chunk = cursor.fetchall()
+        if not chunk:
+            conn.commit()
+            break
+        updates = []
+        for event in chunk:
+            row = dict(event)
+            row["before"] = json.loads(row["before"]) if row["before"] is not None else None
+            row["after"] = json.loads(row["after"]) if row["after"] is not None else None
+            seq += 1
+            row["seq"] = seq
+            row["prev_hash"] = prev_hash
+            prev_hash = event_hash(row)
+            updates.append((seq, row["prev_hash"], prev_hash, row["id"]))
+        cursor.executemany("UPDATE audit_events SET seq = ?, prev_hash = ?, hash = ? WHERE id = ?", updates)
+        cursor.execute(
+            "UPDATE audit_chain_state SET last_seq = ?, last_hash = ? WHERE id = ?",
+            (seq, prev_hash, CHAIN_STATE_ID),
+        )
+        conn.commit()
+        chained += len(updates)
+        print(f"   Chained events up to seq {seq}")
+
+    print(f"\n✅ Audit hash chain migration complete: {chained} existing event(s) chained")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
@@ -0,0 +1,63 @@
+#!/usr/bin/env python3
+"""
+Migration script for the audit trail query API.
+Adds the composite audit_events indexes and the audit_events_archive table
+that audit.archive_events moves old events into.
+Run this after migrate_audit_hash_chain.py.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+migrations_needed = [
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_entity_ts ON audit_events (entity_type, entity_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_user_ts ON audit_events (user_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_operation_ts ON audit_events (operation, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_timestamp_id ON audit_events (timestamp, id)",
+    "CREATE TABLE IF NOT EXISTS audit_events_archive ("
+    "id VARCHAR NOT NULL PRIMARY KEY, timestamp DATETIME, user_id VARCHAR, operation VARCHAR, "
+    "entity_type VARCHAR, entity_id VARCHAR, before JSON, after JSON, reason VARCHAR, "
+    "seq INTEGER, prev_hash VARCHAR, hash VARCHAR)",
+    "CREATE UNIQUE INDEX IF NOT EXISTS ix_audit_events_archive_seq ON audit_events_archive (seq)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_archive_entity_ts ON audit_events_archive (entity_type, entity_id, timestamp)",
+    "CREATE INDEX IF NOT EXISTS ix_audit_events_archive_timestamp_id ON audit_events_archive (timestamp, id)",
+]
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Migration script creating the audit_wal_commits table. With AUDIT_WAL_PATH
+set, each committing transaction writes its audit rows to the WAL first and
+a marker row here; the drainer only copies rows whose marker exists.
+Safe to re-run.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+migrations_needed = [
+    "CREATE TABLE IF NOT EXISTS audit_wal_commits (txn_id VARCHAR NOT NULL PRIMARY KEY, created_at TIMESTAMP)",
+]
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
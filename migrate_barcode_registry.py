@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Migration script creating the barcode_registry table behind /api/scan/{code}
+and registering every existing bottle, sample, batch and dispatch code,
+plus the {batch_code}-{n} label code of each batch's bottles.
+Safe to re-run: existing registry rows are left alone.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+migrations_needed = [
+    "CREATE TABLE IF NOT EXISTS barcode_registry ("
+    "code VARCHAR NOT NULL, entity_type VARCHAR NOT NULL, entity_id VARCHAR NOT NULL, label_number INTEGER, "
+    "PRIMARY KEY (code, entity_type))",
+    "CREATE INDEX IF NOT EXISTS ix_barcode_registry_entity ON barcode_registry (entity_type, entity_id)",
+    "INSERT OR IGNORE INTO barcode_registry (code, entity_type, entity_id) "
+    "SELECT barcode, 'bottle', id FROM bottles WHERE barcode IS NOT NULL",
+    "INSERT OR IGNORE INTO barcode_registry (code, entity_type, entity_id) "
+    "SELECT sample_barcode, 'sample', id FROM samples WHERE sample_barcode IS NOT NULL",
+    "INSERT OR IGNORE INTO barcode_registry (code, entity_type, entity_id) "
+    "SELECT batch_code, 'batch', id FROM batches WHERE batch_code IS NOT NULL",
+    "INSERT OR IGNORE INTO barcode_registry (code, entity_type, entity_id) "
+    "SELECT dispatch_code, 'dispatch', id FROM dispatches WHERE dispatch_code IS NOT NULL",
+    "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n "
+    "WHERE i < (SELECT MAX(COALESCE(number_of_bottles, 1)) FROM batches)) "
+    "INSERT OR IGNORE INTO barcode_registry (code, entity_type, entity_id, label_number) "
+    "SELECT batches.batch_code || '-' || n.i, 'label', batches.id, n.i FROM batches "
+    "JOIN n ON n.i <= COALESCE(batches.number_of_bottles, 1) WHERE batches.batch_code IS NOT NULL",
+]
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
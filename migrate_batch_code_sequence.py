@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Migration script to add the parsed (base_code, code_seq) columns to batches.
+Backfills them from batch_code and creates the index used to find the next
+BASE-NNN code. Run this once to update your existing database schema.
+"""
+import re
+import sqlite3
+import os
+
+BATCH_CODE_SEQ = re.compile(r"^(.*)-(\d+)$")
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+cursor.execute("PRAGMA table_info(batches)")
+columns = {row[1] for row in cursor.fetchall()}
+
+try:
+    if 'base_code' not in columns:
+        cursor.execute("ALTER TABLE batches ADD COLUMN base_code VARCHAR")
+    if 'code_seq' not in columns:
+        cursor.execute("ALTER TABLE batches ADD COLUMN code_seq INTEGER")
+
+    cursor.execute("SELECT id, batch_code FROM batches WHERE base_code IS NULL")
+    updates = []
+    for batch_id, batch_code in cursor.fetchall():
+        match = BATCH_CODE_SEQ.match(batch_code)
+        if match:
+            updates.append((match.group(1), int(match.group(2)), batch_id))
+        else:
+            updates.append((batch_code, 0, batch_id))
+    cursor.executemany("UPDATE batches SET base_code = ?, code_seq = ? WHERE id = ?", updates)
+    cursor.execute("CREATE INDEX IF NOT EXISTS ix_batches_base_code_seq ON batches (base_code, code_seq)")
+
+    conn.commit()
+    print(f"\n✅ Backfilled {len(updates)} batch code(s)")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Migration script to backfill the batch_donations association table from the
+legacy batches.donation_ids JSON column.
+
+Safe to run while the server is up: batches are processed in small chunks,
+each committed on its own so the write lock is only held briefly, and rows
+are inserted with INSERT OR IGNORE so re-running it is harmless.
+"""
+import json
+import sqlite3
+import os
+
+CHUNK_SIZE = 200
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path, timeout=30)
+cursor = conn.cursor()
+
+try:
+    cursor.execute(
+        "CREATE TABLE IF NOT EXISTS batch_donations ("
+        "batch_id VARCHAR NOT NULL REFERENCES batches (id), "
+        "donation_record_id VARCHAR NOT NULL REFERENCES donation_records (id), "
+        "position INTEGER NOT NULL DEFAULT 0, "
+        "PRIMARY KEY (batch_id, donation_record_id))"
+    )
+    cursor.execute(
+        "CREATE INDEX IF NOT EXISTS ix_batch_donations_donation_record_id "
+        "ON batch_donations (donation_record_id, batch_id)"
+    )
+    conn.commit()
+
+    backfilled = 0
+    unresolved = []
+    last_id = ""
+    while True:
+        # Keyset over batch ids so each chunk is a short read followed by a short write
+        cursor.execute(
+            "SELECT id, donation_ids FROM batches WHERE id > ? AND donation_ids IS NOT NULL ORDER BY id LIMIT ?",
+            (last_id, CHUNK_SIZE),
+        )
+        chunk = cursor.fetchall()
+        if not chunk:
+            break
+        last_id = chunk[-1][0]
+
+        rows = []
+        for batch_id, raw in chunk:
+            identifiers = json.loads(raw) if isinstance(raw, str) else (raw or [])
+            for position, identifier in enumerate(identifiers):
+                cursor.execute(
+                    "SELECT id FROM donation_records WHERE id = ? OR donation_id = ? LIMIT 1",
+                    (identifier, identifier),
+                )
+                found = cursor.fetchone()
+                if found:
+                    rows.append((batch_id, found[0], position))
+                else:
+                    unresolved.append((batch_id, identifier))
+
+        cursor.executemany(
+            "INSERT OR IGNORE INTO batch_donations (batch_id, donation_record_id, position) VALUES (?, ?, ?)",
+            rows,
+        )
+        conn.commit()
+        backfilled += cursor.rowcount if cursor.rowcount > 0 else 0
+        print(f"   Processed batches up to {last_id}")
+
+    print(f"\n✅ Backfill complete: {backfilled} association row(s) added")
+    for batch_id, identifier in unresolved:
+        print(f"⚠️  Batch {batch_id}: donation {identifier} not found, skipped")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
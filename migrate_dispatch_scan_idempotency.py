@@ -0,0 +1,59 @@
+#!/usr/bin/env python3
+"""
+Migration script to add dispatch_scans.idempotency_key and the unique
+(dispatch_id, idempotency_key) index that deduplicates replayed offline
+scan journals. Existing scans keep a NULL key, which never collides.
+Run this once to update your existing database schema.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+cursor.execute("PRAGMA table_info(dispatch_scans)")
+columns = {row[1] for row in cursor.fetchall()}
+
+migrations_needed = []
+if 'idempotency_key' not in columns:
+    migrations_needed.append("ALTER TABLE dispatch_scans ADD COLUMN idempotency_key VARCHAR")
+migrations_needed.append(
+    "CREATE UNIQUE INDEX IF NOT EXISTS ux_dispatch_scans_idempotency ON dispatch_scans (dispatch_id, idempotency_key)"
+)
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
@@ -0,0 +1,53 @@
+#!/usr/bin/env python3
+"""
+Migration script adding the samples/micro_results indexes used to evaluate
+post-pasteurisation results for many batches in one aggregate query.
+Run this once to update your existing database schema.
+"""
+import sqlite3
+import os
+
+# Find the database file
+possible_paths = [
+    'milkbank.db',
+    'src/milkbank.db',
+    '/app/data/milkbank.db',
+]
+
+db_path = None
+for path in possible_paths:
+    if os.path.exists(path):
+        db_path = path
+        break
+
+if not db_path:
+    print("❌ Database file not found. Creating new one will have correct schema.")
+    print("   If using Docker, the database will be created correctly on first run.")
+    exit(0)
+
+print(f"📊 Found database at: {db_path}")
+
+conn = sqlite3.connect(db_path)
+cursor = conn.cursor()
+
+migrations_needed = [
+    "CREATE INDEX IF NOT EXISTS ix_samples_batch_id ON samples (batch_id)",
+    "CREATE INDEX IF NOT EXISTS ix_micro_results_sample_id ON micro_results (sample_id)",
+]
+
+print(f"\n🔧 Applying {len(migrations_needed)} migration(s)...")
+
+try:
+    for migration in migrations_needed:
+        print(f"   Running: {migration}")
+        cursor.execute(migration)
+
+    conn.commit()
+    print("\n✅ Database migration completed successfully!")
+
+except Exception as e:
+    conn.rollback()
+    print(f"\n❌ Migration failed: {e}")
+    exit(1)
+finally:
+    conn.close()
@@ -1,12 +1,14 @@
-from fastapi import APIRouter, Depends, HTTPException, Request
-from fastapi.responses import Response, PlainTextResponse
+from datetime import datetime
+from typing import Optional
+from fastapi import APIRouter, Depends, HTTPException, Request, Query
+from fastapi.responses import Response, PlainTextResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
 from io import BytesIO
 from sqlalchemy.orm import Session
 from sqlalchemy.exc import IntegrityError
-from . import crud, schemas, models
+from . import crud, schemas, models, stats, streaming, audit, registry
 from .database import SessionLocal, engine, Base
-from .labels import generate_batch_labels_zpl
+from .labels import iter_batch_labels_zpl
 from .printer import printer_manager, PrinterConfig, PrinterInfo
 
 templates = Jinja2Templates(directory="src/app/templates")
@@ -16,6 +18,13 @@ Base.metadata.create_all(bind=engine)
 router = APIRouter()
 
 
+def backfill_read_models():
+    """Fill the status counters and barcode registry the first time they are found empty (run at startup)."""
+    with SessionLocal() as db:
+        stats.ensure_status_counts(db)
+        registry.ensure_registry(db)
+
+
 def get_db():
     db = SessionLocal()
     try:
@@ -24,6 +33,81 @@ def get_db():
         db.close()
 
 
+@router.get("/stats/dashboard")
+def dashboard_stats(db: Session = Depends(get_db)):
+    """Status counts and volume totals served from the incremental counters"""
+    return stats.get_dashboard_stats(db)
+
+
+@router.get("/audit")
+def list_audit_events(cursor: Optional[str] = None, limit: int = Query(crud.DEFAULT_PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+                      entity_type: Optional[str] = None, entity_id: Optional[str] = None, user_id: Optional[str] = None,
+                      operation: Optional[str] = None, time_from: Optional[datetime] = None, time_to: Optional[datetime] = None,
+                      include_archive: bool = False, db: Session = Depends(get_db)):
+    """Query the audit trail by entity, user, operation and time range, newest first"""
+    try:
+        return crud.get_audit_events_page(
+            db, cursor=cursor, limit=limit, entity_type=entity_type, entity_id=entity_id, user_id=user_id,
+            operation=operation, time_from=time_from, time_to=time_to, include_archive=include_archive,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.post("/audit/archive")
+def archive_audit_events(payload: schemas.AuditArchiveRequest, db: Session = Depends(get_db)):
+    """Move audit events older than `before` into the archive table (two approvers, minimum retention)"""
+    try:
+        archived = crud.archive_audit_events(db, payload.before, payload.approver_id, payload.approver2_id)
+    except IntegrityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"archived": archived}
+
+
+@router.post("/audit/verify")
+def verify_audit_chain(full: bool = False, db: Session = Depends(get_db)):
+    """Check the audit hash chain from the last checkpoint (or from the start with full=true)"""
+    return audit.verify_chain(db, full=full)
+
+
+def _stream_export(stmt, fmt: str):
+    # The request-scoped session may be closed before the body is sent, so the stream owns its own
+    db = SessionLocal()
+    try:
+        yield from streaming.export_chunks(db, stmt, fmt)
+    finally:
+        db.close()
+
+
+@router.get("/export/{entity}")
+def export_entity(entity: str, format: str = "ndjson", status: Optional[str] = None,
+                  created_from: Optional[datetime] = None, created_to: Optional[datetime] = None,
+                  include_archive: bool = False):
+    """Stream every row of donors, donations, batches, bottles, dispatches or the audit log as NDJSON or a JSON array"""
+    if format not in streaming.MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Unsupported format: {format}")
+    try:
+        stmt = crud.get_export_query(entity, status=status, created_from=created_from, created_to=created_to,
+                                     include_archive=include_archive)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    extension = "ndjson" if format == "ndjson" else "json"
+    return StreamingResponse(
+        _stream_export(stmt, format),
+        media_type=streaming.MEDIA_TYPES[format],
+        headers={"Content-Disposition": f"attachment; filename={entity}.{extension}"},
+    )
+
+
+@router.get("/scan/{code:path}")
+def scan_code(code: str, db: Session = Depends(get_db)):
+    """Resolve any scanned barcode (bottle, sample, batch, dispatch or bottle label) to its entity"""
+    matches = registry.resolve(db, code)
+    if not matches:
+        raise HTTPException(status_code=404, detail="Unknown barcode")
+    return {"code": code, "matches": matches}
+
+
 @router.post("/donors", response_model=schemas.DonorRead)
 def create_donor(donor: schemas.DonorCreate, db: Session = Depends(get_db)):
     try:
@@ -38,9 +122,42 @@ def create_donor(donor: schemas.DonorCreate, db: Session = Depends(get_db)):
         raise HTTPException(status_code=400, detail=str(e))
 
 
-@router.get("/donors")
-def list_donors(db: Session = Depends(get_db)):
-    return crud.get_all_donors(db)
+class ListParams:
+    """Keyset pagination and filter query parameters shared by the list endpoints."""
+
+    def __init__(
+        self,
+        cursor: Optional[str] = None,
+        limit: int = Query(crud.DEFAULT_PAGE_SIZE, ge=1, le=crud.MAX_PAGE_SIZE),
+        status: Optional[str] = None,
+        created_from: Optional[datetime] = None,
+        created_to: Optional[datetime] = None,
+    ):
+        self.cursor = cursor
+        self.limit = limit
+        self.status = status
+        self.created_from = created_from
+        self.created_to = created_to
+
+    def as_kwargs(self) -> dict:
+        return {
+            "cursor": self.cursor,
+            "limit": self.limit,
+            "status": self.status,
+            "created_from": self.created_from,
+            "created_to": self.created_to,
+        }
+
+
+@router.get("/donors", response_model=schemas.DonorPage)
+def list_donors(params: ListParams = Depends(), hospital_number: Optional[str] = None,
+                name_contains: Optional[str] = None, hospital_number_contains: Optional[str] = None,
+                db: Session = Depends(get_db)):
+    try:
+        return crud.get_donors_page(db, hospital_number=hospital_number, name_contains=name_contains,
+                                    hospital_number_contains=hospital_number_contains, **params.as_kwargs())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/donors/{donor_id}", response_model=schemas.DonorRead)
@@ -51,6 +168,15 @@ def get_donor(donor_id: str, db: Session = Depends(get_db)):
     return d
 
 
+@router.get("/donors/{donor_id}/exposure")
+def get_donor_exposure(donor_id: str, db: Session = Depends(get_db)):
+    """Every batch a donor's milk went into and where those bottles were dispatched"""
+    exposure = crud.get_donor_exposure(db, donor_id)
+    if exposure is None:
+        raise HTTPException(status_code=404, detail="Donor not found")
+    return exposure
+
+
 @router.post("/donations", response_model=schemas.DonationRead)
 def create_donation(donation: schemas.DonationCreate, db: Session = Depends(get_db)):
     try:
@@ -75,9 +201,12 @@ def get_donor_donations(donor_id: str, db: Session = Depends(get_db)):
     return crud.get_donation_records_by_donor(db, donor_id)
 
 
-@router.get("/donations", response_model=list[schemas.DonationRead])
-def list_donations(db: Session = Depends(get_db)):
-    return crud.get_all_donation_records(db)
+@router.get("/donations", response_model=schemas.DonationPage)
+def list_donations(params: ListParams = Depends(), hospital_number: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return crud.get_donation_records_page(db, hospital_number=hospital_number, **params.as_kwargs())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/donations/by-id/{donation_id}", response_model=schemas.DonationRead)
@@ -90,6 +219,14 @@ def get_donation_by_id(donation_id: str, db: Session = Depends(get_db)):
     return donation
 
 
+@router.get("/donations/{donation_id}/batches")
+def get_donation_batches(donation_id: str, db: Session = Depends(get_db)):
+    batches = crud.get_batches_for_donation(db, donation_id)
+    if batches is None:
+        raise HTTPException(status_code=404, detail="Donation not found")
+    return batches
+
+
 @router.get("/donations/unacknowledged", response_model=list[schemas.DonationRead])
 def get_unacknowledged_donations(db: Session = Depends(get_db)):
     return crud.get_unacknowledged_donations(db)
@@ -155,39 +292,20 @@ def create_batch(batch_create: schemas.BatchCreate, db: Session = Depends(get_db
 
 
 @router.get("/batches")
-def list_batches(db: Session = Depends(get_db)):
-    return crud.get_all_batches(db)
+def list_batches(params: ListParams = Depends(), hospital_number: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return crud.get_batches_page(db, hospital_number=hospital_number, **params.as_kwargs())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/batches/next-code/{base_code}")
 def get_next_batch_code(base_code: str, db: Session = Depends(get_db)):
     """Get the next available batch code with auto-incrementing sequence"""
-    import re
-    
-    # Check if base code already exists
-    existing = db.query(models.Batch).filter(models.Batch.batch_code == base_code).first()
-    if not existing:
-        return {"batch_code": base_code}
-    
-    # Find all batches with same base code (including sequenced variants)
-    all_batches = db.query(models.Batch.batch_code).filter(
-        models.Batch.batch_code.like(f"{base_code}%")
-    ).all()
-    
-    # Extract sequence numbers
-    max_sequence = 0
-    for (code,) in all_batches:
-        if code == base_code:
-            max_sequence = max(max_sequence, 0)
-        else:
-            match = re.match(rf"{re.escape(base_code)}-(\d+)", code)
-            if match:
-                seq_num = int(match.group(1))
-                max_sequence = max(max_sequence, seq_num)
-    
-    # Return next sequence
-    next_sequence = max_sequence + 1
-    return {"batch_code": f"{base_code}-{next_sequence:03d}"}
+    try:
+        return {"batch_code": crud.get_next_batch_code(db, base_code)}
+    except IntegrityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/batches/{batch_id}")
@@ -198,38 +316,50 @@ def get_batch(batch_id: str, db: Session = Depends(get_db)):
     return b
 
 
+@router.get("/batches/{batch_id}/lineage")
+def get_batch_lineage(batch_id: str, db: Session = Depends(get_db)):
+    """Full recall graph: donations and donors upstream, bottles, dispatches, hospitals and patients downstream"""
+    lineage = crud.get_batch_lineage(db, batch_id)
+    if lineage is None:
+        raise HTTPException(status_code=404, detail="Batch not found")
+    return lineage
+
+
+def _label_batch_date(batch: dict) -> str:
+    """The batch date as printed on labels (just the date part, no time)."""
+    batch_date = batch.get("batch_date")
+    if not batch_date:
+        return ""
+    if isinstance(batch_date, str):
+        # Parse and reformat if it's a string
+        try:
+            date_obj = datetime.fromisoformat(batch_date.replace('Z', '+00:00'))
+            return date_obj.strftime("%d/%m/%Y")
+        except ValueError:
+            return str(batch_date).split()[0]  # Fallback: just take date part
+    # If it's already a date object
+    return batch_date.strftime("%d/%m/%Y")
+
+
 @router.get("/batches/{batch_id}/labels/zpl")
-def get_batch_labels_zpl(batch_id: str, db: Session = Depends(get_db)):
-    """Generate ZPL format labels for all bottles in a batch (Zebra ZD410) and return as downloadable file"""
-    from datetime import datetime
+def get_batch_labels_zpl(batch_id: str, stored_format: bool = False, db: Session = Depends(get_db)):
+    """
+    Generate ZPL format labels for all bottles in a batch (Zebra ZD410) and return as downloadable file.
+    Each label is self-contained; with stored_format the layout is sent once as a stored format (^DF)
+    and each bottle is a ^XF recall.
+    The file is streamed as it is generated, so large reprints start immediately in constant memory.
+    """
     batch = crud.get_batch(db, batch_id)
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
     # Generate ZPL for the batch with number of bottles
     number_of_bottles = batch.get("number_of_bottles") or 1
-    
-    # Format the date properly (just the date part, no time)
-    batch_date = batch.get("batch_date")
-    if batch_date:
-        if isinstance(batch_date, str):
-            # Parse and reformat if it's a string
-            try:
-                date_obj = datetime.fromisoformat(batch_date.replace('Z', '+00:00'))
-                batch_date = date_obj.strftime("%d/%m/%Y")
-            except:
-                batch_date = str(batch_date).split()[0]  # Fallback: just take date part
-        else:
-            # If it's already a date object
-            batch_date = batch_date.strftime("%d/%m/%Y")
-    else:
-        batch_date = ""
-    
-    zpl_content = generate_batch_labels_zpl(batch["batch_code"], number_of_bottles, batch_date)
+    labels = iter_batch_labels_zpl(batch["batch_code"], number_of_bottles, _label_batch_date(batch), stored_format=stored_format)
     
     # Return as downloadable file with appropriate headers
-    return Response(
-        content=zpl_content,
+    return StreamingResponse(
+        streaming.text_chunks(labels),
         media_type="application/octet-stream",
         headers={"Content-Disposition": f"attachment; filename={batch['batch_code']}_labels.zpl"}
     )
@@ -289,6 +419,16 @@ def post_result(sample_id: str, payload: dict, db: Session = Depends(get_db)):
     return {"result_id": r.id}
 
 
+@router.post("/batches/process-post-pasteurisation")
+def process_pending_post_pasteurisation(db: Session = Depends(get_db), user_id: str = None):
+    """Evaluate microbiology results for every MicroTestPending batch at once"""
+    try:
+        results = crud.process_pending_post_pasteurisation_results(db, user_id=user_id)
+    except IntegrityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"results": results}
+
+
 @router.post("/batches/{batch_id}/process-post-pasteurisation")
 def process_post_pasteurisation(batch_id: str, db: Session = Depends(get_db), user_id: str = None):
     """Process post-pasteurisation microbiology results and auto-update batch status"""
@@ -311,6 +451,15 @@ def release_batch(batch_id: str, payload: dict, db: Session = Depends(get_db)):
     return {"batch_id": b.id, "status": b.status.name}
 
 
+@router.post("/transitions/bulk")
+def bulk_transition(payload: schemas.BulkTransition, db: Session = Depends(get_db)):
+    """Apply many batch/donation/bottle state transitions in one transaction"""
+    try:
+        return crud.bulk_transition(db, [op.model_dump() for op in payload.operations], user_id=payload.user_id, atomic=payload.atomic)
+    except IntegrityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 @router.post("/bottles/{bottle_id}/allocate")
 def allocate_bottle(bottle_id: str, payload: dict, db: Session = Depends(get_db)):
     """Allocate a bottle to a specific baby/patient"""
@@ -375,8 +524,11 @@ def create_bottles(batch_id: str, payload: dict, db: Session = Depends(get_db)):
 
 
 @router.get("/bottles")
-def list_bottles(db: Session = Depends(get_db)):
-    return crud.get_all_bottles(db)
+def list_bottles(params: ListParams = Depends(), hospital_number: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return crud.get_bottles_page(db, hospital_number=hospital_number, **params.as_kwargs())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/bottles/{bottle_id}")
@@ -435,8 +587,11 @@ def create_dispatch(payload: dict, db: Session = Depends(get_db)):
 
 
 @router.get("/dispatches")
-def list_dispatches(db: Session = Depends(get_db)):
-    return crud.get_all_dispatches(db)
+def list_dispatches(params: ListParams = Depends(), hospital_id: Optional[str] = None, db: Session = Depends(get_db)):
+    try:
+        return crud.get_dispatches_page(db, hospital_id=hospital_id, **params.as_kwargs())
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
 
 
 @router.get("/dispatches/{dispatch_id}")
@@ -450,19 +605,32 @@ def get_dispatch(dispatch_id: str, db: Session = Depends(get_db)):
 @router.post("/dispatches/{dispatch_id}/scan")
 def dispatch_scan(dispatch_id: str, payload: dict, db: Session = Depends(get_db)):
     try:
-        item = crud.scan_dispatch_item(db, dispatch_id, barcode=payload.get("barcode"), user_id=payload.get("user_id"), scan_type=payload.get("scan_type", "out"))
+        if payload.get("journal") is not None:
+            # an offline scan journal synced in one call
+            results = crud.bulk_scan_dispatch_items(db, dispatch_id, payload["journal"], user_id=payload.get("user_id"))
+            return {"dispatch_id": dispatch_id, "results": results}
+        item = crud.scan_dispatch_item(db, dispatch_id, barcode=payload.get("barcode"), user_id=payload.get("user_id"), scan_type=payload.get("scan_type", "out"), idempotency_key=payload.get("idempotency_key"))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
     return {"item_id": item.id, "scanned_out": item.scanned_out, "scanned_in": item.scanned_in}
 
 
+@router.post("/dispatches/{dispatch_id}/scan/bulk")
+def dispatch_scan_bulk(dispatch_id: str, payload: schemas.DispatchBulkScan, db: Session = Depends(get_db)):
+    try:
+        results = crud.bulk_scan_dispatch_items(db, dispatch_id, [ev.model_dump() for ev in payload.events], user_id=payload.user_id)
+    except IntegrityError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"dispatch_id": dispatch_id, "results": results}
+
+
 @router.post("/dispatches/{dispatch_id}/receive")
 def dispatch_receive(dispatch_id: str, payload: dict, db: Session = Depends(get_db)):
     try:
-        d = crud.receive_dispatch(db, dispatch_id, received_by=payload.get("received_by"))
+        d, scan_results = crud.receive_dispatch_with_journal(db, dispatch_id, received_by=payload.get("received_by"), journal=payload.get("journal"))
     except Exception as e:
         raise HTTPException(status_code=400, detail=str(e))
-    return {"id": d.id, "status": d.status.name}
+    return {"id": d.id, "status": d.status.name, "scan_results": scan_results}
 
 
 @router.post("/dispatches/{dispatch_id}/fhir_send")
@@ -549,12 +717,11 @@ def print_batch_labels(batch_id: str, db: Session = Depends(get_db)):
     if not batch:
         raise HTTPException(status_code=404, detail="Batch not found")
     
-    # Generate ZPL content
-    number_of_bottles = batch.number_of_bottles or 1
-    zpl_content = generate_batch_labels_zpl(batch.batch_code, number_of_bottles)
+    number_of_bottles = batch.get("number_of_bottles") or 1
     
-    # Send to printer
-    result = printer_manager.send_zpl(zpl_content)
+    # Generate ZPL and send it to the printer chunk by chunk
+    labels = iter_batch_labels_zpl(batch["batch_code"], number_of_bottles, _label_batch_date(batch), stored_format=True)
+    result = printer_manager.send_zpl_chunks(streaming.text_chunks(labels))
     
     if not result['success']:
         raise HTTPException(status_code=400, detail=result['message'])
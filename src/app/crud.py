@@ -1,10 +1,14 @@
-from sqlalchemy.orm import Session
-from sqlalchemy import select, desc
+from sqlalchemy.orm import Session, selectinload
+from sqlalchemy import select, insert, update, desc, or_, and_, case, true, type_coerce, String
 from sqlalchemy.sql import func
-from . import models, schemas
+from . import models, schemas, stats, audit
 from sqlalchemy.exc import IntegrityError
 import io
 import csv
+import json
+import base64
+import os
+import re
 try:
     from reportlab.lib.pagesizes import letter
     from reportlab.pdfgen import canvas
@@ -14,11 +18,130 @@ except Exception:
 
 
 def _create_audit(db: Session, user_id: str, operation: str, entity_type: str, entity_id: str, before: dict = None, after: dict = None, reason: str = None):
-    ev = models.AuditEvent(user_id=user_id, operation=operation, entity_type=entity_type, entity_id=entity_id, before=before, after=after, reason=reason)
-    db.add(ev)
+    # Queued on the session and written with the rest of the unit of work at commit
+    audit.record(db, user_id, operation, entity_type, entity_id, before=before, after=after, reason=reason)
+
+
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+def _encode_cursor(created_at, row_id) -> str:
+    if not isinstance(created_at, str) and created_at is not None:
+        created_at = created_at.isoformat()
+    raw = json.dumps([created_at, row_id]).encode("utf-8")
+    return base64.urlsafe_b64encode(raw).decode("ascii")
+
+
+def _decode_cursor(cursor: str):
+    try:
+        created_at, row_id = json.loads(base64.urlsafe_b64decode(cursor.encode("ascii")))
+    except Exception:
+        raise ValueError("Invalid cursor")
+    return created_at, row_id
+
+
+def _parse_status(enum_cls, status: str):
+    try:
+        return enum_cls[status]
+    except KeyError:
+        raise ValueError(f"Unknown status: {status}")
+
+
+def _keyset_page(db: Session, stmt, created_at_col, id_col, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE):
+    """
+    Fetch one page of ``stmt`` ordered newest first by (created_at, id).
+
+    The cursor carries created_at exactly as the database stores it so the
+    comparison matches ORDER BY even for SQLite's mixed text timestamp formats.
+    Rows without a created_at sort after every dated row (NULLS LAST on every
+    backend) and are paged by id alone, so they are not skipped.
+    Returns (rows, next_cursor); next_cursor is None on the last page.
+    """
+    limit = max(1, min(limit or DEFAULT_PAGE_SIZE, MAX_PAGE_SIZE))
+    created_at_key = type_coerce(created_at_col, String)
+    stmt = stmt.add_columns(created_at_key.label("cursor_created_at"), id_col.label("cursor_id"))
+    if cursor:
+        last_created_at, last_id = _decode_cursor(cursor)
+        if last_created_at is None:
+            stmt = stmt.where(created_at_col.is_(None), id_col < last_id)
+        else:
+            stmt = stmt.where(or_(
+                created_at_key < last_created_at,
+                and_(created_at_key == last_created_at, id_col < last_id),
+                created_at_col.is_(None),
+            ))
+    order = (created_at_col.desc().nulls_last(), id_col.desc())
+    rows = db.execute(stmt.order_by(*order).limit(limit + 1)).all()
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1].cursor_created_at, rows[-1].cursor_id)
+    return rows, next_cursor
+
+
+def _created_between(stmt, created_at_col, created_from=None, created_to=None):
+    if created_from is not None:
+        stmt = stmt.where(created_at_col >= created_from)
+    if created_to is not None:
+        stmt = stmt.where(created_at_col <= created_to)
+    return stmt
+
+
+def _begin_write_transaction(db: Session):
+    """
+    Start the session's transaction as a writer.
+    On SQLite this issues BEGIN IMMEDIATE so concurrent writers queue on the lock
+    up front instead of failing when a reader upgrades; Postgres relies on row locks.
+    The lock is only requested when this call starts the transaction; a
+    transaction the caller already has open is joined as it is, never
+    committed on the caller's behalf.
+    """
+    if not db.in_transaction():
+        db.connection(execution_options={"sqlite_begin_immediate": True})
+
+
+def _existing_donation_sequence_max(db: Session, hospital_num: str, date_str: str) -> int:
+    """Highest suffix already used for a prefix, to seed a counter on first use."""
+    prefix = f"{hospital_num}-{date_str}-"
+    existing = db.query(models.DonationRecord.donation_id).filter(
+        models.DonationRecord.donation_id.like(f"{prefix}%")
+    ).all()
+    highest = 0
+    for (donation_id,) in existing:
+        suffix = donation_id[len(prefix):]
+        if suffix.isdigit():
+            highest = max(highest, int(suffix))
+    return highest
+
+
+def _allocate_donation_sequence(db: Session, hospital_num: str, date_str: str) -> int:
+    """
+    Atomically take the next suffix for (hospital_number, date).
+    The UPDATE holds the counter row lock until the caller commits, so two
+    intakes for the same day can never read the same value.
+    """
+    table = models.DonationSequence.__table__
+    key = and_(table.c.hospital_number == hospital_num, table.c.sequence_date == date_str)
+    result = db.execute(update(table).where(key).values(last_value=table.c.last_value + 1))
+    if result.rowcount == 0:
+        start = _existing_donation_sequence_max(db, hospital_num, date_str) + 1
+        if db.get_bind().dialect.name == "postgresql":
+            from sqlalchemy.dialects.postgresql import insert as pg_insert
+            stmt = pg_insert(table).values(hospital_number=hospital_num, sequence_date=date_str, last_value=start)
+            stmt = stmt.on_conflict_do_update(
+                index_elements=[table.c.hospital_number, table.c.sequence_date],
+                set_={"last_value": table.c.last_value + 1},
+            )
+        else:
+            stmt = insert(table).values(hospital_number=hospital_num, sequence_date=date_str, last_value=start)
+        db.execute(stmt)
+    return db.execute(select(table.c.last_value).where(key)).scalar_one()
 
 
 def create_donation_record(db: Session, donation: schemas.DonationCreate, user_id: str = None):
+    _begin_write_transaction(db)
+
     # Get donor's hospital number
     donor = db.query(models.Donor).filter(models.Donor.id == donation.donor_id).first()
     hospital_num = (donor.hospital_number or 'UNKNOWN') if donor else 'UNKNOWN'
@@ -27,19 +150,11 @@ def create_donation_record(db: Session, donation: schemas.DonationCreate, user_i
     date_str = donation.donation_date.strftime('%Y%m%d')
     
     # Get sequential number for this hospital number and date
-    date_start = donation.donation_date.replace(hour=0, minute=0, second=0, microsecond=0)
-    date_end = donation.donation_date.replace(hour=23, minute=59, second=59, microsecond=999999)
-    
-    existing_count = db.query(models.DonationRecord).filter(
-        models.DonationRecord.donation_date >= date_start,
-        models.DonationRecord.donation_date <= date_end,
-        models.DonationRecord.donation_id.like(f"{hospital_num}-{date_str}-%")
-    ).count()
-    
-    seq_num = existing_count + 1
+    seq_num = _allocate_donation_sequence(db, hospital_num, date_str)
     generated_donation_id = f"{hospital_num}-{date_str}-{seq_num:03d}"
     
     db_donation = models.DonationRecord(
+        id=gen_uuid(),
         donation_id=generated_donation_id,
         donor_id=donation.donor_id,
         donation_date=donation.donation_date,
@@ -47,11 +162,10 @@ def create_donation_record(db: Session, donation: schemas.DonationCreate, user_i
         notes=donation.notes
     )
     db.add(db_donation)
-    db.commit()
-    db.refresh(db_donation)
     if user_id:
         _create_audit(db, user_id, "create", "donation_record", db_donation.id, after={"donor_id": donation.donor_id, "number_of_bottles": donation.number_of_bottles, "donation_id": generated_donation_id})
-        db.commit()
+    db.commit()
+    db.refresh(db_donation)
     return db_donation
 
 
@@ -63,6 +177,20 @@ def get_all_donation_records(db: Session):
     return db.query(models.DonationRecord).order_by(desc(models.DonationRecord.donation_date)).all()
 
 
+def get_donation_records_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, status: str = None,
+                              hospital_number: str = None, created_from=None, created_to=None):
+    stmt = select(models.DonationRecord)
+    if status:
+        stmt = stmt.where(models.DonationRecord.status == _parse_status(models.DonationStatus, status))
+    if hospital_number:
+        stmt = stmt.join(models.Donor, models.Donor.id == models.DonationRecord.donor_id).where(
+            models.Donor.hospital_number == hospital_number
+        )
+    stmt = _created_between(stmt, models.DonationRecord.created_at, created_from, created_to)
+    rows, next_cursor = _keyset_page(db, stmt, models.DonationRecord.created_at, models.DonationRecord.id, cursor, limit)
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
+
+
 def get_unacknowledged_donations(db: Session):
     return db.query(models.DonationRecord).filter(models.DonationRecord.acknowledged == False).order_by(desc(models.DonationRecord.donation_date)).all()
 
@@ -291,6 +419,135 @@ def get_all_donors(db: Session):
     return db.query(models.Donor).all()
 
 
+# Columns the donor list shows; the remaining ~100 donor fields are only read by GET /donors/{id}
+DONOR_SUMMARY_COLUMNS = (
+    models.Donor.id,
+    models.Donor.donor_code,
+    models.Donor.status,
+    models.Donor.created_at,
+    models.Donor.hospital_number,
+    models.Donor.first_name,
+    models.Donor.last_name,
+    models.Donor.date_of_birth,
+    models.Donor.phone_number,
+    models.Donor.email,
+)
+
+
+def _donor_summary_dict(row):
+    donor_dict = row._asdict()
+    donor_dict.pop("cursor_created_at", None)
+    donor_dict.pop("cursor_id", None)
+    donor_dict["status"] = row.status.name if row.status else None
+    return donor_dict
+
+
+def get_donors_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, status: str = None,
+                    hospital_number: str = None, created_from=None, created_to=None,
+                    name_contains: str = None, hospital_number_contains: str = None):
+    """
+    A page of donor summaries. ``hospital_number`` matches exactly; the
+    ``*_contains`` filters are case-insensitive substring searches (the name
+    one over first, last and full name).
+    """
+    stmt = select(*DONOR_SUMMARY_COLUMNS)
+    if status:
+        stmt = stmt.where(models.Donor.status == _parse_status(models.DonorStatus, status))
+    if hospital_number:
+        stmt = stmt.where(models.Donor.hospital_number == hospital_number)
+    if name_contains:
+        full_name = models.Donor.first_name + " " + models.Donor.last_name
+        stmt = stmt.where(or_(
+            models.Donor.first_name.icontains(name_contains, autoescape=True),
+            models.Donor.last_name.icontains(name_contains, autoescape=True),
+            full_name.icontains(name_contains, autoescape=True),
+        ))
+    if hospital_number_contains:
+        stmt = stmt.where(models.Donor.hospital_number.icontains(hospital_number_contains, autoescape=True))
+    stmt = _created_between(stmt, models.Donor.created_at, created_from, created_to)
+    rows, next_cursor = _keyset_page(db, stmt, models.Donor.created_at, models.Donor.id, cursor, limit)
+    return {"items": [_donor_summary_dict(row) for row in rows], "next_cursor": next_cursor}
+
+
+def get_audit_events_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, entity_type: str = None,
+                          entity_id: str = None, user_id: str = None, operation: str = None,
+                          time_from=None, time_to=None, include_archive: bool = False):
+    """
+    Audit events newest first, filtered on the indexed columns. Archived
+    events are only read when ``include_archive`` is set.
+    """
+    def conditions(table):
+        where = []
+        if entity_type:
+            where.append(table.c.entity_type == entity_type)
+        if entity_id:
+            where.append(table.c.entity_id == entity_id)
+        if user_id:
+            where.append(table.c.user_id == user_id)
+        if operation:
+            where.append(table.c.operation == operation)
+        if time_from is not None:
+            where.append(table.c.timestamp >= time_from)
+        if time_to is not None:
+            where.append(table.c.timestamp <= time_to)
+        return and_(true(), *where)
+
+    events = audit.events_selectable(include_archive, live_where=conditions)
+    stmt = select(events)
+    if not include_archive:
+        stmt = stmt.where(conditions(events))
+    rows, next_cursor = _keyset_page(db, stmt, events.c.timestamp, events.c.id, cursor, limit)
+    items = []
+    for row in rows:
+        item = row._asdict()
+        item.pop("cursor_created_at", None)
+        item.pop("cursor_id", None)
+        items.append(item)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+# entity name -> (model, status enum) for the streaming export endpoint
+EXPORTABLE = {
+    "donors": (models.Donor, models.DonorStatus),
+    "donations": (models.DonationRecord, models.DonationStatus),
+    "batches": (models.Batch, models.BatchStatus),
+    "bottles": (models.Bottle, models.BottleStatus),
+    "dispatches": (models.Dispatch, models.DispatchStatus),
+}
+
+
+def _audit_export_query(status: str = None, created_from=None, created_to=None, include_archive: bool = False):
+    """Audit events (optionally with the archive) in a time range, oldest first by (timestamp, id)."""
+    if status:
+        raise ValueError("The audit export has no status filter")
+
+    def conditions(table):
+        return and_(
+            table.c.timestamp >= created_from if created_from is not None else true(),
+            table.c.timestamp <= created_to if created_to is not None else true(),
+        )
+
+    events = audit.events_selectable(include_archive, live_where=conditions)
+    stmt = select(events)
+    if not include_archive:
+        stmt = stmt.where(conditions(events))
+    return stmt.order_by(events.c.timestamp, events.c.id)
+
+
+def get_export_query(entity: str, status: str = None, created_from=None, created_to=None, include_archive: bool = False):
+    """Core select over every column of an exportable table (or the audit log), oldest first."""
+    if entity == "audit":
+        return _audit_export_query(status, created_from, created_to, include_archive)
+    if entity not in EXPORTABLE:
+        raise ValueError(f"Unknown export: {entity}")
+    model, status_enum = EXPORTABLE[entity]
+    stmt = select(model.__table__)
+    if status:
+        stmt = stmt.where(model.status == _parse_status(status_enum, status))
+    stmt = _created_between(stmt, model.created_at, created_from, created_to)
+    return stmt.order_by(model.created_at, model.id)
+
+
 def get_all_donations(db: Session):
     return db.query(models.Donation).all()
 
@@ -299,34 +556,38 @@ def get_all_batches(db: Session):
     return db.query(models.Batch).all()
 
 
+def get_batches_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, status: str = None,
+                     hospital_number: str = None, created_from=None, created_to=None):
+    stmt = select(models.Batch)
+    if status:
+        stmt = stmt.where(models.Batch.status == _parse_status(models.BatchStatus, status))
+    if hospital_number:
+        stmt = stmt.where(models.Batch.hospital_number == hospital_number)
+    stmt = _created_between(stmt, models.Batch.created_at, created_from, created_to)
+    rows, next_cursor = _keyset_page(db, stmt, models.Batch.created_at, models.Batch.id, cursor, limit)
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
+
+
 def get_batch(db: Session, batch_id: str):
     batch = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
     if not batch:
         return None
-    
-    donor_info = None
-    
-    # If the batch has donation IDs stored, use the first one to get donor info
-    if batch.donation_ids and len(batch.donation_ids) > 0:
-        first_donation_id = batch.donation_ids[0]
-        
-        # Get the donation record
-        donation_record = db.query(models.DonationRecord).filter(
-            models.DonationRecord.donation_id == first_donation_id
-        ).first()
-        
-        if donation_record:
-            # Get the donor
-            donor = db.query(models.Donor).filter(
-                models.Donor.id == donation_record.donor_id
-            ).first()
-            
-            if donor:
-                donor_name = f"{donor.first_name or ''} {donor.last_name or ''}".strip()
-                donor_info = {
-                    "donor_hospital_number": donor.hospital_number,
-                    "donor_name": donor_name if donor_name else None
-                }
+
+    # Pooled donations in order, each with its donor, in one indexed join
+    donations = db.execute(
+        select(
+            models.DonationRecord.id,
+            models.DonationRecord.donation_id,
+            models.Donor.hospital_number,
+            models.Donor.first_name,
+            models.Donor.last_name,
+        )
+        .select_from(models.BatchDonation)
+        .join(models.DonationRecord, models.DonationRecord.id == models.BatchDonation.donation_record_id)
+        .join(models.Donor, models.Donor.id == models.DonationRecord.donor_id, isouter=True)
+        .where(models.BatchDonation.batch_id == batch_id)
+        .order_by(models.BatchDonation.position)
+    ).all()
 
     # Convert batch to dict
     batch_dict = {
@@ -339,52 +600,302 @@ def get_batch(db: Session, batch_id: str):
         "total_volume_ml": batch.total_volume_ml,
         "number_of_bottles": batch.number_of_bottles
     }
-    
-    # Add stored donation IDs
-    if batch.donation_ids:
-        batch_dict["donation_ids"] = batch.donation_ids
-    
-    # Add donor information if found
-    if donor_info:
-        batch_dict.update(donor_info)
-    
+
+    if donations:
+        batch_dict["donation_ids"] = [d.donation_id or d.id for d in donations]
+        # Donor information comes from the first donation in the batch
+        first = donations[0]
+        donor_name = f"{first.first_name or ''} {first.last_name or ''}".strip()
+        batch_dict.update({
+            "donor_hospital_number": first.hospital_number,
+            "donor_name": donor_name if donor_name else None
+        })
+
     return batch_dict
 
 
-def get_all_bottles(db: Session):
-    """Return bottles only from batches with 'Released' status with enriched data"""
-    bottles = db.query(models.Bottle).join(
-        models.Batch, models.Bottle.batch_id == models.Batch.id
-    ).filter(
-        models.Batch.status == models.BatchStatus.Released
+def get_batches_for_donation(db: Session, donation_identifier: str):
+    """
+    Batches a donation was pooled into, accepting either its id or donation_id.
+    One statement: the donation outer-joined through batch_donations, so an
+    unknown donation (no row, None) is told apart from an unpooled one ([]).
+    """
+    rows = db.execute(
+        select(models.DonationRecord.id, models.Batch)
+        .outerjoin(models.BatchDonation, models.BatchDonation.donation_record_id == models.DonationRecord.id)
+        .outerjoin(models.Batch, models.Batch.id == models.BatchDonation.batch_id)
+        .where(or_(models.DonationRecord.id == donation_identifier, models.DonationRecord.donation_id == donation_identifier))
     ).all()
-    
-    # Enrich bottles with batch and pasteurisation information
-    result = []
-    for bottle in bottles:
-        batch = db.query(models.Batch).filter(models.Batch.id == bottle.batch_id).first()
-        pasteurisation = db.query(models.PasteurisationRecord).filter(
-            models.PasteurisationRecord.batch_id == bottle.batch_id
-        ).order_by(models.PasteurisationRecord.end_time.desc()).first()
-        
-        bottle_dict = {
-            "id": bottle.id,
-            "barcode": bottle.barcode,
-            "batch_id": bottle.batch_id,
-            "batch_code": batch.batch_code if batch else None,
-            "hospital_number": batch.hospital_number if batch else None,
-            "volume_ml": bottle.volume_ml,
-            "status": bottle.status.name if bottle.status else None,
-            "allocated_at": bottle.allocated_at,
-            "administered_at": bottle.administered_at,
-            "administered_by": bottle.administered_by,
-            "patient_id": bottle.patient_id,
-            "defrost_started_at": bottle.defrost_started_at,
-            "pasteurisation_date": pasteurisation.end_time if pasteurisation else None,
-        }
-        result.append(bottle_dict)
-    
-    return result
+    if not rows:
+        return None
+    return [batch for _, batch in rows if batch is not None]
+
+
+def _name(first, last):
+    name = f"{first or ''} {last or ''}".strip()
+    return name or None
+
+
+def _bottle_distribution(db: Session, batch_ids: list):
+    """
+    Every bottle of the given batches with its dispatch and receiving
+    hospital, in one outer-joined query. Returns (bottles by batch id,
+    hospitals, patients) for the lineage and exposure views.
+    """
+    rows = db.execute(
+        select(
+            models.Bottle.id,
+            models.Bottle.batch_id,
+            models.Bottle.barcode,
+            models.Bottle.status,
+            models.Bottle.volume_ml,
+            models.Bottle.storage_location_id,
+            models.Bottle.allocated_to,
+            models.Bottle.patient_id,
+            models.Bottle.administered_at,
+            models.Dispatch.id.label("dispatch_id"),
+            models.Dispatch.dispatch_code,
+            models.Dispatch.status.label("dispatch_status"),
+            models.DispatchItem.scanned_out,
+            models.DispatchItem.scanned_in,
+            models.Hospital.id.label("hospital_id"),
+            models.Hospital.name.label("hospital_name"),
+        )
+        .outerjoin(models.DispatchItem, models.DispatchItem.bottle_id == models.Bottle.id)
+        .outerjoin(models.Dispatch, models.Dispatch.id == models.DispatchItem.dispatch_id)
+        .outerjoin(models.Hospital, models.Hospital.id == models.Dispatch.hospital_id)
+        .where(models.Bottle.batch_id.in_(batch_ids))
+        .order_by(models.Bottle.batch_id, models.Bottle.barcode)
+    ).all()
+
+    bottles = {batch_id: [] for batch_id in batch_ids}
+    hospitals = {}
+    patients = {}
+    for row in rows:
+        dispatch = None
+        if row.dispatch_id:
+            dispatch = {
+                "dispatch_id": row.dispatch_id,
+                "dispatch_code": row.dispatch_code,
+                "status": row.dispatch_status.name if row.dispatch_status else None,
+                "hospital_id": row.hospital_id,
+                "hospital_name": row.hospital_name,
+                "scanned_out": row.scanned_out,
+                "scanned_in": row.scanned_in,
+            }
+            hospital = hospitals.setdefault(row.hospital_id, {"hospital_id": row.hospital_id, "name": row.hospital_name, "bottle_ids": []})
+            hospital["bottle_ids"].append(row.id)
+        patient_id = row.patient_id or row.allocated_to
+        if patient_id:
+            patients.setdefault(patient_id, {"patient_id": patient_id, "bottle_ids": []})["bottle_ids"].append(row.id)
+        bottles[row.batch_id].append({
+            "bottle_id": row.id,
+            "barcode": row.barcode,
+            "status": row.status.name if row.status else None,
+            "volume_ml": row.volume_ml,
+            "storage_location": row.storage_location_id,
+            "allocated_to": row.allocated_to,
+            "patient_id": row.patient_id,
+            "administered_at": row.administered_at,
+            "dispatch": dispatch,
+        })
+    return bottles, list(hospitals.values()), list(patients.values())
+
+
+def get_batch_lineage(db: Session, batch_id: str):
+    """
+    Recall graph for a batch: its donations and donors upstream, and its
+    bottles, dispatches, hospitals and patients downstream. Three queries
+    whatever the size of the batch.
+    """
+    batch = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
+    if not batch:
+        return None
+    rows = db.execute(
+        select(
+            models.DonationRecord.id,
+            models.DonationRecord.donation_id,
+            models.DonationRecord.donation_date,
+            models.DonationRecord.volume_ml,
+            models.DonationRecord.status,
+            models.Donor.id.label("donor_id"),
+            models.Donor.donor_code,
+            models.Donor.hospital_number,
+            models.Donor.first_name,
+            models.Donor.last_name,
+            models.Donor.status.label("donor_status"),
+        )
+        .select_from(models.BatchDonation)
+        .join(models.DonationRecord, models.DonationRecord.id == models.BatchDonation.donation_record_id)
+        .join(models.Donor, models.Donor.id == models.DonationRecord.donor_id, isouter=True)
+        .where(models.BatchDonation.batch_id == batch_id)
+        .order_by(models.BatchDonation.position)
+    ).all()
+
+    donors = {}
+    donations = []
+    for row in rows:
+        donations.append({
+            "id": row.id,
+            "donation_id": row.donation_id,
+            "donation_date": row.donation_date,
+            "volume_ml": row.volume_ml,
+            "status": row.status.name if row.status else None,
+            "donor_id": row.donor_id,
+        })
+        if row.donor_id and row.donor_id not in donors:
+            donors[row.donor_id] = {
+                "id": row.donor_id,
+                "donor_code": row.donor_code,
+                "hospital_number": row.hospital_number,
+                "name": _name(row.first_name, row.last_name),
+                "status": row.donor_status.name if row.donor_status else None,
+            }
+
+    bottles, hospitals, patients = _bottle_distribution(db, [batch_id])
+    return {
+        "batch": {
+            "id": batch.id,
+            "batch_code": batch.batch_code,
+            "status": batch.status.name,
+            "batch_date": batch.batch_date,
+            "total_volume_ml": batch.total_volume_ml,
+        },
+        "donations": donations,
+        "donors": list(donors.values()),
+        "bottles": bottles[batch_id],
+        "hospitals": hospitals,
+        "patients": patients,
+    }
+
+
+def get_donor_exposure(db: Session, donor_id: str):
+    """
+    Reverse recall graph for a donor: every batch their donations were
+    pooled into and where those batches' bottles went. Three queries.
+    """
+    donor = db.execute(
+        select(models.Donor.id, models.Donor.donor_code, models.Donor.hospital_number,
+               models.Donor.first_name, models.Donor.last_name, models.Donor.status)
+        .where(models.Donor.id == donor_id)
+    ).first()
+    if not donor:
+        return None
+    rows = db.execute(
+        select(
+            models.DonationRecord.id,
+            models.DonationRecord.donation_id,
+            models.DonationRecord.donation_date,
+            models.DonationRecord.volume_ml,
+            models.DonationRecord.status,
+            models.Batch.id.label("batch_id"),
+            models.Batch.batch_code,
+            models.Batch.status.label("batch_status"),
+        )
+        .outerjoin(models.BatchDonation, models.BatchDonation.donation_record_id == models.DonationRecord.id)
+        .outerjoin(models.Batch, models.Batch.id == models.BatchDonation.batch_id)
+        .where(models.DonationRecord.donor_id == donor_id)
+        .order_by(models.DonationRecord.donation_date, models.DonationRecord.id)
+    ).all()
+
+    donations = {}
+    batches = {}
+    for row in rows:
+        donation = donations.setdefault(row.id, {
+            "id": row.id,
+            "donation_id": row.donation_id,
+            "donation_date": row.donation_date,
+            "volume_ml": row.volume_ml,
+            "status": row.status.name if row.status else None,
+            "batch_ids": [],
+        })
+        if row.batch_id:
+            donation["batch_ids"].append(row.batch_id)
+            batches.setdefault(row.batch_id, {
+                "id": row.batch_id,
+                "batch_code": row.batch_code,
+                "status": row.batch_status.name if row.batch_status else None,
+            })
+
+    bottles, hospitals, patients = _bottle_distribution(db, list(batches)) if batches else ({}, [], [])
+    for batch_id, batch in batches.items():
+        batch["bottles"] = bottles[batch_id]
+    return {
+        "donor": {
+            "id": donor.id,
+            "donor_code": donor.donor_code,
+            "hospital_number": donor.hospital_number,
+            "name": _name(donor.first_name, donor.last_name),
+            "status": donor.status.name if donor.status else None,
+        },
+        "donations": list(donations.values()),
+        "batches": list(batches.values()),
+        "hospitals": hospitals,
+        "patients": patients,
+    }
+
+
+def _bottle_inventory_query():
+    """Projected bottle rows from released batches with the latest pasteurisation end time."""
+    # Latest pasteurisation end time per batch, joined once rather than per bottle
+    latest_pasteurisation = (
+        select(
+            models.PasteurisationRecord.batch_id.label("batch_id"),
+            func.max(models.PasteurisationRecord.end_time).label("end_time"),
+        )
+        .group_by(models.PasteurisationRecord.batch_id)
+        .subquery()
+    )
+    return (
+        select(
+            models.Bottle.id,
+            models.Bottle.barcode,
+            models.Bottle.batch_id,
+            models.Batch.batch_code,
+            models.Batch.hospital_number,
+            models.Bottle.volume_ml,
+            models.Bottle.status,
+            models.Bottle.allocated_at,
+            models.Bottle.administered_at,
+            models.Bottle.administered_by,
+            models.Bottle.patient_id,
+            models.Bottle.defrost_started_at,
+            latest_pasteurisation.c.end_time.label("pasteurisation_date"),
+        )
+        .join(models.Batch, models.Bottle.batch_id == models.Batch.id)
+        .outerjoin(latest_pasteurisation, latest_pasteurisation.c.batch_id == models.Bottle.batch_id)
+        .where(models.Batch.status == models.BatchStatus.Released)
+    )
+
+
+def _bottle_inventory_dict(row):
+    bottle_dict = row._asdict()
+    bottle_dict.pop("cursor_created_at", None)
+    bottle_dict.pop("cursor_id", None)
+    bottle_dict["status"] = row.status.name if row.status else None
+    return bottle_dict
+
+
+def get_all_bottles(db: Session):
+    """Return bottles only from batches with 'Released' status with enriched data.
+
+    Batch columns and the latest pasteurisation end time are projected in a
+    single statement, so the cost does not grow with the number of bottles.
+    """
+    rows = db.execute(_bottle_inventory_query()).all()
+    return [_bottle_inventory_dict(row) for row in rows]
+
+
+def get_bottles_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, status: str = None,
+                     hospital_number: str = None, created_from=None, created_to=None):
+    stmt = _bottle_inventory_query()
+    if status:
+        stmt = stmt.where(models.Bottle.status == _parse_status(models.BottleStatus, status))
+    if hospital_number:
+        stmt = stmt.where(models.Batch.hospital_number == hospital_number)
+    stmt = _created_between(stmt, models.Bottle.created_at, created_from, created_to)
+    rows, next_cursor = _keyset_page(db, stmt, models.Bottle.created_at, models.Bottle.id, cursor, limit)
+    return {"items": [_bottle_inventory_dict(row) for row in rows], "next_cursor": next_cursor}
 
 
 def get_bottle(db: Session, bottle_id: str):
@@ -450,11 +961,16 @@ def administer_bottle(db: Session, bottle_id: str, administered_by: str):
 
 def discard_bottle(db: Session, bottle_id: str, reason: str):
     """Mark bottle as discarded"""
+    from .state_machines import transition_bottle_state
+    from transitions.core import MachineError
     bottle = get_bottle(db, bottle_id)
     if not bottle:
         raise IntegrityError("Bottle not found", params={}, orig=None)
     
-    bottle.status = models.BottleStatus.Discarded
+    try:
+        transition_bottle_state(bottle, 'discard')
+    except MachineError as e:
+        raise IntegrityError(f"Invalid state transition: {str(e)}", params={}, orig=None)
     bottle.admin_status = reason
     
     db.commit()
@@ -466,6 +982,18 @@ def get_all_dispatches(db: Session):
     return db.query(models.Dispatch).all()
 
 
+def get_dispatches_page(db: Session, cursor: str = None, limit: int = DEFAULT_PAGE_SIZE, status: str = None,
+                        hospital_id: str = None, created_from=None, created_to=None):
+    stmt = select(models.Dispatch)
+    if status:
+        stmt = stmt.where(models.Dispatch.status == _parse_status(models.DispatchStatus, status))
+    if hospital_id:
+        stmt = stmt.where(models.Dispatch.hospital_id == hospital_id)
+    stmt = _created_between(stmt, models.Dispatch.created_at, created_from, created_to)
+    rows, next_cursor = _keyset_page(db, stmt, models.Dispatch.created_at, models.Dispatch.id, cursor, limit)
+    return {"items": [row[0] for row in rows], "next_cursor": next_cursor}
+
+
 def get_dispatch(db: Session, dispatch_id: str):
     return db.query(models.Dispatch).filter(models.Dispatch.id == dispatch_id).first()
 
@@ -548,19 +1076,26 @@ def accept_donation(db: Session, donation_id: str, user_id: str = None):
 
 def _resolve_donations_for_batch(db: Session, donation_ids: list):
     """Resolve donation identifiers to DonationRecord objects"""
+    # One IN query matches identifiers against either the id or donation_id field
+    found = db.query(models.DonationRecord).filter(
+        or_(models.DonationRecord.id.in_(donation_ids), models.DonationRecord.donation_id.in_(donation_ids))
+    ).all()
+    by_identifier = {}
+    for d in found:
+        by_identifier[d.id] = d
+        if d.donation_id:
+            by_identifier[d.donation_id] = d
+
     resolved = []
     missing = []
-
+    seen = set()
     for identifier in donation_ids:
-        # Look up by either id or donation_id field
-        d = db.query(models.DonationRecord).filter(
-            (models.DonationRecord.id == identifier) | (models.DonationRecord.donation_id == identifier)
-        ).first()
-        
-        if d:
-            resolved.append(d)
-        else:
+        d = by_identifier.get(identifier)
+        if d is None:
             missing.append(identifier)
+        elif d.id not in seen:
+            seen.add(d.id)
+            resolved.append(d)
 
     if missing:
         raise IntegrityError(f"Some donations not found: {', '.join(missing)}", params={}, orig=None)
@@ -568,8 +1103,38 @@ def _resolve_donations_for_batch(db: Session, donation_ids: list):
     return resolved
 
 
+BATCH_CODE_MAX_SEQUENCE = int(os.getenv("BATCH_CODE_MAX_SEQUENCE", "999"))
+
+_BATCH_CODE_SEQ = re.compile(r"^(.*)-(\d+)$")
+
+
+def split_batch_code(batch_code: str):
+    """Split "BASE-NNN" into ("BASE", NNN); codes without a numeric suffix are (code, 0)."""
+    match = _BATCH_CODE_SEQ.match(batch_code)
+    if match:
+        return match.group(1), int(match.group(2))
+    return batch_code, 0
+
+
+def get_next_batch_code(db: Session, base_code: str) -> str:
+    """
+    Return base_code if unused, otherwise base_code-NNN one past the highest suffix.
+    Both checks are single probes on the batch_code and (base_code, code_seq) indexes.
+    """
+    exists = db.query(models.Batch.id).filter(models.Batch.batch_code == base_code).first()
+    if not exists:
+        return base_code
+    max_sequence = db.query(func.max(models.Batch.code_seq)).filter(models.Batch.base_code == base_code).scalar() or 0
+    next_sequence = max_sequence + 1
+    if next_sequence > BATCH_CODE_MAX_SEQUENCE:  # Safety limit
+        raise IntegrityError(f"Cannot generate unique batch code for {base_code}", params={}, orig=None)
+    return f"{base_code}-{next_sequence:03d}"
+
+
 def assign_donations_to_batch(db: Session, donation_ids: list, batch_code: str, user_id: str = None, 
                               batch_date = None, hospital_number: str = None, number_of_bottles: int = None, bottle_volumes: list = None):
+    # Take the write lock first so two batches cannot be given the same sequenced code
+    _begin_write_transaction(db)
     # Resolve donation IDs to DonationRecord objects
     donations = _resolve_donations_for_batch(db, donation_ids)
     for d in donations:
@@ -578,61 +1143,35 @@ def assign_donations_to_batch(db: Session, donation_ids: list, batch_code: str,
             identifier = d.donation_id or d.id
             raise IntegrityError(f"Donation {identifier} is already used in another batch (status: {d.status.name})", params={}, orig=None)
 
-    # Check if batch code already exists and find next available sequence number
-    import re
-    existing_batch = db.query(models.Batch).filter(models.Batch.batch_code == batch_code).first()
-    if existing_batch:
-        # Find all batches with same base code (including sequenced variants)
-        all_batches = db.query(models.Batch.batch_code).filter(
-            models.Batch.batch_code.like(f"{batch_code}%")
-        ).all()
-        
-        # Extract sequence numbers from batch codes
-        max_sequence = 0
-        for (code,) in all_batches:
-            if code == batch_code:
-                max_sequence = max(max_sequence, 0)  # Base code exists
-            else:
-                # Try to extract sequence number (format: BATCH-CODE-###)
-                match = re.match(rf"{re.escape(batch_code)}-(\d+)", code)
-                if match:
-                    seq_num = int(match.group(1))
-                    max_sequence = max(max_sequence, seq_num)
-        
-        # Generate next sequence number
-        next_sequence = max_sequence + 1
-        if next_sequence > 999:  # Safety limit
-            raise IntegrityError(f"Cannot generate unique batch code for {batch_code}", params={}, orig=None)
-        batch_code = f"{batch_code}-{next_sequence:03d}"
+    batch_code = get_next_batch_code(db, batch_code)
+    base_code, code_seq = split_batch_code(batch_code)
 
     batch = models.Batch(
-        batch_code=batch_code, 
+        batch_code=batch_code,
+        base_code=base_code,
+        code_seq=code_seq,
         total_volume_ml=sum(d.volume_ml for d in donations),
         batch_date=batch_date,
         hospital_number=hospital_number,
         number_of_bottles=number_of_bottles,
-        donation_ids=donation_ids  # Store the original donation IDs
     )
     db.add(batch)
-    db.commit()
-    db.refresh(batch)
+    db.flush()
+    db.add_all([
+        models.BatchDonation(batch_id=batch.id, donation_record_id=d.id, position=i)
+        for i, d in enumerate(donations)
+    ])
 
     # Create bottles if number_of_bottles is specified
     if number_of_bottles and number_of_bottles > 0:
-        from .barcode import gen_uuid
-        
+        volumes = []
         for i in range(number_of_bottles):
             # Use volume from bottle_volumes array if provided, otherwise default to 50ml
             if bottle_volumes and i < len(bottle_volumes):
-                bottle_volume = bottle_volumes[i]
+                volumes.append(bottle_volumes[i])
             else:
-                bottle_volume = 50.0  # Default to 50ml
-            
-            code = gen_uuid()
-            bt = models.Bottle(barcode=code, batch_id=batch.id, volume_ml=bottle_volume)
-            db.add(bt)
-            db.flush()
-            _create_audit(db, user_id, "create", "bottle", bt.id, before=None, after={"barcode": bt.barcode, "batch_id": batch.id, "volume_ml": bottle_volume})
+                volumes.append(50.0)  # Default to 50ml
+        _add_bottles(db, batch.id, volumes, user_id, audit_volume=True)
 
     from .state_machines import transition_donation_state
     from transitions.core import MachineError
@@ -736,81 +1275,135 @@ def post_micro_result(db: Session, sample_id: str, organism: str, quantitative_v
     return r
 
 
-def process_post_pasteurisation_results(db: Session, batch_id: str, user_id: str = None):
+def _post_pasteurisation_summaries(db: Session, batch_ids: list) -> dict:
     """
-    Check all post-pasteurisation samples for a batch and update status:
-    - All negative → Tested → Released
-    - Any positive → TestingFailed
+    One aggregate over samples and results for the given batches:
+    batch_id -> (sample count, samples with a result, any positive result).
     """
+    rows = db.execute(
+        select(
+            models.Sample.batch_id,
+            func.count(func.distinct(models.Sample.id)),
+            func.count(func.distinct(models.MicroResult.sample_id)),
+            func.max(case((models.MicroResult.threshold_flag == True, 1), else_=0)),
+        )
+        .outerjoin(models.MicroResult, models.MicroResult.sample_id == models.Sample.id)
+        .where(models.Sample.batch_id.in_(batch_ids), models.Sample.sample_type == 'post-pasteurisation')
+        .group_by(models.Sample.batch_id)
+    ).all()
+    return {batch_id: (samples, with_results, bool(positive)) for batch_id, samples, with_results, positive in rows}
+
+
+def _release_batch_bottles(db: Session, batch_ids: list):
+    """Set every bottle of the given batches to Available with one UPDATE, keeping the counters in step."""
+    changed = db.execute(
+        select(models.Bottle.status, func.count(), func.coalesce(func.sum(models.Bottle.volume_ml), 0.0))
+        .where(models.Bottle.batch_id.in_(batch_ids), models.Bottle.status != models.BottleStatus.Available)
+        .group_by(models.Bottle.status)
+    ).all()
+    if not changed:
+        return
+    deltas = stats.new_deltas()
+    for status, count, volume in changed:
+        stats.add_delta(deltas, "bottle", status, -count, -volume)
+        stats.add_delta(deltas, "bottle", models.BottleStatus.Available, count, volume)
+    db.execute(
+        update(models.Bottle)
+        .where(models.Bottle.batch_id.in_(batch_ids), models.Bottle.status != models.BottleStatus.Available)
+        .values(status=models.BottleStatus.Available)
+    )
+    stats.apply_status_deltas(db.connection(), deltas)
+
+
+def _apply_post_pasteurisation_outcome(db: Session, b: models.Batch, summary, user_id: str = None):
+    """Validate a batch's sample summary and move it to TestingFailed or Released; returns True if released."""
     from .state_machines import transition_batch_state
     from transitions.core import MachineError
-    
-    b = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
-    if not b:
-        raise IntegrityError("Batch not found", params={}, orig=None)
-    
-    # Get all post-pasteurisation samples for this batch
-    samples = db.query(models.Sample).filter(
-        models.Sample.batch_id == batch_id,
-        models.Sample.sample_type == 'post-pasteurisation'
-    ).all()
-    
-    if not samples or len(samples) < 2:
+
+    samples, with_results, has_positive = summary or (0, 0, False)
+    if samples < 2:
         raise IntegrityError("Insufficient post-pasteurisation samples", params={}, orig=None)
-    
-    # Check if all samples have results
-    all_have_results = all(
-        db.query(models.MicroResult).filter(
-            models.MicroResult.sample_id == sample.id
-        ).first() is not None
-        for sample in samples
-    )
-    
-    if not all_have_results:
+    if with_results < samples:
         raise IntegrityError("Not all samples have results posted", params={}, orig=None)
-    
-    # Check for any positive results
-    has_positive = False
-    for sample in samples:
-        result = db.query(models.MicroResult).filter(
-            models.MicroResult.sample_id == sample.id
-        ).first()
-        if result and result.threshold_flag:
-            has_positive = True
-            break
-    
+
     before = {"status": b.status.name}
-    
+    released = False
     try:
         if has_positive:
             # Any positive result → fail
             transition_batch_state(b, 'fail_testing')
-            _create_audit(db, user_id or 'system', "fail_testing", "batch", b.id, 
+            _create_audit(db, user_id or 'system', "fail_testing", "batch", b.id,
                          before=before, after={"status": b.status.name, "reason": "positive_culture"})
         else:
             # All negative → tested (if not already), then auto-release
             if b.status != models.BatchStatus.Tested and b.status != models.BatchStatus.Released:
                 transition_batch_state(b, 'mark_tested')
-            
+
             # Only release if not already released
             if b.status != models.BatchStatus.Released:
                 transition_batch_state(b, 'release')
-                
-                # Set all bottles in this batch to Available status
-                bottles = db.query(models.Bottle).filter(models.Bottle.batch_id == batch_id).all()
-                for bottle in bottles:
-                    bottle.status = models.BottleStatus.Available
-            
-            _create_audit(db, user_id or 'system', "auto_release", "batch", b.id, 
+                released = True
+
+            _create_audit(db, user_id or 'system', "auto_release", "batch", b.id,
                          before=before, after={"status": b.status.name, "reason": "negative_post_pasteurisation"})
     except MachineError as e:
         raise IntegrityError(f"Invalid state transition: {str(e)}", params={}, orig=None)
-    
+    return released
+
+
+def process_post_pasteurisation_results(db: Session, batch_id: str, user_id: str = None):
+    """
+    Check all post-pasteurisation samples for a batch and update status:
+    - All negative → Tested → Released
+    - Any positive → TestingFailed
+    """
+    b = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
+    if not b:
+        raise IntegrityError("Batch not found", params={}, orig=None)
+
+    summary = _post_pasteurisation_summaries(db, [batch_id]).get(batch_id)
+    if _apply_post_pasteurisation_outcome(db, b, summary, user_id):
+        # Set all bottles in this batch to Available status
+        db.flush()
+        _release_batch_bottles(db, [batch_id])
+
     db.commit()
     db.refresh(b)
     return b
 
 
+def process_pending_post_pasteurisation_results(db: Session, user_id: str = None) -> list:
+    """
+    Evaluate every MicroTestPending batch in one pass and one transaction.
+    Batches whose samples are incomplete are left pending and reported with
+    the reason; the rest are failed or released as in the single-batch path.
+    Each batch is evaluated inside its own SAVEPOINT, so a batch that fails
+    part-way through its transitions is rolled back completely.
+    """
+    batches = db.query(models.Batch).filter(models.Batch.status == models.BatchStatus.MicroTestPending).all()
+    summaries = _post_pasteurisation_summaries(db, [b.id for b in batches]) if batches else {}
+    results = []
+    released_ids = []
+    for b in batches:
+        savepoint = db.begin_nested()
+        try:
+            released = _apply_post_pasteurisation_outcome(db, b, summaries.get(b.id), user_id)
+            db.flush()
+        except IntegrityError as e:
+            savepoint.rollback()
+            results.append({"batch_id": b.id, "batch_code": b.batch_code, "status": b.status.name, "processed": False, "error": e.statement})
+            continue
+        savepoint.commit()
+        if released:
+            released_ids.append(b.id)
+        results.append({"batch_id": b.id, "batch_code": b.batch_code, "status": b.status.name, "processed": True})
+    db.flush()
+    if released_ids:
+        _release_batch_bottles(db, released_ids)
+    db.commit()
+    return results
+
+
 def release_batch(db: Session, batch_id: str, approver_id: str, approver2_id: str = None):
     from .state_machines import transition_batch_state
     from transitions.core import MachineError
@@ -831,29 +1424,232 @@ def release_batch(db: Session, batch_id: str, approver_id: str, approver2_id: st
     return b
 
 
+def archive_audit_events(db: Session, before, approver_id: str, approver2_id: str) -> int:
+    """
+    Move audit events older than ``before`` into the archive, with two-person
+    approval as for a batch release, and audit the archive run itself.
+    """
+    if not approver_id or not approver2_id:
+        raise IntegrityError("Two-person approval required", params={}, orig=None)
+    if approver_id == approver2_id:
+        raise IntegrityError("The two approvers must be different people", params={}, orig=None)
+    try:
+        archived = audit.archive_events(db, before)
+    except ValueError as e:
+        raise IntegrityError(str(e), params={}, orig=None)
+    _create_audit(db, approver_id, "archive", "audit_log", "audit_events_archive", before=None,
+                  after={"before": before.isoformat(), "archived": archived, "approved_by": [approver_id, approver2_id]})
+    db.commit()
+    return archived
+
+
+def _bottle_use_error(trigger: str, bottle, batch, admin_user2: str = None, now=None):
+    """
+    The checks allocating, defrosting and administering a bottle make beyond
+    its status, shared by the single-bottle functions and ``bulk_transition``;
+    None when satisfied. ``batch`` is the bottle's batch, None if it is missing.
+    """
+    from datetime import datetime, timedelta, timezone
+    if trigger not in ("allocate", "start_defrosting", "administer"):
+        return None
+    if not batch or batch.status != models.BatchStatus.Released:
+        return {
+            "allocate": "Cannot allocate bottle - batch not released",
+            "start_defrosting": "Cannot defrost bottle - batch not released",
+            "administer": "Bottle's batch not released",
+        }[trigger]
+    if trigger == "allocate" and bottle.allocated_to:
+        return f"Bottle already allocated to {bottle.allocated_to}"
+    if trigger == "start_defrosting" and bottle.defrost_started_at:
+        return f"Bottle already defrosted at {bottle.defrost_started_at}"
+    if trigger == "administer":
+        if not admin_user2:
+            return "Two-person administration required"
+        # defrost window check: must be within 24 hours of defrost_started_at
+        if not bottle.defrost_started_at:
+            return "Bottle not defrosted"
+        defrost_time = bottle.defrost_started_at
+        if defrost_time.tzinfo is None:
+            defrost_time = defrost_time.replace(tzinfo=timezone.utc)
+        if (now or datetime.now(timezone.utc)) - defrost_time > timedelta(hours=24):
+            return "Defrost window exceeded (24 hour limit)"
+    return None
+
+
+def _check_bottle_use(db: Session, trigger: str, bottle, admin_user2: str = None):
+    """Raise IntegrityError if ``_bottle_use_error`` finds a problem with a single-bottle call."""
+    batch = db.query(models.Batch).filter(models.Batch.id == bottle.batch_id).first()
+    error = _bottle_use_error(trigger, bottle, batch, admin_user2)
+    if error:
+        raise IntegrityError(error, params={}, orig=None)
+
+
+def _transition_targets():
+    """entity_type -> (model, compiled transition table) accepted by ``bulk_transition``."""
+    from .state_machines import BATCH_TABLE, DONATION_TABLE, BOTTLE_TABLE
+    return {
+        "batch": (models.Batch, BATCH_TABLE),
+        "donation": (models.DonationRecord, DONATION_TABLE),
+        "bottle": (models.Bottle, BOTTLE_TABLE),
+    }
+
+
+def _transition_precondition_error(op: dict, entity, approved_donors: set, batches: dict, now):
+    """The checks the single-entity endpoints make beyond the state machine; None when satisfied."""
+    entity_type, trigger = op["entity_type"], op["trigger"]
+    if entity_type == "batch" and trigger == "release" and not op.get("approver2_id"):
+        return "Two-person approval required"
+    if entity_type == "donation" and trigger == "accept" and entity.donor_id not in approved_donors:
+        return "Donor not approved"
+    if entity_type == "bottle" and trigger == "allocate" and not op.get("patient_id"):
+        return "patient_id is required"
+    if entity_type == "bottle":
+        return _bottle_use_error(trigger, entity, batches.get(entity.batch_id), op.get("admin_user2"), now)
+    return None
+
+
+def _apply_transition_side_effects(db: Session, op: dict, entity, user_id: str, now) -> dict:
+    """Record the fields the single-entity endpoints set alongside the status; returns extra audit/result data."""
+    entity_type, trigger = op["entity_type"], op["trigger"]
+    if entity_type == "batch" and trigger == "start_pasteurisation":
+        record = models.PasteurisationRecord(id=gen_uuid(), batch_id=entity.id, device_id=op.get("device_id"), operator_id=user_id, start_time=now)
+        db.add(record)
+        return {"record_id": record.id}
+    if entity_type == "batch" and trigger == "release":
+        return {"approved_by": [user_id, op.get("approver2_id")]}
+    if entity_type == "bottle" and trigger == "allocate":
+        entity.patient_id = op.get("patient_id")
+        entity.allocated_to = user_id
+        entity.allocated_at = now
+        return {"patient_id": entity.patient_id}
+    if entity_type == "bottle" and trigger == "start_defrosting":
+        entity.defrost_started_at = now
+    elif entity_type == "bottle" and trigger == "administer":
+        entity.administered_at = now
+        entity.administered_by = user_id
+        return {"admin_by": [user_id, op.get("admin_user2")]}
+    elif entity_type == "bottle" and trigger == "discard":
+        entity.admin_status = op.get("reason") or ""
+        return {"reason": entity.admin_status}
+    return {}
+
+
+def bulk_transition(db: Session, operations: list, user_id: str = None, atomic: bool = True) -> dict:
+    """
+    Apply a list of {entity_type, id, trigger} operations in one transaction.
+
+    Entities are loaded with one query per entity type and each operation is
+    checked against the compiled state machine tables, in order, so several
+    operations on the same entity chain. With ``atomic`` the run is one
+    savepoint and any failure rolls all of it back; otherwise each operation
+    is its own savepoint, so the valid ones are applied and the failures
+    reported. Each operation gets a result of "applied", "failed" or
+    "rolled_back".
+    """
+    from datetime import datetime, timezone
+    from .state_machines import next_state
+    from transitions.core import MachineError
+
+    targets = _transition_targets()
+    _begin_write_transaction(db)
+
+    ids_by_type = {}
+    for op in operations:
+        if op.get("entity_type") in targets:
+            ids_by_type.setdefault(op["entity_type"], set()).add(op.get("id"))
+    entities = {}
+    for entity_type, ids in ids_by_type.items():
+        model = targets[entity_type][0]
+        for entity in db.query(model).filter(model.id.in_(ids)):
+            entities[(entity_type, entity.id)] = entity
+
+    donor_ids = {
+        entities[("donation", op["id"])].donor_id
+        for op in operations
+        if op.get("entity_type") == "donation" and op.get("trigger") == "accept" and ("donation", op.get("id")) in entities
+    }
+    approved_donors = set(db.execute(
+        select(models.Donor.id).where(models.Donor.id.in_(donor_ids), models.Donor.status == models.DonorStatus.Approved)
+    ).scalars()) if donor_ids else set()
+    batch_ids = {entity.batch_id for (entity_type, _), entity in entities.items() if entity_type == "bottle"}
+    batches = {
+        b.id: b for b in db.query(models.Batch).filter(models.Batch.id.in_(batch_ids))
+    } if batch_ids else {}
+
+    now = datetime.now(timezone.utc)
+    results = []
+    completed_batches = []
+    # In atomic mode the whole run is one savepoint, undone if any operation fails
+    run = db.begin_nested() if atomic else None
+    for op in operations:
+        entity_type, entity_id, trigger = op.get("entity_type"), op.get("id"), op.get("trigger")
+        result = {"entity_type": entity_type, "id": entity_id, "trigger": trigger}
+        results.append(result)
+        entity = entities.get((entity_type, entity_id))
+        if entity_type not in targets:
+            error = f"Unknown entity type: {entity_type}"
+        elif entity is None:
+            error = f"{entity_type.capitalize()} not found"
+        else:
+            error = _transition_precondition_error(op, entity, approved_donors, batches, now)
+        dest = None
+        if error is None:
+            try:
+                dest = next_state(targets[entity_type][1], entity.status, trigger)
+            except (MachineError, ValueError) as e:
+                error = f"Invalid state transition: {str(e)}"
+        if error is not None:
+            result.update(result="failed", error=error)
+            continue
+
+        # Outside atomic mode each operation gets its own savepoint, so one the
+        # database rejects is undone alone and the rest still commit
+        savepoint = None if atomic else db.begin_nested()
+        before = {"status": entity.status.name}
+        entity.status = dest
+        extra = _apply_transition_side_effects(db, op, entity, user_id, now)
+        _create_audit(db, user_id, trigger, entity_type, entity.id, before=before, after={"status": dest.name, **extra})
+        if savepoint is not None:
+            try:
+                db.flush()
+            except IntegrityError as e:
+                savepoint.rollback()
+                result.update(result="failed", error=str(e.orig))
+                continue
+            savepoint.commit()
+        if entity_type == "batch" and trigger == "complete_pasteurisation":
+            completed_batches.append(entity.id)
+        result.update(result="applied", status=dest.name, **extra)
+
+    failed = any(r["result"] == "failed" for r in results)
+    if atomic and failed:
+        run.rollback()
+        db.commit()
+        for r in results:
+            if r["result"] == "applied":
+                r["result"] = "rolled_back"
+        return {"applied": 0, "failed": sum(r["result"] == "failed" for r in results), "results": results}
+    if atomic:
+        run.commit()
+
+    if completed_batches:
+        db.flush()
+        db.execute(
+            update(models.PasteurisationRecord)
+            .where(models.PasteurisationRecord.batch_id.in_(completed_batches), models.PasteurisationRecord.end_time.is_(None))
+            .values(end_time=now)
+        )
+    db.commit()
+    applied = sum(r["result"] == "applied" for r in results)
+    return {"applied": applied, "failed": len(results) - applied, "results": results}
+
+
 def administer_bottle(db: Session, bottle_id: str, baby_id: str, admin_user1: str, admin_user2: str):
     bottle = db.query(models.Bottle).filter(models.Bottle.id == bottle_id).first()
     if not bottle:
         raise IntegrityError("Bottle not found", params={}, orig=None)
-    # ensure batch released
-    batch = db.query(models.Batch).filter(models.Batch.id == bottle.batch_id).first()
-    if not batch or batch.status != models.BatchStatus.Released:
-        raise IntegrityError("Bottle's batch not released", params={}, orig=None)
-    # defrost window check: must be within 24 hours of defrost_started_at
-    from datetime import datetime, timedelta, timezone
-
-    if not bottle.defrost_started_at:
-        raise IntegrityError("Bottle not defrosted", params={}, orig=None)
-    
-    # Use timezone-aware datetime to match database timestamp
-    now = datetime.now(timezone.utc)
-    # If defrost_started_at is naive, make it timezone-aware
-    defrost_time = bottle.defrost_started_at
-    if defrost_time.tzinfo is None:
-        defrost_time = defrost_time.replace(tzinfo=timezone.utc)
-    
-    if now - defrost_time > timedelta(hours=24):
-        raise IntegrityError("Defrost window exceeded (24 hour limit)", params={}, orig=None)
+    # batch released, second administrator, and within 24 hours of defrost_started_at
+    _check_bottle_use(db, "administer", bottle, admin_user2)
     # record administration
     bottle.allocated_to = baby_id
     bottle.admin_status = "Administered"
@@ -872,14 +1668,8 @@ def allocate_bottle(db: Session, bottle_id: str, baby_id: str, user_id: str = No
     if not bottle:
         raise IntegrityError("Bottle not found", params={}, orig=None)
     
-    # Ensure batch is released
-    batch = db.query(models.Batch).filter(models.Batch.id == bottle.batch_id).first()
-    if not batch or batch.status != models.BatchStatus.Released:
-        raise IntegrityError("Cannot allocate bottle - batch not released", params={}, orig=None)
-    
-    # Check if already allocated
-    if bottle.allocated_to:
-        raise IntegrityError(f"Bottle already allocated to {bottle.allocated_to}", params={}, orig=None)
+    # Ensure batch is released and the bottle not already allocated
+    _check_bottle_use(db, "allocate", bottle)
     
     before = {"allocated_to": bottle.allocated_to}
     bottle.allocated_to = baby_id
@@ -901,14 +1691,8 @@ def defrost_bottle(db: Session, bottle_id: str, user_id: str = None):
     if not bottle:
         raise IntegrityError("Bottle not found", params={}, orig=None)
     
-    # Ensure batch is released
-    batch = db.query(models.Batch).filter(models.Batch.id == bottle.batch_id).first()
-    if not batch or batch.status != models.BatchStatus.Released:
-        raise IntegrityError("Cannot defrost bottle - batch not released", params={}, orig=None)
-    
-    # Check if already defrosted
-    if bottle.defrost_started_at:
-        raise IntegrityError(f"Bottle already defrosted at {bottle.defrost_started_at}", params={}, orig=None)
+    # Ensure batch is released and the bottle not already defrosted
+    _check_bottle_use(db, "start_defrosting", bottle)
     
     before = {"defrost_started_at": None}
     bottle.defrost_started_at = datetime.now(timezone.utc)
@@ -923,22 +1707,33 @@ from .barcode import gen_uuid
 import requests
 
 
+def _add_bottles(db: Session, batch_id: str, volumes: list, user_id: str = None, audit_volume: bool = False):
+    """
+    Stage one bottle per volume plus its audit row.
+    Ids are assigned up front so the bottles are written by a single batched
+    INSERT at the next flush instead of one flush per bottle.
+    """
+    bottles = []
+    for volume in volumes:
+        bt = models.Bottle(id=gen_uuid(), barcode=gen_uuid(), batch_id=batch_id, volume_ml=volume)
+        after = {"barcode": bt.barcode, "batch_id": batch_id}
+        if audit_volume:
+            after["volume_ml"] = volume
+        bottles.append(bt)
+        _create_audit(db, user_id, "create", "bottle", bt.id, before=None, after=after)
+    db.add_all(bottles)
+    return bottles
+
+
 def create_bottles_for_batch(db: Session, batch_id: str, count: int = 1, volume_ml: float = 30.0, user_id: str = None):
     b = db.query(models.Batch).filter(models.Batch.id == batch_id).first()
     if not b:
         raise IntegrityError("Batch not found", params={}, orig=None)
-    bottles = []
-    for i in range(count):
-        code = gen_uuid()
-        bt = models.Bottle(barcode=code, batch_id=batch_id, volume_ml=volume_ml)
-        db.add(bt)
-        db.flush()
-        bottles.append(bt)
-        _create_audit(db, user_id, "create", "bottle", bt.id, before=None, after={"barcode": bt.barcode, "batch_id": batch_id})
+    bottles = _add_bottles(db, batch_id, [volume_ml] * count, user_id)
+    ids = [bt.id for bt in bottles]
     db.commit()
-    for bt in bottles:
-        db.refresh(bt)
-    return bottles
+    # Reload the expired instances with one IN query rather than a refresh per bottle
+    return db.query(models.Bottle).filter(models.Bottle.id.in_(ids)).all() if ids else []
 
 
 def create_hospital(db: Session, name: str, fhir_endpoint: str = None, contact_info: dict = None, created_by: str = None):
@@ -956,40 +1751,71 @@ def create_dispatch(db: Session, bottle_ids: list, hospital_id: str, dispatch_co
     hosp = db.query(models.Hospital).filter(models.Hospital.id == hospital_id).first()
     if not hosp:
         raise IntegrityError("Hospital not found", params={}, orig=None)
+    seen, duplicates = set(), []
+    for bid in bottle_ids:
+        if bid in seen and bid not in duplicates:
+            duplicates.append(bid)
+        seen.add(bid)
+    if duplicates:
+        raise IntegrityError(f"Bottles listed more than once: {', '.join(duplicates)}", params={}, orig=None)
     bottles = db.query(models.Bottle).filter(models.Bottle.id.in_(bottle_ids)).all()
     if len(bottles) != len(bottle_ids):
-        raise IntegrityError("Some bottles not found", params={}, orig=None)
-    # ensure bottles' batches are released
-    for bt in bottles:
-        batch = db.query(models.Batch).filter(models.Batch.id == bt.batch_id).first()
-        if not batch or batch.status != models.BatchStatus.Released:
-            raise IntegrityError(f"Bottle {bt.id} not from released batch", params={}, orig=None)
-        # ensure not already dispatched
-        existing = db.query(models.DispatchItem).filter(models.DispatchItem.bottle_id == bt.id).first()
-        if existing:
-            raise IntegrityError(f"Bottle {bt.id} already dispatched", params={}, orig=None)
-
-    disp = models.Dispatch(dispatch_code=dispatch_code, hospital_id=hospital_id, created_by=created_by, shipper=shipper, manifest={"count": len(bottles)})
+        found = {bt.id for bt in bottles}
+        missing = [bid for bid in bottle_ids if bid not in found]
+        raise IntegrityError(f"Some bottles not found: {', '.join(missing)}", params={}, orig=None)
+    ids = [bt.id for bt in bottles]
+    # every bottle whose batch is missing or not released, in one query
+    unreleased = db.execute(
+        select(models.Bottle.id)
+        .outerjoin(models.Batch, models.Batch.id == models.Bottle.batch_id)
+        .where(models.Bottle.id.in_(ids), or_(models.Batch.id.is_(None), models.Batch.status != models.BatchStatus.Released))
+    ).scalars().all()
+    if unreleased:
+        raise IntegrityError(f"Bottles not from released batch: {', '.join(sorted(unreleased))}", params={}, orig=None)
+    dispatched = db.execute(
+        select(models.DispatchItem.bottle_id).where(models.DispatchItem.bottle_id.in_(ids)).distinct()
+    ).scalars().all()
+    if dispatched:
+        raise IntegrityError(f"Bottles already dispatched: {', '.join(sorted(dispatched))}", params={}, orig=None)
+
+    disp = models.Dispatch(id=gen_uuid(), dispatch_code=dispatch_code, hospital_id=hospital_id, created_by=created_by, shipper=shipper, manifest={"count": len(bottles)})
     db.add(disp)
-    db.commit()
-    db.refresh(disp)
+    # Ids are assigned up front so the items go out as one batched INSERT
+    db.add_all([
+        models.DispatchItem(id=gen_uuid(), dispatch_id=disp.id, bottle_id=bt.id, barcode=bt.barcode)
+        for bt in bottles
+    ])
     for bt in bottles:
-        item = models.DispatchItem(dispatch_id=disp.id, bottle_id=bt.id, barcode=bt.barcode)
-        db.add(item)
-        # mark bottle as in transit storage location
-        bt.storage_location_id = f"InTransit:{disp.id}"
-        db.add(bt)
         _create_audit(db, created_by, "dispatch_assign", "bottle", bt.id, before=None, after={"dispatch_id": disp.id})
     _create_audit(db, created_by, "create", "dispatch", disp.id, before=None, after={"dispatch_code": disp.dispatch_code, "hospital_id": hospital_id})
+    db.flush()
+    # mark bottles as in transit storage location
+    if ids:
+        db.execute(update(models.Bottle).where(models.Bottle.id.in_(ids)).values(storage_location_id=f"InTransit:{disp.id}"))
     db.commit()
     db.refresh(disp)
     return disp
 
 
-def scan_dispatch_item(db: Session, dispatch_id: str, barcode: str, user_id: str = None, scan_type: str = "out"):
+def _recorded_scan_keys(db: Session, dispatch_id: str, keys) -> set:
+    """Idempotency keys of the given ones that already have a DispatchScan on this dispatch."""
+    keys = [k for k in keys if k]
+    if not keys:
+        return set()
+    return set(db.execute(
+        select(models.DispatchScan.idempotency_key).where(
+            models.DispatchScan.dispatch_id == dispatch_id, models.DispatchScan.idempotency_key.in_(keys)
+        )
+    ).scalars())
+
+
+def scan_dispatch_item(db: Session, dispatch_id: str, barcode: str, user_id: str = None, scan_type: str = "out", idempotency_key: str = None):
     item = db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == dispatch_id, models.DispatchItem.barcode == barcode).first()
     if not item:
         raise IntegrityError("Dispatch item not found", params={}, orig=None)
+    if idempotency_key and _recorded_scan_keys(db, dispatch_id, [idempotency_key]):
+        # a retry of a scan that was already applied
+        return item
     if scan_type == "out":
         item.scanned_out = True
         item.scanned_out_at = func.now()
@@ -997,38 +1823,162 @@ def scan_dispatch_item(db: Session, dispatch_id: str, barcode: str, user_id: str
         item.scanned_in = True
         item.scanned_in_at = func.now()
     db.add(item)
-    scan = models.DispatchScan(dispatch_id=dispatch_id, bottle_id=item.bottle_id, scan_type=scan_type, scanned_by=user_id)
+    scan = models.DispatchScan(dispatch_id=dispatch_id, bottle_id=item.bottle_id, scan_type=scan_type, scanned_by=user_id, idempotency_key=idempotency_key)
     db.add(scan)
     _create_audit(db, user_id, "dispatch_scan", "dispatch", dispatch_id, before=None, after={"barcode": barcode, "scan_type": scan_type})
-    db.commit()
+    try:
+        db.commit()
+    except IntegrityError:
+        db.rollback()
+        if not idempotency_key:
+            raise
+        # a concurrent retry with the same key committed first; the unique index kept one row
     db.refresh(item)
     return item
 
 
+SCAN_TYPES = ("out", "in")
+
+
+def _apply_scan_events(db: Session, dispatch_id: str, events: list, user_id: str = None, default_scan_type: str = "out") -> list:
+    """
+    Apply ordered scan events ({barcode, scan_type, timestamp[, idempotency_key]})
+    to a dispatch without committing; events without a scan_type are
+    ``default_scan_type`` scans. The dispatch's items for every scanned
+    barcode, and the events' idempotency keys already on record, are each
+    loaded with one query. Each event gets a result: "scanned", "replayed"
+    (its key was already applied, or repeated earlier in the list),
+    "duplicate" (item already scanned that way), "unknown" (not in this
+    dispatch) or "invalid" (bad scan_type).
+    """
+    from datetime import datetime, timezone
+    barcodes = {ev["barcode"] for ev in events}
+    items = {
+        item.barcode: item
+        for item in db.query(models.DispatchItem).filter(
+            models.DispatchItem.dispatch_id == dispatch_id, models.DispatchItem.barcode.in_(barcodes)
+        )
+    } if barcodes else {}
+    seen_keys = _recorded_scan_keys(db, dispatch_id, {ev.get("idempotency_key") for ev in events})
+
+    results = []
+    scans = []
+    for ev in events:
+        barcode = ev["barcode"]
+        scan_type = ev.get("scan_type") or default_scan_type
+        key = ev.get("idempotency_key")
+        result = {"barcode": barcode, "scan_type": scan_type}
+        if key:
+            result["idempotency_key"] = key
+        results.append(result)
+        if key and key in seen_keys:
+            result["result"] = "replayed"
+            continue
+        if key:
+            seen_keys.add(key)
+        item = items.get(barcode)
+        if scan_type not in SCAN_TYPES:
+            result["result"] = "invalid"
+            continue
+        if item is None:
+            result["result"] = "unknown"
+            continue
+        result["bottle_id"] = item.bottle_id
+        already = item.scanned_out if scan_type == "out" else item.scanned_in
+        if already:
+            result["result"] = "duplicate"
+            continue
+        scanned_at = schemas.parse_datetime(ev.get("timestamp")) or datetime.now(timezone.utc)
+        if scan_type == "out":
+            item.scanned_out = True
+            item.scanned_out_at = scanned_at
+        else:
+            item.scanned_in = True
+            item.scanned_in_at = scanned_at
+        scans.append(models.DispatchScan(
+            id=gen_uuid(), dispatch_id=dispatch_id, bottle_id=item.bottle_id, scan_type=scan_type,
+            scanned_by=user_id, timestamp=scanned_at, idempotency_key=key,
+        ))
+        _create_audit(db, user_id, "dispatch_scan", "dispatch", dispatch_id, before=None, after={"barcode": barcode, "scan_type": scan_type})
+        result["result"] = "scanned"
+    db.add_all(scans)
+    return results
+
+
+def bulk_scan_dispatch_items(db: Session, dispatch_id: str, events: list, user_id: str = None) -> list:
+    """
+    Replay an ordered list of scan events (a client's scan journal) against
+    a dispatch in one write transaction and return a result per event.
+    Events carrying an idempotency key are applied at most once: keys
+    already on record are reported as "replayed". When a concurrent sync of
+    the same keys commits first, the unique (dispatch_id, idempotency_key)
+    index rejects this one; it is rolled back and replayed once, so those
+    keys then read as "replayed" too.
+    """
+    for attempt in range(2):
+        _begin_write_transaction(db)
+        if not db.query(models.Dispatch.id).filter(models.Dispatch.id == dispatch_id).first():
+            raise IntegrityError("Dispatch not found", params={}, orig=None)
+        results = _apply_scan_events(db, dispatch_id, events, user_id)
+        try:
+            db.commit()
+            return results
+        except IntegrityError:
+            db.rollback()
+            if attempt or not any(ev.get("idempotency_key") for ev in events):
+                raise
+
+
 def receive_dispatch(db: Session, dispatch_id: str, received_by: str = None):
+    disp, _ = receive_dispatch_with_journal(db, dispatch_id, received_by=received_by)
+    return disp
+
+
+def receive_dispatch_with_journal(db: Session, dispatch_id: str, received_by: str = None, journal: list = None):
+    """
+    Mark a dispatch received and return ``(dispatch, scan_results)``. A scan
+    journal recorded offline at the receiving end is replayed first, in the
+    same transaction, so its scan times are kept; its events are "in" scans
+    unless they say otherwise. Retrying a receive that already went through
+    (the dispatch is Received and every journal key is on record) changes
+    nothing and reports each event as "replayed".
+    """
+    _begin_write_transaction(db)
     disp = db.query(models.Dispatch).filter(models.Dispatch.id == dispatch_id).first()
     if not disp:
         raise IntegrityError("Dispatch not found", params={}, orig=None)
+    journal = journal or []
+    if disp.status == models.DispatchStatus.Received:
+        keys = [ev.get("idempotency_key") for ev in journal]
+        if all(keys) and _recorded_scan_keys(db, dispatch_id, keys) == set(keys):
+            db.commit()
+            return disp, [
+                {"barcode": ev["barcode"], "scan_type": ev.get("scan_type") or "in",
+                 "idempotency_key": ev["idempotency_key"], "result": "replayed"}
+                for ev in journal
+            ]
+    results = _apply_scan_events(db, dispatch_id, journal, received_by, default_scan_type="in") if journal else []
     items = db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == dispatch_id).all()
+    bottles = {
+        bt.id: bt
+        for bt in db.query(models.Bottle).filter(models.Bottle.id.in_([it.bottle_id for it in items]))
+    } if items else {}
     for it in items:
         # mark scanned_in if not already
         if not it.scanned_in:
             it.scanned_in = True
             it.scanned_in_at = func.now()
         # update bottle location
-        bt = db.query(models.Bottle).filter(models.Bottle.id == it.bottle_id).first()
+        bt = bottles.get(it.bottle_id)
         if bt:
             bt.storage_location_id = f"Hospital:{disp.hospital_id}"
-            db.add(bt)
             _create_audit(db, received_by, "receive", "bottle", bt.id, before=None, after={"storage_location": bt.storage_location_id})
-        db.add(it)
     before = {"status": disp.status.name}
     disp.status = models.DispatchStatus.Received
-    db.add(disp)
     _create_audit(db, received_by, "receive", "dispatch", disp.id, before=before, after={"status": disp.status.name})
     db.commit()
     db.refresh(disp)
-    return disp
+    return disp, results
 
 
 def send_dispatch_fhir(db: Session, dispatch_id: str, fhir_endpoint: str = None, auth: dict = None):
@@ -1067,13 +2017,17 @@ def send_dispatch_fhir(db: Session, dispatch_id: str, fhir_endpoint: str = None,
 
 
 def get_dispatch_manifest(db: Session, dispatch_id: str):
-    disp = db.query(models.Dispatch).filter(models.Dispatch.id == dispatch_id).first()
+    # Items arrive in one IN query and their bottles are joined onto it
+    disp = db.execute(
+        select(models.Dispatch)
+        .options(selectinload(models.Dispatch.items).joinedload(models.DispatchItem.bottle))
+        .where(models.Dispatch.id == dispatch_id)
+    ).scalar_one_or_none()
     if not disp:
         raise IntegrityError("Dispatch not found", params={}, orig=None)
-    items = db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == dispatch_id).all()
     bottles = []
-    for it in items:
-        bt = db.query(models.Bottle).filter(models.Bottle.id == it.bottle_id).first()
+    for it in disp.items:
+        bt = it.bottle
         bottles.append({
             "bottle_id": bt.id,
             "barcode": bt.barcode,
@@ -1,91 +1,275 @@
 """
 ZPL (Zebra Programming Language) label generation for Zebra ZD410 printer
+
+Label layouts are declarative templates (templates/labels/<name>.json): a
+label size plus a list of text, Code128 and QR fields whose data are
+``str.format`` patterns. A template is compiled once and cached by (name,
+version); each combination of optional fields becomes one pre-joined format
+string, so rendering a label is a single ``format_map``. Adding a label size
+is a new JSON file, not new code.
+
+A compiled template can also be sent as a stored format: fields marked
+``per_label`` become ^FN placeholders in a ^DF format downloaded once, and
+each label is a short ^XF recall carrying only those fields. The stored
+format also bakes in the batch's own fields, so each batch's job stores it
+under a name of its own and deletes it (^ID) when the job ends.
 """
 import barcode
+import json
+import os
+import zlib
 from io import BytesIO
 from base64 import b64encode
 
+TEMPLATE_DIR = os.path.join(os.path.dirname(__file__), "templates", "labels")
+
+
+def bottle_format_name(batch_code: str) -> str:
+    """
+    Printer memory location of a batch's stored bottle label format (R: is
+    volatile DRAM). Named after the batch, within ZPL's 16 character limit,
+    so jobs for different batches never recall each other's batch code or date.
+    """
+    return f"R:MB{zlib.crc32(batch_code.encode()):08X}.ZPL"
+
+
+def delete_format_zpl(format_name: str) -> str:
+    """ZPL deleting a stored format from printer memory."""
+    return f"^XA^ID{format_name}^FS^XZ\n"
+
+
+def _field_zpl(field: dict, data: str) -> str:
+    """ZPL commands for one template field, with ``data`` as its ^FD (or ^FN) part."""
+    origin = f"^FO{field['x']},{field['y']}\n"
+    kind = field.get("type", "text")
+    if kind == "text":
+        font = field.get("font", 20)
+        block = f"^FB{field['block']},1,0,{field.get('align', 'L')}\n" if field.get("block") else ""
+        return f"{origin}^A0N,{font},{font}\n{block}{data}^FS\n"
+    if kind == "code128":
+        height = field.get("height", 50)
+        return f"{origin}^BY{field.get('module', 2)},2.0,{height}\n^BCN,{height},Y,N,N\n{data}^FS\n"
+    if kind == "qr":
+        return f"{origin}^BQN,2,{field.get('magnification', 3)}\n{data}^FS\n"
+    raise ValueError(f"Unknown label field type: {kind}")
+
+
+def _escape_format(text: str) -> str:
+    return text.replace("{", "{{").replace("}", "}}")
+
+
+class LabelTemplate:
+    """A label template compiled into ZPL segments, ready to render many labels."""
+
+    def __init__(self, definition: dict):
+        self.name = definition["name"]
+        self.version = definition.get("version", 1)
+        self.fields = definition["fields"]
+        self._size = f"^PW{definition['width']}\n^PH{definition['height']}\n"
+        self._segments = self._compile()
+        self._when_keys = list(dict.fromkeys(field["when"] for field in self.fields if field.get("when")))
+        self._variants = {}
+
+    def _data_pattern(self, field: dict) -> str:
+        data = field["data"]
+        # QR data carries the error-correction/input-mode prefix
+        return f"^FDQA,{data}" if field.get("type") == "qr" else f"^FD{data}"
+
+    def _compile(self):
+        """
+        Turn each field into a ZPL format string, escaping the ZPL and keeping
+        the field's own {placeholders}.
+        """
+        return [
+            (field.get("when"), _escape_format(_field_zpl(field, "\0")).replace("\0", self._data_pattern(field)))
+            for field in self.fields
+        ]
+
+    def _variant(self, key: tuple) -> str:
+        """The whole label as one format string for one combination of ``when`` values."""
+        fmt = self._variants.get(key)
+        if fmt is None:
+            present = dict(zip(self._when_keys, key))
+            body = "".join(zpl for when, zpl in self._segments if when is None or present[when])
+            fmt = self._variants[key] = "^XA\n" + self._size + body + "^XZ\n"
+        return fmt
+
+    def render(self, values: dict) -> str:
+        """ZPL for one label."""
+        return self._variant(tuple(bool(values.get(k)) for k in self._when_keys)).format_map(values)
+
+    def iter_render(self, rows):
+        """ZPL for each label in ``rows`` (an iterable of value dicts), one string per label."""
+        when_keys = self._when_keys
+        if not when_keys:
+            fmt = self._variant(())
+            for values in rows:
+                yield fmt.format_map(values)
+            return
+        variant = self._variant
+        for values in rows:
+            yield variant(tuple(bool(values.get(k)) for k in when_keys)).format_map(values)
+
+    def render_many(self, rows) -> str:
+        return "".join(self.iter_render(rows))
+
+    def stored_format(self, values: dict, format_name: str) -> str:
+        """
+        The ^DF stored format: fields that are the same on every label are
+        rendered from ``values``; ``per_label`` fields become ^FN1, ^FN2, ...
+        numbered in template order, so the numbers do not shift when an
+        optional field is left out.
+        """
+        parts = [f"^XA\n^DF{format_name}^FS\n", self._size]
+        for number, field in self._numbered(values):
+            data = f"^FN{number}" if number else self._data_pattern(field).format_map(values)
+            parts.append(_field_zpl(field, data))
+        parts.append("^XZ\n")
+        return "".join(parts)
+
+    def iter_recalls(self, rows, job_values: dict, format_name: str):
+        """One ^XF recall per label in ``rows``, filling the stored format's ^FN fields."""
+        pattern = _escape_format(f"^XA^XF{format_name}^FS") + "".join(
+            f"^FN{number}{self._data_pattern(field)}^FS" for number, field in self._numbered(job_values) if number
+        ) + "^XZ\n"
+        for values in rows:
+            yield pattern.format_map(values)
+
+    def _numbered(self, values: dict):
+        """(^FN number or None, field) for the fields included with ``values``."""
+        number = 0
+        for field in self.fields:
+            if field.get("per_label"):
+                number += 1
+            if not field.get("when") or values.get(field["when"]):
+                yield (number if field.get("per_label") else None), field
+
+
+_definitions = {}
+_compiled = {}
+
+
+def register_label_template(definition: dict):
+    """Add or replace a template definition; a new version is compiled on next use."""
+    _definitions[definition["name"]] = definition
+
+
+def _load_definition(name: str) -> dict:
+    if name not in _definitions:
+        path = os.path.join(TEMPLATE_DIR, f"{name}.json")
+        if not os.path.exists(path):
+            raise ValueError(f"Unknown label template: {name}")
+        with open(path) as f:
+            register_label_template(json.load(f))
+    return _definitions[name]
+
+
+def get_label_template(name: str) -> LabelTemplate:
+    """The compiled template ``name``, compiled once per (name, version)."""
+    definition = _load_definition(name)
+    key = (name, definition.get("version", 1))
+    template = _compiled.get(key)
+    if template is None:
+        template = _compiled[key] = LabelTemplate(definition)
+    return template
+
 
 def generate_batch_label_zpl(batch_code: str, bottle_number: int = None, total_bottles: int = None) -> str:
     """
     Generate ZPL format for a single batch label (2.5cm x 5cm).
-    
+
     Args:
         batch_code: The batch code to print
         bottle_number: Optional bottle number (e.g., 1 of 10)
         total_bottles: Optional total bottles in batch
-    
+
     Returns:
         ZPL format string ready to send to Zebra printer
     """
-    
-    # 2.5cm x 5cm label
-    # At 203 DPI: 5cm = ~400 dots, 2.5cm = ~200 dots
-    
-    # Build ZPL format for 5cm x 2.5cm label (landscape)
-    zpl = '^XA\n'  # Start of label
-    zpl += '^DF\n'  # Default format
-    zpl += '^PW400\n'  # Label width (5cm = 400 dots at 203 DPI)
-    zpl += '^PH200\n'  # Label height (2.5cm = 200 dots)
-    
-    # Print batch code as text
-    zpl += '^FO10,10\n'  # Field origin (top-left with small margin)
-    zpl += '^A0N,20,20\n'  # Font A, normal, 20x20 (smaller for compact label)
-    zpl += f'^FD{batch_code}^FS\n'  # Field data - batch code text
-    
-    # Print barcode below text - Code128
-    zpl += '^FO10,40\n'  # Position for barcode
-    zpl += f'^BY2,2.0,50\n'  # Barcode proportions (narrower bars for compact label)
-    zpl += f'^BCN,50,Y,N,N\n'  # Code128, height=50, check digit, etc.
-    zpl += f'^FD{batch_code}^FS\n'  # Barcode data
-    
-    zpl += '^XZ\n'  # End of label
-    
-    return zpl
-
-
-def generate_batch_labels_zpl(batch_code: str, number_of_bottles: int = 1, batch_date: str = None) -> str:
+    return get_label_template("batch").render({"batch_code": batch_code})
+
+
+def _bottle_job(batch_code: str, batch_date: str = None, show_number: bool = None) -> dict:
+    """
+    The fields shared by every bottle label of a batch. The bottle number
+    sits on the date line, so unless ``show_number`` says otherwise it is
+    printed only when there is a batch date.
+    """
+    if show_number is None:
+        show_number = bool(batch_date)
+    return {"batch_code": batch_code, "batch_date": batch_date, "show_number": show_number}
+
+
+def _bottle_rows(batch_code: str, number_of_bottles: int, batch_date: str = None, show_number: bool = None):
+    job = _bottle_job(batch_code, batch_date, show_number)
+    for i in range(1, number_of_bottles + 1):
+        yield {
+            **job,
+            "bottle_number": i,
+            "number_of_bottles": number_of_bottles,
+            "bottle_code": f"{batch_code}-{i}",
+        }
+
+
+def generate_batch_label_format_zpl(batch_code: str, batch_date: str = None, format_name: str = None,
+                                    show_number: bool = None) -> str:
+    """
+    Generate the ^DF stored format for a batch's bottle labels.
+
+    The layout and the fields that are the same on every label (batch code
+    text, batch date) are stored in printer memory; ^FN1 (bottle number,
+    right-aligned on the date line, if ``show_number``) and ^FN2 (bottle
+    barcode) are filled in by each ^XF recall. ``format_name`` defaults to
+    the batch's own name.
+    """
+    job = _bottle_job(batch_code, batch_date, show_number)
+    return get_label_template("bottle").stored_format(job, format_name or bottle_format_name(batch_code))
+
+
+def generate_batch_label_recall_zpl(batch_code: str, bottle_number: int, number_of_bottles: int,
+                                    batch_date: str = None, show_number: bool = None, format_name: str = None) -> str:
+    """
+    Generate the ^XF recall printing one bottle label from the stored format.
+    ``batch_date`` and ``show_number`` must be those the format was stored with.
+    """
+    job = _bottle_job(batch_code, batch_date, show_number)
+    row = {"bottle_number": bottle_number, "number_of_bottles": number_of_bottles, "bottle_code": f"{batch_code}-{bottle_number}"}
+    return next(get_label_template("bottle").iter_recalls([row], job, format_name or bottle_format_name(batch_code)))
+
+
+def iter_batch_labels_zpl(batch_code: str, number_of_bottles: int = 1, batch_date: str = None,
+                          stored_format: bool = False, show_number: bool = None):
+    """
+    Yield a batch's bottle label ZPL piece by piece: one label per bottle,
+    or with ``stored_format`` the batch's stored format, one recall per
+    bottle and the deletion of the format.
+    """
+    template = get_label_template("bottle")
+    rows = _bottle_rows(batch_code, number_of_bottles, batch_date, show_number)
+    if stored_format:
+        job = _bottle_job(batch_code, batch_date, show_number)
+        format_name = bottle_format_name(batch_code)
+        yield template.stored_format(job, format_name)
+        yield from template.iter_recalls(rows, job, format_name)
+        yield delete_format_zpl(format_name)
+    else:
+        yield from template.iter_render(rows)
+
+
+def generate_batch_labels_zpl(batch_code: str, number_of_bottles: int = 1, batch_date: str = None,
+                              stored_format: bool = False) -> str:
     """
     Generate ZPL format for multiple labels in a batch (2.5cm x 5cm each).
     One label per bottle.
-    
+
     Args:
         batch_code: The batch code to print
         number_of_bottles: Number of labels to generate
         batch_date: The batch creation date (format: YYYY-MM-DD)
-    
+        stored_format: Download the layout once with ^DF and print each
+            bottle with a short ^XF recall instead of repeating the layout
+
     Returns:
         ZPL format string with multiple label definitions
     """
-    
-    zpl_full = ''
-    
-    for i in range(1, number_of_bottles + 1):
-        # Start each label
-        zpl = '^XA\n'
-        zpl += '^PW400\n'  # Label width (5cm = 400 dots)
-        zpl += '^PH200\n'  # Label height (2.5cm = 200 dots)
-        
-        # Batch code text
-        zpl += '^FO10,10\n'
-        zpl += '^A0N,20,20\n'
-        zpl += f'^FD{batch_code}^FS\n'
-        
-        # Batch date and bottle number
-        if batch_date:
-            zpl += '^FO10,35\n'
-            zpl += '^A0N,15,15\n'
-            zpl += f'^FD{batch_date} - Bottle {i}/{number_of_bottles}^FS\n'
-        
-        # Barcode with bottle number
-        bottle_code = f'{batch_code}-{i}'
-        zpl += '^FO10,55\n'
-        zpl += '^BY2,2.0,50\n'
-        zpl += '^BCN,50,Y,N,N\n'
-        zpl += f'^FD{bottle_code}^FS\n'
-        
-        zpl += '^XZ\n'
-        
-        zpl_full += zpl
-    
-    return zpl_full
+    return "".join(iter_batch_labels_zpl(batch_code, number_of_bottles, batch_date, stored_format))
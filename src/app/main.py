@@ -1,7 +1,23 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-app = FastAPI(title="Milk Bank Traceability API")
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    from . import audit
+    from .api import backfill_read_models
+    from .database import engine
+    from .printer import ZebraPrinterManager
+    backfill_read_models()
+    # Drains AUDIT_WAL_PATH when set, and chains audit rows outside business transactions
+    audit_writer = audit.start_background_writer(engine)
+    yield
+    audit_writer.stop()
+    ZebraPrinterManager.close()
+
+
+app = FastAPI(title="Milk Bank Traceability API", lifespan=lifespan)
 
 # Enable CORS for frontend
 app.add_middleware(
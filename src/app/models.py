@@ -1,7 +1,8 @@
 import enum
 import uuid
-from sqlalchemy import Column, String, Integer, DateTime, Enum, ForeignKey, Float, Boolean, JSON
+from sqlalchemy import Column, String, Integer, DateTime, Enum, ForeignKey, Float, Boolean, JSON, Index
 from sqlalchemy.dialects.postgresql import UUID
+from sqlalchemy.orm import relationship, column_property
 from sqlalchemy.sql import func
 from .database import Base
 
@@ -30,9 +31,14 @@ class BottleStatus(enum.Enum):
 
 class Donor(Base):
     __tablename__ = "donors"
+    __table_args__ = (
+        # Keyset pagination for list endpoints walks (created_at, id)
+        Index("ix_donors_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     donor_code = Column(String, unique=True, index=True, nullable=True)  # Optional legacy field
-    status = Column(Enum(DonorStatus), nullable=False, default=DonorStatus.Applied)
+    # active_history: the status counters need the previous value even when it was expired
+    status = column_property(Column(Enum(DonorStatus), nullable=False, default=DonorStatus.Applied), active_history=True)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     
     # Donor Details Section
@@ -169,24 +175,46 @@ class BatchStatus(enum.Enum):
 
 class Batch(Base):
     __tablename__ = "batches"
+    __table_args__ = (
+        Index("ix_batches_created_at_id", "created_at", "id"),
+        # Next "<base>-NNN" code is one MAX(code_seq) probe on this index
+        Index("ix_batches_base_code_seq", "base_code", "code_seq"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     batch_code = Column(String, unique=True, index=True, nullable=False)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(Enum(BatchStatus), nullable=False, default=BatchStatus.Created)
-    total_volume_ml = Column(Float, default=0.0)
+    status = column_property(Column(Enum(BatchStatus), nullable=False, default=BatchStatus.Created), active_history=True)
+    total_volume_ml = column_property(Column(Float, default=0.0), active_history=True)
     batch_date = Column(DateTime(timezone=True), nullable=True)
     hospital_number = Column(String, nullable=True)
     number_of_bottles = Column(Integer, nullable=True)
-    donation_ids = Column(JSON, nullable=True)  # Store donation IDs as JSON array
+    donation_ids = Column(JSON, nullable=True)  # Legacy JSON array, superseded by batch_donations
+    base_code = Column(String, nullable=True)  # batch_code without a trailing -NNN suffix
+    code_seq = Column(Integer, nullable=True)  # The -NNN suffix, 0 when there is none
+
+
+class BatchDonation(Base):
+    """Which donations were pooled into which batch, indexed in both directions."""
+    __tablename__ = "batch_donations"
+    __table_args__ = (
+        # The primary key serves batch -> donations; this serves donation -> batches
+        Index("ix_batch_donations_donation_record_id", "donation_record_id", "batch_id"),
+    )
+    batch_id = Column(String, ForeignKey("batches.id"), primary_key=True)
+    donation_record_id = Column(String, ForeignKey("donation_records.id"), primary_key=True)
+    position = Column(Integer, nullable=False, default=0)  # Order the donations were given in
 
 
 class Bottle(Base):
     __tablename__ = "bottles"
+    __table_args__ = (
+        Index("ix_bottles_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     barcode = Column(String, unique=True, index=True, nullable=False)
-    batch_id = Column(String, ForeignKey("batches.id"), nullable=False)
-    volume_ml = Column(Float, nullable=False)
-    status = Column(Enum(BottleStatus), nullable=False, default=BottleStatus.Available)
+    batch_id = Column(String, ForeignKey("batches.id"), nullable=False, index=True)
+    volume_ml = column_property(Column(Float, nullable=False), active_history=True)
+    status = column_property(Column(Enum(BottleStatus), nullable=False, default=BottleStatus.Available), active_history=True)
     label_print_id = Column(String)
     storage_location_id = Column(String)
     expiry = Column(DateTime(timezone=True))
@@ -197,6 +225,7 @@ class Bottle(Base):
     administered_by = Column(String, nullable=True)
     patient_id = Column(String, nullable=True)
     admin_status = Column(String, nullable=True)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
 class PasteurisationRecord(Base):
@@ -214,7 +243,7 @@ class Sample(Base):
     __tablename__ = "samples"
     id = Column(String, primary_key=True, default=gen_uuid)
     sample_barcode = Column(String, unique=True, index=True, nullable=False)
-    batch_id = Column(String, ForeignKey("batches.id"), nullable=False)
+    batch_id = Column(String, ForeignKey("batches.id"), nullable=False, index=True)
     sample_type = Column(String)
     collected_at = Column(DateTime(timezone=True))
 
@@ -222,7 +251,7 @@ class Sample(Base):
 class MicroResult(Base):
     __tablename__ = "micro_results"
     id = Column(String, primary_key=True, default=gen_uuid)
-    sample_id = Column(String, ForeignKey("samples.id"), nullable=False)
+    sample_id = Column(String, ForeignKey("samples.id"), nullable=False, index=True)
     organism = Column(String)
     quantitative_value = Column(String)
     threshold_flag = Column(Boolean, default=False)
@@ -258,47 +287,63 @@ class DispatchStatus(enum.Enum):
 
 class Dispatch(Base):
     __tablename__ = "dispatches"
+    __table_args__ = (
+        Index("ix_dispatches_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     dispatch_code = Column(String, unique=True, index=True, nullable=False)
     hospital_id = Column(String, ForeignKey("hospitals.id"), nullable=False)
     created_by = Column(String)
     created_at = Column(DateTime(timezone=True), server_default=func.now())
-    status = Column(Enum(DispatchStatus), nullable=False, default=DispatchStatus.Created)
+    status = column_property(Column(Enum(DispatchStatus), nullable=False, default=DispatchStatus.Created), active_history=True)
     shipper = Column(String)
     manifest = Column(JSON)
 
+    items = relationship("DispatchItem", back_populates="dispatch")
+
 
 class DispatchItem(Base):
     __tablename__ = "dispatch_items"
     id = Column(String, primary_key=True, default=gen_uuid)
-    dispatch_id = Column(String, ForeignKey("dispatches.id"), nullable=False)
-    bottle_id = Column(String, ForeignKey("bottles.id"), nullable=False)
+    dispatch_id = Column(String, ForeignKey("dispatches.id"), nullable=False, index=True)
+    bottle_id = Column(String, ForeignKey("bottles.id"), nullable=False, index=True)
     barcode = Column(String, nullable=False)
     scanned_out = Column(Boolean, default=False)
     scanned_out_at = Column(DateTime(timezone=True))
     scanned_in = Column(Boolean, default=False)
     scanned_in_at = Column(DateTime(timezone=True))
 
+    dispatch = relationship("Dispatch", back_populates="items")
+    bottle = relationship("Bottle")
+
 
 class DispatchScan(Base):
     __tablename__ = "dispatch_scans"
+    __table_args__ = (
+        # Deduplicates replayed offline scan journals; NULL keys (live scans) never collide
+        Index("ux_dispatch_scans_idempotency", "dispatch_id", "idempotency_key", unique=True),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     dispatch_id = Column(String, ForeignKey("dispatches.id"), nullable=False)
     bottle_id = Column(String, ForeignKey("bottles.id"), nullable=True)
     scan_type = Column(String)  # out/in
     scanned_by = Column(String)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
+    idempotency_key = Column(String, nullable=True)
 
 
 class DonationRecord(Base):
     __tablename__ = "donation_records"
+    __table_args__ = (
+        Index("ix_donation_records_created_at_id", "created_at", "id"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     donation_id = Column(String, unique=True, index=True, nullable=True)  # Auto-generated: HospitalNum-Date-Seq
-    donor_id = Column(String, ForeignKey("donors.id"), nullable=False)
+    donor_id = Column(String, ForeignKey("donors.id"), nullable=False, index=True)
     donation_date = Column(DateTime(timezone=True), nullable=False)
     number_of_bottles = Column(Integer, nullable=False)
-    volume_ml = Column(Float, nullable=False, default=0.0)
-    status = Column(Enum(DonationStatus), nullable=False, default=DonationStatus.Accepted)
+    volume_ml = column_property(Column(Float, nullable=False, default=0.0), active_history=True)
+    status = column_property(Column(Enum(DonationStatus), nullable=False, default=DonationStatus.Accepted), active_history=True)
     notes = Column(String, nullable=True)
     acknowledged = Column(Boolean, default=False)
     acknowledged_by = Column(String, nullable=True)
@@ -306,8 +351,34 @@ class DonationRecord(Base):
     created_at = Column(DateTime(timezone=True), server_default=func.now())
 
 
+class DonationSequence(Base):
+    """Last suffix allocated for HospitalNum-YYYYMMDD-NNN donation ids."""
+    __tablename__ = "donation_sequences"
+    hospital_number = Column(String, primary_key=True)
+    sequence_date = Column(String, primary_key=True)  # YYYYMMDD
+    last_value = Column(Integer, nullable=False, default=0)
+
+
+class BarcodeRegistry(Base):
+    """Every scannable code and the entity it names (see registry.py)."""
+    __tablename__ = "barcode_registry"
+    __table_args__ = (
+        Index("ix_barcode_registry_entity", "entity_type", "entity_id"),
+    )
+    code = Column(String, primary_key=True)
+    entity_type = Column(String, primary_key=True)
+    entity_id = Column(String, nullable=False)
+    label_number = Column(Integer, nullable=True)  # bottle number for {batch_code}-{n} label codes
+
+
 class AuditEvent(Base):
     __tablename__ = "audit_events"
+    __table_args__ = (
+        Index("ix_audit_events_entity_ts", "entity_type", "entity_id", "timestamp"),
+        Index("ix_audit_events_user_ts", "user_id", "timestamp"),
+        Index("ix_audit_events_operation_ts", "operation", "timestamp"),
+        Index("ix_audit_events_timestamp_id", "timestamp", "id"),
+    )
     id = Column(String, primary_key=True, default=gen_uuid)
     timestamp = Column(DateTime(timezone=True), server_default=func.now())
     user_id = Column(String)
@@ -317,3 +388,59 @@ class AuditEvent(Base):
     before = Column(JSON)
     after = Column(JSON)
     reason = Column(String)
+    # Position in the hash chain and the chained SHA-256 digests (see audit.event_hash)
+    seq = Column(Integer, unique=True, index=True)
+    prev_hash = Column(String)
+    hash = Column(String)
+
+
+class AuditEventArchive(Base):
+    """Audit events moved out of audit_events by audit.archive_events; same columns, same order."""
+    __tablename__ = "audit_events_archive"
+    __table_args__ = (
+        Index("ix_audit_events_archive_entity_ts", "entity_type", "entity_id", "timestamp"),
+        Index("ix_audit_events_archive_timestamp_id", "timestamp", "id"),
+    )
+    id = Column(String, primary_key=True)
+    timestamp = Column(DateTime(timezone=True))
+    user_id = Column(String)
+    operation = Column(String)
+    entity_type = Column(String)
+    entity_id = Column(String)
+    before = Column(JSON)
+    after = Column(JSON)
+    reason = Column(String)
+    seq = Column(Integer, unique=True, index=True)
+    prev_hash = Column(String)
+    hash = Column(String)
+
+
+class AuditChainState(Base):
+    """Single row holding the chain head and the last position the verifier checked."""
+    __tablename__ = "audit_chain_state"
+    id = Column(Integer, primary_key=True)
+    last_seq = Column(Integer, nullable=False, default=0)
+    last_hash = Column(String, nullable=False)
+    verified_seq = Column(Integer, nullable=False, default=0)
+    verified_hash = Column(String, nullable=False)
+    verified_at = Column(DateTime(timezone=True))
+
+
+class AuditWALCommit(Base):
+    """
+    Commit marker for audit rows written to the WAL (see audit.write_pending).
+    Inserted in the business transaction, so it exists exactly when that
+    transaction committed; the drainer deletes it once the rows are copied.
+    """
+    __tablename__ = "audit_wal_commits"
+    txn_id = Column(String, primary_key=True)
+    created_at = Column(DateTime(timezone=True))
+
+
+class StatusCount(Base):
+    """Running count and volume per (entity_type, status), maintained on every flush."""
+    __tablename__ = "status_counts"
+    entity_type = Column(String, primary_key=True)
+    status = Column(String, primary_key=True)
+    count = Column(Integer, nullable=False, default=0)
+    volume_ml = Column(Float, nullable=False, default=0.0)
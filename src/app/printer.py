@@ -4,10 +4,13 @@ Supports Zebra ZD410 and compatible models.
 """
 
 import socket
+import select
 import subprocess
 import platform
 import os
-from typing import Optional, List, Dict
+import threading
+import time
+from typing import Optional, List, Dict, Iterable
 from pydantic import BaseModel
 
 
@@ -29,16 +32,138 @@ class PrinterInfo(BaseModel):
     status: str  # 'available', 'offline', 'unknown'
 
 
+class PrinterConnectionPool:
+    """
+    Keeps network printer connections open between print jobs, per (address, port).
+
+    A job checks a connection out, so each socket is used by one thread at a
+    time; concurrent jobs to the same printer open extra connections, and up
+    to ``max_idle`` of them are kept. Before an idle connection is reused it
+    is health-checked (closed by the printer, or idle past
+    ``idle_timeout``), and a send that fails on a reused connection before
+    any byte of the job went out is retried once on a fresh one. Once part
+    of a job has gone out a failure is raised, not retried, since resending
+    would print those labels twice. Sockets use TCP keepalive, probing
+    often enough that a dead peer is noticed well within ``idle_timeout``.
+    """
+
+    # Keepalive: first probe after KEEPALIVE_IDLE idle seconds, then every
+    # KEEPALIVE_INTERVAL seconds; the peer is dead after KEEPALIVE_COUNT misses
+    KEEPALIVE_IDLE = 10
+    KEEPALIVE_INTERVAL = 5
+    KEEPALIVE_COUNT = 3
+
+    def __init__(self, idle_timeout: float = 60.0, max_idle: int = 2):
+        self.idle_timeout = idle_timeout
+        self.max_idle = max_idle
+        self._idle: Dict[tuple, List[tuple]] = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def _connect(cls, config: PrinterConfig) -> socket.socket:
+        sock = socket.create_connection((config.address, config.port), timeout=config.timeout)
+        sock.setsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE, 1)
+        # Not every platform exposes every option (macOS has no TCP_KEEPIDLE)
+        for option, value in (('TCP_KEEPIDLE', cls.KEEPALIVE_IDLE),
+                              ('TCP_KEEPINTVL', cls.KEEPALIVE_INTERVAL),
+                              ('TCP_KEEPCNT', cls.KEEPALIVE_COUNT)):
+            if hasattr(socket, option):
+                sock.setsockopt(socket.IPPROTO_TCP, getattr(socket, option), value)
+        return sock
+
+    @staticmethod
+    def _is_alive(sock: socket.socket) -> bool:
+        """False if the printer closed the connection (readable with EOF) or it errored."""
+        try:
+            readable, _, _ = select.select([sock], [], [], 0)
+            if not readable:
+                return True
+            return sock.recv(1, socket.MSG_PEEK) != b''
+        except (OSError, ValueError):
+            return False
+
+    def _acquire(self, key: tuple):
+        """A healthy idle connection for ``key``, or None."""
+        now = time.monotonic()
+        with self._lock:
+            idle = self._idle.get(key, [])
+            while idle:
+                sock, last_used = idle.pop()
+                if now - last_used <= self.idle_timeout and self._is_alive(sock):
+                    return sock
+                sock.close()
+        return None
+
+    def _release(self, key: tuple, sock: socket.socket):
+        with self._lock:
+            idle = self._idle.setdefault(key, [])
+            if len(idle) < self.max_idle:
+                idle.append((sock, time.monotonic()))
+                return
+        sock.close()
+
+    def send(self, config: PrinterConfig, chunks: Iterable[bytes]):
+        """Send every chunk over one pooled connection; raises socket errors like a plain socket."""
+        key = (config.address, config.port)
+        chunks = iter(chunks)
+        first = next(chunks, b'')
+        sock = self._acquire(key)
+        if sock is not None:
+            sock.settimeout(config.timeout)
+            sent = 0
+            try:
+                while sent < len(first):
+                    sent += sock.send(first[sent:])
+            except OSError:
+                sock.close()
+                if sent:
+                    # Part of the job reached the printer; a resend could print labels twice
+                    raise
+                # The printer dropped the connection while it sat idle; nothing of this job was sent
+                sock = None
+        if sock is None:
+            sock = self._connect(config)
+            try:
+                sock.sendall(first)
+            except BaseException:
+                sock.close()
+                raise
+        try:
+            for chunk in chunks:
+                sock.sendall(chunk)
+        except BaseException:
+            sock.close()
+            raise
+        self._release(key, sock)
+
+    def close_all(self):
+        """Close every idle connection (e.g. when the printer configuration changes)."""
+        with self._lock:
+            idle, self._idle = self._idle, {}
+        for connections in idle.values():
+            for sock, _ in connections:
+                sock.close()
+
+
 class ZebraPrinterManager:
     """Manages communication with Zebra printers"""
     
     # Store current printer config (would be in database in production)
     _current_printer: Optional[PrinterConfig] = None
+
+    # Network connections kept open between print jobs; closed on app shutdown
+    _pool = PrinterConnectionPool()
     
     @classmethod
     def set_printer(cls, config: PrinterConfig) -> None:
         """Set the active printer configuration"""
         cls._current_printer = config
+        cls._pool.close_all()
+
+    @classmethod
+    def close(cls) -> None:
+        """Close the pooled printer connections (on app shutdown)"""
+        cls._pool.close_all()
     
     @classmethod
     def get_printer(cls) -> Optional[PrinterConfig]:
@@ -75,22 +200,47 @@ class ZebraPrinterManager:
                 'message': f'Unknown connection type: {config.connection_type}'
             }
     
+    @classmethod
+    def send_zpl_chunks(cls, chunks: Iterable[bytes], printer_config: Optional[PrinterConfig] = None) -> Dict[str, any]:
+        """
+        Send ZPL produced in chunks (e.g. by ``labels.iter_batch_labels_zpl``)
+        without building the whole job in memory.
+
+        Network printers receive every chunk over one connection. Chunks end
+        on label boundaries, so other connection types print each chunk as
+        its own job, in order.
+
+        Returns:
+            Dict with 'success' and 'message' keys
+        """
+        config = printer_config or cls._current_printer
+
+        if not config:
+            return {
+                'success': False,
+                'message': 'No printer configured. Please set up a printer first.'
+            }
+
+        if config.connection_type == 'network':
+            return cls._send_zpl_network_chunks(chunks, config)
+
+        result = {'success': True, 'message': f'Nothing to send to printer {config.name}'}
+        for chunk in chunks:
+            result = cls.send_zpl(chunk.decode('utf-8'), config)
+            if not result['success']:
+                return result
+        return result
+
     @classmethod
     def _send_zpl_network(cls, zpl_content: str, config: PrinterConfig) -> Dict[str, any]:
         """Send ZPL via network socket"""
+        return cls._send_zpl_network_chunks([zpl_content.encode('utf-8')], config)
+
+    @classmethod
+    def _send_zpl_network_chunks(cls, chunks: Iterable[bytes], config: PrinterConfig) -> Dict[str, any]:
+        """Send ZPL chunks via a pooled network connection"""
         try:
-            # Create socket connection to printer
-            sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            sock.settimeout(config.timeout)
-            
-            # Connect to printer
-            sock.connect((config.address, config.port))
-            
-            # Send ZPL commands
-            sock.sendall(zpl_content.encode('utf-8'))
-            
-            # Close connection
-            sock.close()
+            cls._pool.send(config, chunks)
             
             return {
                 'success': True,
@@ -0,0 +1,178 @@
+"""
+Barcode registry for scanners.
+
+Every scannable code (bottle barcodes, sample barcodes, batch codes,
+dispatch codes and printed bottle label codes) has a row in
+``barcode_registry`` keyed by the code itself, so a scan resolves with one
+primary-key lookup whatever kind of label was scanned.
+
+Rows for bottles, samples, batches and dispatches are written on the same
+flush that creates them, like the status counters. A batch's label codes
+(``{batch_code}-{n}`` for each of its ``number_of_bottles``) are written
+on that flush too and rewritten when either value changes, so generating
+or downloading labels never has to touch the registry. Bulk Core inserts
+of those tables bypass the ORM and must call ``register_codes``.
+"""
+from sqlalchemy import event, insert, select, delete, and_, inspect
+from sqlalchemy.orm import Session
+from . import models
+
+
+# model -> (entity_type, code attribute)
+REGISTERED = {
+    models.Bottle: ("bottle", "barcode"),
+    models.Sample: ("sample", "sample_barcode"),
+    models.Batch: ("batch", "batch_code"),
+    models.Dispatch: ("dispatch", "dispatch_code"),
+}
+
+LABEL = "label"
+LABEL_CHUNK = 500
+
+
+def register_codes(connection, rows: list):
+    """Insert registry rows ({code, entity_type, entity_id[, label_number]}), one statement per chunk."""
+    table = models.BarcodeRegistry.__table__
+    for start in range(0, len(rows), LABEL_CHUNK):
+        connection.execute(insert(table).values(rows[start:start + LABEL_CHUNK]))
+
+
+def label_rows(batch_id: str, batch_code: str, number_of_bottles) -> list:
+    """Registry rows for the ``{batch_code}-{n}`` codes printed on a batch's bottle labels."""
+    if not batch_code:
+        return []
+    return [
+        {"code": f"{batch_code}-{n}", "entity_type": LABEL, "entity_id": batch_id, "label_number": n}
+        for n in range(1, (number_of_bottles or 1) + 1)
+    ]
+
+
+def _collect_flush_changes(session):
+    added = []
+    removed = []
+    for obj in session.new:
+        registered = REGISTERED.get(type(obj))
+        if registered and getattr(obj, registered[1]):
+            entity_type, attr = registered
+            added.append({"code": getattr(obj, attr), "entity_type": entity_type, "entity_id": obj.id, "label_number": None})
+        if isinstance(obj, models.Batch):
+            added.extend(label_rows(obj.id, obj.batch_code, obj.number_of_bottles))
+    for obj in session.deleted:
+        registered = REGISTERED.get(type(obj))
+        if registered:
+            removed.append((registered[0], obj.id))
+        if isinstance(obj, models.Batch):
+            removed.append((LABEL, obj.id))
+    for obj in session.dirty:
+        registered = REGISTERED.get(type(obj))
+        if not registered:
+            continue
+        entity_type, attr = registered
+        hist = inspect(obj).attrs[attr].history
+        if hist.has_changes():
+            removed.append((entity_type, obj.id))
+            if getattr(obj, attr):
+                added.append({"code": getattr(obj, attr), "entity_type": entity_type, "entity_id": obj.id, "label_number": None})
+        if isinstance(obj, models.Batch) and (hist.has_changes() or inspect(obj).attrs.number_of_bottles.history.has_changes()):
+            removed.append((LABEL, obj.id))
+            added.extend(label_rows(obj.id, obj.batch_code, obj.number_of_bottles))
+    return added, removed
+
+
+@event.listens_for(Session, "after_flush")
+def _sync_registry(session, flush_context):
+    added, removed = _collect_flush_changes(session)
+    if not added and not removed:
+        return
+    connection = session.connection()
+    table = models.BarcodeRegistry.__table__
+    for entity_type, entity_id in removed:
+        connection.execute(delete(table).where(table.c.entity_type == entity_type, table.c.entity_id == entity_id))
+    register_codes(connection, added)
+
+
+def _summary(row):
+    if row.entity_type == "bottle":
+        return {
+            "barcode": row.code,
+            "status": row.bottle_status.name if row.bottle_status else None,
+            "volume_ml": row.bottle_volume_ml,
+            "batch_id": row.bottle_batch_id,
+            "storage_location": row.bottle_storage_location_id,
+        }
+    if row.entity_type in ("batch", LABEL):
+        summary = {
+            "batch_code": row.batch_code,
+            "status": row.batch_status.name if row.batch_status else None,
+            "total_volume_ml": row.batch_total_volume_ml,
+        }
+        if row.entity_type == LABEL:
+            summary["label_number"] = row.label_number
+        return summary
+    if row.entity_type == "sample":
+        return {"batch_id": row.sample_batch_id, "sample_type": row.sample_type}
+    if row.entity_type == "dispatch":
+        return {
+            "dispatch_code": row.dispatch_code,
+            "status": row.dispatch_status.name if row.dispatch_status else None,
+            "hospital_id": row.dispatch_hospital_id,
+        }
+    return {}
+
+
+def resolve(db: Session, code: str) -> list:
+    """
+    Every entity a scanned code names, each with a compact summary, in one
+    statement: the registry primary-key lookup with each entity table
+    outer-joined on its own primary key. Usually one match; an empty list
+    means the code is unknown.
+    """
+    reg = models.BarcodeRegistry
+    rows = db.execute(
+        select(
+            reg.code, reg.entity_type, reg.entity_id, reg.label_number,
+            models.Bottle.status.label("bottle_status"),
+            models.Bottle.volume_ml.label("bottle_volume_ml"),
+            models.Bottle.batch_id.label("bottle_batch_id"),
+            models.Bottle.storage_location_id.label("bottle_storage_location_id"),
+            models.Batch.batch_code,
+            models.Batch.status.label("batch_status"),
+            models.Batch.total_volume_ml.label("batch_total_volume_ml"),
+            models.Sample.batch_id.label("sample_batch_id"),
+            models.Sample.sample_type,
+            models.Dispatch.dispatch_code,
+            models.Dispatch.status.label("dispatch_status"),
+            models.Dispatch.hospital_id.label("dispatch_hospital_id"),
+        )
+        .outerjoin(models.Bottle, and_(reg.entity_type == "bottle", models.Bottle.id == reg.entity_id))
+        .outerjoin(models.Batch, and_(reg.entity_type.in_(("batch", LABEL)), models.Batch.id == reg.entity_id))
+        .outerjoin(models.Sample, and_(reg.entity_type == "sample", models.Sample.id == reg.entity_id))
+        .outerjoin(models.Dispatch, and_(reg.entity_type == "dispatch", models.Dispatch.id == reg.entity_id))
+        .where(reg.code == code)
+    ).all()
+    return [
+        {"code": row.code, "entity_type": row.entity_type, "entity_id": row.entity_id, "summary": _summary(row)}
+        for row in rows
+    ]
+
+
+def rebuild_registry(db: Session):
+    """Re-register every code, label codes included, from the base tables (O(rows); for backfill and repair)."""
+    table = models.BarcodeRegistry.__table__
+    db.execute(delete(table))
+    for model, (entity_type, attr) in REGISTERED.items():
+        rows = db.execute(select(getattr(model, attr), model.id).where(getattr(model, attr).isnot(None))).all()
+        register_codes(db.connection(), [
+            {"code": code, "entity_type": entity_type, "entity_id": entity_id, "label_number": None}
+            for code, entity_id in rows
+        ])
+    batches = db.execute(select(models.Batch.id, models.Batch.batch_code, models.Batch.number_of_bottles)).all()
+    for batch_id, batch_code, number_of_bottles in batches:
+        register_codes(db.connection(), label_rows(batch_id, batch_code, number_of_bottles))
+    db.commit()
+
+
+def ensure_registry(db: Session):
+    """Backfill the registry the first time it is found empty."""
+    if db.execute(select(models.BarcodeRegistry.code).limit(1)).first() is None:
+        rebuild_registry(db)
@@ -230,6 +230,27 @@ class DonorRead(BaseModel):
         from_attributes = True
 
 
+class DonorSummary(BaseModel):
+    """The columns shown in the donor list; the full record is DonorRead."""
+    id: str
+    donor_code: Optional[str]
+    status: str
+    created_at: Optional[datetime]
+    hospital_number: Optional[str]
+    first_name: Optional[str]
+    last_name: Optional[str]
+    date_of_birth: Optional[Union[str, datetime]]
+    phone_number: Optional[str]
+    email: Optional[str]
+
+    model_config = {"from_attributes": True}
+
+
+class DonorPage(BaseModel):
+    items: List[DonorSummary]
+    next_cursor: Optional[str] = None
+
+
 class HospitalCreate(BaseModel):
     name: str
     fhir_endpoint: Optional[str] = None
@@ -269,6 +290,41 @@ class DispatchScan(BaseModel):
     scan_type: Optional[str] = "out"
 
 
+class DispatchScanEvent(BaseModel):
+    barcode: str
+    scan_type: Optional[str] = "out"
+    timestamp: Optional[datetime] = None
+    idempotency_key: Optional[str] = None
+
+
+class DispatchBulkScan(BaseModel):
+    user_id: Optional[str] = None
+    events: List[DispatchScanEvent]
+
+
+class TransitionOperation(BaseModel):
+    entity_type: str  # batch, donation or bottle
+    id: str
+    trigger: str
+    device_id: Optional[str] = None  # batch start_pasteurisation
+    approver2_id: Optional[str] = None  # batch release
+    patient_id: Optional[str] = None  # bottle allocate
+    admin_user2: Optional[str] = None  # bottle administer
+    reason: Optional[str] = None  # bottle discard
+
+
+class BulkTransition(BaseModel):
+    user_id: Optional[str] = None
+    atomic: bool = True
+    operations: List[TransitionOperation]
+
+
+class AuditArchiveRequest(BaseModel):
+    before: datetime
+    approver_id: str
+    approver2_id: str
+
+
 class DonationCreate(BaseModel):
     donor_id: str
     donation_date: Union[str, datetime]
@@ -299,6 +355,11 @@ class DonationRead(BaseModel):
     model_config = {"from_attributes": True}
 
 
+class DonationPage(BaseModel):
+    items: List[DonationRead]
+    next_cursor: Optional[str] = None
+
+
 class BatchCreate(BaseModel):
     batch_code: str
     donation_ids: List[str]
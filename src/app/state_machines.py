@@ -1,6 +1,88 @@
 from transitions import Machine
 from transitions.core import MachineError
-from .models import DonorStatus, DonationStatus, BatchStatus, Bottle
+from .models import DonorStatus, DonationStatus, BatchStatus, BottleStatus, Bottle
+
+
+# (trigger, source state(s) or '*', destination) for each lifecycle
+DONOR_TRANSITIONS = [
+    ('to_screening', DonorStatus.Applied, DonorStatus.Screening),
+    ('approve', [DonorStatus.Applied, DonorStatus.Screening], DonorStatus.Approved),
+    ('suspend', '*', DonorStatus.Suspended),
+    ('exclude', '*', DonorStatus.Excluded),
+    ('close', '*', DonorStatus.Closed),
+    ('revert_to_applied', '*', DonorStatus.Applied),
+]
+
+# define transitions matching spec: only accept if donor approved
+DONATION_TRANSITIONS = [
+    ('intake', DonationStatus.Collected, DonationStatus.IntakeQuarantine),
+    ('accept', [DonationStatus.Collected, DonationStatus.IntakeQuarantine], DonationStatus.Accepted),
+    ('reject', '*', DonationStatus.Rejected),
+    ('assign', DonationStatus.Accepted, DonationStatus.AssignedToBatch),
+    ('process', DonationStatus.AssignedToBatch, DonationStatus.Processed),
+    ('dispose', '*', DonationStatus.Disposed),
+]
+
+# Define valid batch transitions
+BATCH_TRANSITIONS = [
+    ('start_pasteurisation', [BatchStatus.Created, BatchStatus.Quarantined], BatchStatus.Pasteurising),
+    ('complete_pasteurisation', BatchStatus.Pasteurising, BatchStatus.MicroTestPending),
+    ('mark_tested', BatchStatus.MicroTestPending, BatchStatus.Tested),
+    ('fail_testing', BatchStatus.MicroTestPending, BatchStatus.TestingFailed),
+    ('quarantine', '*', BatchStatus.Quarantined),
+    ('release', BatchStatus.Tested, BatchStatus.Released),
+    ('recall', BatchStatus.Released, BatchStatus.Recalled),
+    ('dispose', '*', BatchStatus.Disposed),
+]
+
+# Bottle handling steps, as enforced by the single-bottle endpoints
+BOTTLE_TRANSITIONS = [
+    ('allocate', BottleStatus.Available, BottleStatus.Allocated),
+    ('start_defrosting', BottleStatus.Allocated, BottleStatus.Defrosting),
+    ('administer', [BottleStatus.Allocated, BottleStatus.Defrosting], BottleStatus.Administered),
+    # an administered bottle is gone and a discarded one cannot be discarded again
+    ('discard', [BottleStatus.Available, BottleStatus.Allocated, BottleStatus.Defrosting], BottleStatus.Discarded),
+]
+
+
+def _add_transitions(machine, transitions, after):
+    for trigger, source, dest in transitions:
+        if source != '*':
+            source = [s.value for s in source] if isinstance(source, list) else source.value
+        machine.add_transition(trigger, source, dest.value, after=after)
+
+
+def compile_transitions(status_enum, transitions) -> dict:
+    """Flatten a transition list into {(state, trigger): destination}, expanding '*' to every state."""
+    table = {}
+    for trigger, source, dest in transitions:
+        if source == '*':
+            sources = list(status_enum)
+        else:
+            sources = source if isinstance(source, list) else [source]
+        for state in sources:
+            table[(state, trigger)] = dest
+    return table
+
+
+DONOR_TABLE = compile_transitions(DonorStatus, DONOR_TRANSITIONS)
+DONATION_TABLE = compile_transitions(DonationStatus, DONATION_TRANSITIONS)
+BATCH_TABLE = compile_transitions(BatchStatus, BATCH_TRANSITIONS)
+BOTTLE_TABLE = compile_transitions(BottleStatus, BOTTLE_TRANSITIONS)
+
+
+def next_state(table: dict, state, transition_name: str):
+    """
+    Destination of ``transition_name`` from ``state`` in a compiled table.
+    Raises ValueError for an unknown trigger and MachineError (with the
+    same message as ``transitions``) when it is not allowed from ``state``.
+    """
+    dest = table.get((state, transition_name))
+    if dest is None:
+        if all(trigger != transition_name for _, trigger in table):
+            raise ValueError(f"Unknown transition: {transition_name}")
+        raise MachineError(f"Can't trigger event {transition_name} from state {state.value}!")
+    return dest
 
 
 class DonorStateMachine:
@@ -9,18 +91,13 @@ class DonorStateMachine:
     def __init__(self, donor):
         self.donor = donor
         self.machine = Machine(
-            model=self, 
-            states=DonorStateMachine.states, 
+            model=self,
+            states=DonorStateMachine.states,
             initial=donor.status.value,
             auto_transitions=False  # Disable automatic transitions for safety
         )
-        self.machine.add_transition('to_screening', DonorStatus.Applied.value, DonorStatus.Screening.value, after='_update_donor_status')
-        self.machine.add_transition('approve', [DonorStatus.Applied.value, DonorStatus.Screening.value], DonorStatus.Approved.value, after='_update_donor_status')
-        self.machine.add_transition('suspend', '*', DonorStatus.Suspended.value, after='_update_donor_status')
-        self.machine.add_transition('exclude', '*', DonorStatus.Excluded.value, after='_update_donor_status')
-        self.machine.add_transition('close', '*', DonorStatus.Closed.value, after='_update_donor_status')
-        self.machine.add_transition('revert_to_applied', '*', DonorStatus.Applied.value, after='_update_donor_status')
-    
+        _add_transitions(self.machine, DONOR_TRANSITIONS, '_update_donor_status')
+
     def _update_donor_status(self):
         """Update the donor's status in the database model after state transition"""
         self.donor.status = DonorStatus[self.state]
@@ -32,19 +109,13 @@ class DonationStateMachine:
     def __init__(self, donation):
         self.donation = donation
         self.machine = Machine(
-            model=self, 
-            states=DonationStateMachine.states, 
+            model=self,
+            states=DonationStateMachine.states,
             initial=donation.status.value,
             auto_transitions=False  # Disable automatic transitions for safety
         )
-        # define transitions matching spec: only accept if donor approved
-        self.machine.add_transition('intake', DonationStatus.Collected.value, DonationStatus.IntakeQuarantine.value, after='_update_donation_status')
-        self.machine.add_transition('accept', [DonationStatus.Collected.value, DonationStatus.IntakeQuarantine.value], DonationStatus.Accepted.value, after='_update_donation_status')
-        self.machine.add_transition('reject', '*', DonationStatus.Rejected.value, after='_update_donation_status')
-        self.machine.add_transition('assign', DonationStatus.Accepted.value, DonationStatus.AssignedToBatch.value, after='_update_donation_status')
-        self.machine.add_transition('process', DonationStatus.AssignedToBatch.value, DonationStatus.Processed.value, after='_update_donation_status')
-        self.machine.add_transition('dispose', '*', DonationStatus.Disposed.value, after='_update_donation_status')
-    
+        _add_transitions(self.machine, DONATION_TRANSITIONS, '_update_donation_status')
+
     def _update_donation_status(self):
         """Update the donation's status in the database model after state transition"""
         self.donation.status = DonationStatus[self.state]
@@ -56,21 +127,13 @@ class BatchStateMachine:
     def __init__(self, batch):
         self.batch = batch
         self.machine = Machine(
-            model=self, 
-            states=BatchStateMachine.states, 
+            model=self,
+            states=BatchStateMachine.states,
             initial=batch.status.value,
             auto_transitions=False  # Disable automatic transitions for safety
         )
-        # Define valid batch transitions
-        self.machine.add_transition('start_pasteurisation', [BatchStatus.Created.value, BatchStatus.Quarantined.value], BatchStatus.Pasteurising.value, after='_update_batch_status')
-        self.machine.add_transition('complete_pasteurisation', BatchStatus.Pasteurising.value, BatchStatus.MicroTestPending.value, after='_update_batch_status')
-        self.machine.add_transition('mark_tested', BatchStatus.MicroTestPending.value, BatchStatus.Tested.value, after='_update_batch_status')
-        self.machine.add_transition('fail_testing', BatchStatus.MicroTestPending.value, BatchStatus.TestingFailed.value, after='_update_batch_status')
-        self.machine.add_transition('quarantine', '*', BatchStatus.Quarantined.value, after='_update_batch_status')
-        self.machine.add_transition('release', BatchStatus.Tested.value, BatchStatus.Released.value, after='_update_batch_status')
-        self.machine.add_transition('recall', BatchStatus.Released.value, BatchStatus.Recalled.value, after='_update_batch_status')
-        self.machine.add_transition('dispose', '*', BatchStatus.Disposed.value, after='_update_batch_status')
-    
+        _add_transitions(self.machine, BATCH_TRANSITIONS, '_update_batch_status')
+
     def _update_batch_status(self):
         """Update the batch's status in the database model after state transition"""
         self.batch.status = BatchStatus[self.state]
@@ -78,38 +141,35 @@ class BatchStateMachine:
 
 def transition_donor_state(donor, transition_name: str) -> bool:
     """
-    Safely transition a donor to a new state using the state machine.
+    Safely transition a donor to a new state using the compiled transition table.
     Returns True if transition succeeded, raises MachineError if invalid.
     """
-    machine = DonorStateMachine(donor)
-    transition_method = getattr(machine, transition_name, None)
-    if transition_method is None:
-        raise ValueError(f"Unknown transition: {transition_name}")
-    transition_method()
+    donor.status = next_state(DONOR_TABLE, donor.status, transition_name)
     return True
 
 
 def transition_donation_state(donation, transition_name: str) -> bool:
     """
-    Safely transition a donation to a new state using the state machine.
+    Safely transition a donation to a new state using the compiled transition table.
     Returns True if transition succeeded, raises MachineError if invalid.
     """
-    machine = DonationStateMachine(donation)
-    transition_method = getattr(machine, transition_name, None)
-    if transition_method is None:
-        raise ValueError(f"Unknown transition: {transition_name}")
-    transition_method()
+    donation.status = next_state(DONATION_TABLE, donation.status, transition_name)
     return True
 
 
 def transition_batch_state(batch, transition_name: str) -> bool:
     """
-    Safely transition a batch to a new state using the state machine.
+    Safely transition a batch to a new state using the compiled transition table.
+    Returns True if transition succeeded, raises MachineError if invalid.
+    """
+    batch.status = next_state(BATCH_TABLE, batch.status, transition_name)
+    return True
+
+
+def transition_bottle_state(bottle, transition_name: str) -> bool:
+    """
+    Safely transition a bottle to a new state using the compiled transition table.
     Returns True if transition succeeded, raises MachineError if invalid.
     """
-    machine = BatchStateMachine(batch)
-    transition_method = getattr(machine, transition_name, None)
-    if transition_method is None:
-        raise ValueError(f"Unknown transition: {transition_name}")
-    transition_method()
+    bottle.status = next_state(BOTTLE_TABLE, bottle.status, transition_name)
     return True
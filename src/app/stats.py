@@ -0,0 +1,159 @@
+"""
+Incremental status counters backing the dashboard.
+
+Every flush that creates, deletes or changes the status (or volume) of a
+tracked entity adjusts the matching ``status_counts`` rows on the same
+connection, so the counters commit or roll back with the change itself.
+Bulk Core statements bypass the ORM and must call ``apply_status_deltas``.
+"""
+from collections import defaultdict
+from sqlalchemy import event, inspect, select, update, insert, delete, literal
+from sqlalchemy.orm import Session
+from sqlalchemy.sql import func
+from . import models
+
+
+# model -> (entity_type, status enum, volume attribute or None)
+TRACKED = {
+    models.Donor: ("donor", models.DonorStatus, None),
+    models.DonationRecord: ("donation", models.DonationStatus, "volume_ml"),
+    models.Batch: ("batch", models.BatchStatus, "total_volume_ml"),
+    models.Bottle: ("bottle", models.BottleStatus, "volume_ml"),
+    models.Dispatch: ("dispatch", models.DispatchStatus, None),
+}
+
+# entity_type -> key in the dashboard response
+ENTITY_KEYS = {
+    "donor": "donors",
+    "donation": "donations",
+    "batch": "batches",
+    "bottle": "bottles",
+    "dispatch": "dispatches",
+}
+
+
+def _status_name(status):
+    if status is None:
+        return None
+    return status.name if hasattr(status, "name") else str(status)
+
+
+def new_deltas():
+    """Accumulator of (entity_type, status) -> [count, volume_ml]."""
+    return defaultdict(lambda: [0, 0.0])
+
+
+def add_delta(deltas, entity_type: str, status, count: int = 1, volume_ml: float = 0.0):
+    name = _status_name(status)
+    if name is None:
+        return
+    deltas[(entity_type, name)][0] += count
+    deltas[(entity_type, name)][1] += volume_ml or 0.0
+
+
+def apply_status_deltas(connection, deltas):
+    """
+    Apply accumulated deltas with one UPDATE per touched counter row.
+    Rows are updated in key order, so two transactions touching the same
+    counters always lock them in the same order and cannot deadlock.
+    """
+    table = models.StatusCount.__table__
+    for (entity_type, status), (count, volume_ml) in sorted(deltas.items()):
+        if not count and not volume_ml:
+            continue
+        result = connection.execute(
+            update(table)
+            .where(table.c.entity_type == entity_type, table.c.status == status)
+            .values(count=table.c.count + count, volume_ml=table.c.volume_ml + volume_ml)
+        )
+        if result.rowcount == 0:
+            connection.execute(insert(table).values(entity_type=entity_type, status=status, count=count, volume_ml=volume_ml))
+
+
+def _history(state, key):
+    """
+    Return (old, new, changed) for an attribute; an unchanged value is both old and new.
+    The tracked columns are mapped with active_history, so the old value is
+    loaded even when it was assigned on an expired instance.
+    """
+    hist = state.attrs[key].history
+    new = state.attrs[key].value
+    old = hist.deleted[0] if hist.deleted else new
+    return old, new, hist.has_changes()
+
+
+def _collect_flush_deltas(session):
+    deltas = new_deltas()
+    for obj in session.new:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            entity_type, _, volume_attr = tracked
+            add_delta(deltas, entity_type, obj.status, 1, getattr(obj, volume_attr) if volume_attr else 0.0)
+    for obj in session.deleted:
+        tracked = TRACKED.get(type(obj))
+        if tracked:
+            entity_type, _, volume_attr = tracked
+            add_delta(deltas, entity_type, obj.status, -1, -(getattr(obj, volume_attr) or 0.0) if volume_attr else 0.0)
+    for obj in session.dirty:
+        tracked = TRACKED.get(type(obj))
+        if not tracked:
+            continue
+        entity_type, _, volume_attr = tracked
+        state = inspect(obj)
+        old_status, new_status, status_changed = _history(state, "status")
+        old_volume, new_volume, volume_changed = _history(state, volume_attr) if volume_attr else (0.0, 0.0, False)
+        if not status_changed and not volume_changed:
+            continue
+        add_delta(deltas, entity_type, old_status, -1, -(old_volume or 0.0))
+        add_delta(deltas, entity_type, new_status, 1, new_volume or 0.0)
+    return deltas
+
+
+@event.listens_for(Session, "after_flush")
+def _update_status_counts(session, flush_context):
+    deltas = _collect_flush_deltas(session)
+    if deltas:
+        apply_status_deltas(session.connection(), deltas)
+
+
+def rebuild_status_counts(db: Session):
+    """Recompute every counter from the base tables (O(rows); for backfill and repair)."""
+    table = models.StatusCount.__table__
+    db.execute(delete(table))
+    for model, (entity_type, status_enum, volume_attr) in TRACKED.items():
+        volume_col = func.coalesce(func.sum(getattr(model, volume_attr)), 0.0) if volume_attr else literal(0.0)
+        rows = db.execute(select(model.status, func.count(), volume_col).group_by(model.status)).all()
+        found = {status.name: (count, volume or 0.0) for status, count, volume in rows if status is not None}
+        db.execute(insert(table), [
+            {"entity_type": entity_type, "status": s.name, "count": found.get(s.name, (0, 0.0))[0], "volume_ml": found.get(s.name, (0, 0.0))[1]}
+            for s in status_enum
+        ])
+    db.commit()
+
+
+def ensure_status_counts(db: Session):
+    """Backfill the counters the first time the table is found empty."""
+    if db.execute(select(models.StatusCount.entity_type).limit(1)).first() is None:
+        rebuild_status_counts(db)
+
+
+def get_dashboard_stats(db: Session) -> dict:
+    """Counts per status and volume totals for every tracked entity, read from the counters."""
+    found = {
+        (row.entity_type, row.status): row
+        for row in db.execute(select(models.StatusCount)).scalars()
+    }
+    result = {}
+    for entity_type, status_enum, volume_attr in TRACKED.values():
+        counts = {}
+        volumes = {}
+        for s in status_enum:
+            row = found.get((entity_type, s.name))
+            counts[s.name] = row.count if row else 0
+            volumes[s.name] = row.volume_ml if row else 0.0
+        entry = {"counts": counts, "total": sum(counts.values())}
+        if volume_attr:
+            entry["volume_ml"] = volumes
+            entry["total_volume_ml"] = sum(volumes.values())
+        result[ENTITY_KEYS[entity_type]] = entry
+    return result
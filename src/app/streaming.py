@@ -0,0 +1,98 @@
+"""
+Streaming encoders for large exports.
+
+Rows are read from the database in fixed-size partitions (``yield_per``) and
+encoded into chunks of a bounded size, so memory stays flat however many
+rows an export covers. Two wire formats are supported: NDJSON (one object
+per line) and a chunked JSON array. ``text_chunks`` does the same for text
+produced piece by piece, such as ZPL labels.
+"""
+import enum
+import json
+from datetime import date, datetime
+from sqlalchemy.orm import Session
+
+YIELD_PER = 1000
+CHUNK_BYTES = 64 * 1024
+
+MEDIA_TYPES = {
+    "ndjson": "application/x-ndjson",
+    "json": "application/json",
+}
+
+
+def _json_default(value):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    if isinstance(value, enum.Enum):
+        return value.name
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+# One encoder for every row; json.dumps with custom options builds a new encoder per call
+_dumps = json.JSONEncoder(default=_json_default, separators=(",", ":")).encode
+
+
+def iter_rows(db: Session, stmt, batch_size: int = YIELD_PER):
+    """Yield each row of ``stmt`` as a dict, fetching ``batch_size`` rows at a time."""
+    result = db.execute(stmt.execution_options(yield_per=batch_size))
+    for partition in result.mappings().partitions():
+        for row in partition:
+            yield dict(row)
+
+
+def ndjson_chunks(items, chunk_bytes: int = CHUNK_BYTES):
+    """Encode items as newline-delimited JSON, yielding roughly ``chunk_bytes`` at a time."""
+    buf = []
+    size = 0
+    for item in items:
+        line = _dumps(item)
+        buf.append(line)
+        size += len(line) + 1
+        if size >= chunk_bytes:
+            yield ("\n".join(buf) + "\n").encode("utf-8")
+            buf = []
+            size = 0
+    if buf:
+        yield ("\n".join(buf) + "\n").encode("utf-8")
+
+
+def json_array_chunks(items, chunk_bytes: int = CHUNK_BYTES):
+    """Encode items as a single JSON array, yielding roughly ``chunk_bytes`` at a time."""
+    buf = ["["]
+    size = 1
+    first = True
+    for item in items:
+        text = _dumps(item)
+        if not first:
+            buf.append(",")
+        first = False
+        buf.append(text)
+        size += len(text) + 1
+        if size >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+            size = 0
+    buf.append("]")
+    yield "".join(buf).encode("utf-8")
+
+
+def text_chunks(pieces, chunk_bytes: int = CHUNK_BYTES):
+    """Join text pieces into UTF-8 chunks of roughly ``chunk_bytes``; chunks end on piece boundaries."""
+    buf = []
+    size = 0
+    for piece in pieces:
+        buf.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield "".join(buf).encode("utf-8")
+            buf = []
+            size = 0
+    if buf:
+        yield "".join(buf).encode("utf-8")
+
+
+def export_chunks(db: Session, stmt, fmt: str = "ndjson", batch_size: int = YIELD_PER):
+    """Stream the rows of ``stmt`` encoded as ``fmt`` ("ndjson" or "json")."""
+    encode = ndjson_chunks if fmt == "ndjson" else json_array_chunks
+    return encode(iter_rows(db, stmt, batch_size))
@@ -10,6 +10,23 @@ test_engine = create_engine(TEST_DATABASE_URL, connect_args={"check_same_thread"
 TestSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=test_engine)
 
 
+def pytest_addoption(parser):
+    parser.addoption("--benchmark", action="store_true", help="also run the wall-clock benchmarks")
+
+
+def pytest_configure(config):
+    config.addinivalue_line("markers", "benchmark: wall-clock timing comparison, skipped unless --benchmark is given")
+
+
+def pytest_collection_modifyitems(config, items):
+    if config.getoption("--benchmark"):
+        return
+    skip = pytest.mark.skip(reason="benchmark; run with --benchmark")
+    for item in items:
+        if "benchmark" in item.keywords:
+            item.add_marker(skip)
+
+
 @pytest.fixture(autouse=True)
 def reset_db():
     """Reset database before each test."""
@@ -30,3 +47,117 @@ def db():
     session.close()
     transaction.rollback()
     connection.close()
+
+
+@pytest.fixture
+def count_queries():
+    """Count SQL statements executed against the test engine inside a block."""
+    from contextlib import contextmanager
+    from sqlalchemy import event
+
+    @contextmanager
+    def _counter():
+        statements = []
+
+        def _before_execute(conn, cursor, statement, parameters, context, executemany):
+            statements.append(statement)
+
+        event.listen(test_engine, "before_cursor_execute", _before_execute)
+        try:
+            yield statements
+        finally:
+            event.remove(test_engine, "before_cursor_execute", _before_execute)
+
+    return _counter
+
+
+@pytest.fixture
+def audit_clock(monkeypatch):
+    """Freeze the audit clock; set ``now`` or call ``advance`` to move it."""
+    from datetime import datetime, timedelta, timezone
+    from src.app import audit
+
+    class _Clock:
+        now = datetime.now(timezone.utc)
+
+        def advance(self, **kwargs):
+            self.now += timedelta(**kwargs)
+
+    clock = _Clock()
+    monkeypatch.setattr(audit, "_now", lambda: clock.now)
+    return clock
+
+
+@pytest.fixture
+def network_printer():
+    """A local TCP listener standing in for a network Zebra printer; records what it receives."""
+    import socket
+    import threading
+    import time
+    from src.app.printer import PrinterConfig
+
+    class _FakeNetworkPrinter:
+        def __init__(self):
+            self.server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            self.server.bind(("127.0.0.1", 0))
+            self.server.listen()
+            self.port = self.server.getsockname()[1]
+            self.received = bytearray()
+            self.streams = []  # bytes received on each connection, in accept order
+            self.connections = 0
+            self._open = []
+            self._lock = threading.Lock()
+            threading.Thread(target=self._serve, daemon=True).start()
+
+        def _serve(self):
+            while True:
+                try:
+                    conn, _ = self.server.accept()
+                except OSError:
+                    return
+                with self._lock:
+                    self.connections += 1
+                    self._open.append(conn)
+                threading.Thread(target=self._read, args=(conn,), daemon=True).start()
+
+        def _read(self, conn):
+            stream = bytearray()
+            with self._lock:
+                self.streams.append(stream)
+            try:
+                while data := conn.recv(65536):
+                    with self._lock:
+                        stream += data
+                        self.received += data
+            except OSError:
+                pass
+
+        def config(self):
+            return PrinterConfig(name="fake", connection_type="network", address="127.0.0.1", port=self.port, timeout=5)
+
+        def wait_for(self, size: int):
+            deadline = time.monotonic() + 5
+            while len(self.received) < size and time.monotonic() < deadline:
+                time.sleep(0.005)
+            return bytes(self.received)
+
+        def drop_connections(self):
+            """Close every accepted connection, as a printer does when it restarts."""
+            with self._lock:
+                conns, self._open = self._open, []
+            for conn in conns:
+                conn.shutdown(socket.SHUT_RDWR)
+                conn.close()
+
+        def close(self):
+            # shutdown wakes the blocked accept(); close alone can leave the listener up
+            try:
+                self.server.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            self.server.close()
+            self.drop_connections()
+
+    printer = _FakeNetworkPrinter()
+    yield printer
+    printer.close()
@@ -0,0 +1,88 @@
+from datetime import timedelta
+from sqlalchemy import create_engine, update, delete
+from sqlalchemy.orm import Session
+from src.app import audit, crud, models
+
+
+def _audited_batch(db, code, bottles=3):
+    batch = models.Batch(batch_code=code)
+    db.add(batch)
+    db.commit()
+    crud.create_bottles_for_batch(db, batch.id, count=bottles, user_id="u1")
+    return batch.id
+
+
+def test_business_transactions_do_not_touch_the_chain_head(db, count_queries):
+    batch = models.Batch(batch_code="CH-0")
+    db.add(batch)
+    db.commit()
+    with count_queries() as statements:
+        crud.create_bottles_for_batch(db, batch.id, count=3, user_id="u1")
+    assert not [s for s in statements if "audit_chain_state" in s]
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.seq.is_(None)).count() == 3
+
+
+def test_events_are_chained_in_sequence(db):
+    _audited_batch(db, "CH-1")
+    _audited_batch(db, "CH-2")
+    assert audit.seal_chain(db.connection()) == 6
+    assert audit.seal_chain(db.connection()) == 0
+    events = db.query(models.AuditEvent).order_by(models.AuditEvent.seq).all()
+    assert [e.seq for e in events] == list(range(1, 7))
+    assert events[0].prev_hash == audit.GENESIS_HASH
+    for prev, ev in zip(events, events[1:]):
+        assert ev.prev_hash == prev.hash
+    assert db.get(models.AuditChainState, audit.CHAIN_STATE_ID).last_seq == 6
+
+
+def test_verifier_is_incremental(db):
+    _audited_batch(db, "CH-1", bottles=50)
+    result = audit.verify_chain(db)
+    assert result == {"ok": True, "verified_seq": 50, "checked": 50, "error": None}
+
+    _audited_batch(db, "CH-2", bottles=5)
+    result = audit.verify_chain(db)
+    assert result["ok"] and result["checked"] == 5 and result["verified_seq"] == 55
+    assert audit.verify_chain(db)["checked"] == 0
+
+
+def test_verifier_detects_edits_deletions_and_truncation(db):
+    _audited_batch(db, "CH-1", bottles=10)
+    audit.seal_chain(db.connection())
+    db.commit()
+    table = models.AuditEvent.__table__
+
+    db.execute(update(table).where(table.c.seq == 4).values(user_id="mallory"))
+    db.commit()
+    result = audit.verify_chain(db)
+    assert not result["ok"]
+    assert result["error"]["seq"] == 4 and "hash" in result["error"]["problem"]
+    assert result["verified_seq"] == 3
+
+    db.execute(update(table).where(table.c.seq == 4).values(user_id="u1"))
+    db.execute(delete(table).where(table.c.seq == 7))
+    db.commit()
+    result = audit.verify_chain(db)
+    assert result["error"]["seq"] == 7 and "missing" in result["error"]["problem"]
+
+    db.execute(delete(table).where(table.c.seq >= 7))
+    db.commit()
+    result = audit.verify_chain(db, full=True)
+    assert result["verified_seq"] == 6
+    assert "7 to 10 are missing" in result["error"]["problem"]
+
+
+def test_verify_and_archive_leave_the_callers_transaction_alone(tmp_path, audit_clock):
+    engine = create_engine(f"sqlite:///{tmp_path / 'chain.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as session:
+        _audited_batch(session, "CH-OWN")
+        session.add(models.Batch(batch_code="CH-PENDING"))
+        assert audit.verify_chain(session)["ok"]
+        cutoff = audit_clock.now + timedelta(seconds=1)
+        audit_clock.advance(days=audit.MIN_RETENTION_DAYS + 1)
+        assert audit.archive_events(session, before=cutoff) == 3
+        session.rollback()
+        assert session.query(models.Batch).filter_by(batch_code="CH-PENDING").count() == 0
+        assert session.query(models.AuditEventArchive).count() == 3
+    engine.dispose()
@@ -0,0 +1,91 @@
+import pytest
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import text
+from sqlalchemy.exc import IntegrityError
+from src.app import audit, crud, models
+
+
+def _events(db, n, entity_id="b1", user_id="u1", operation="create"):
+    for i in range(n):
+        audit.record(db, user_id, operation, "bottle", entity_id, after={"i": i})
+    db.commit()
+
+
+def _bottle_events(db, code, bottles):
+    """Audit events written the normal way: one per bottle created for a new batch."""
+    batch = models.Batch(batch_code=code)
+    db.add(batch)
+    db.commit()
+    crud.create_bottles_for_batch(db, batch.id, count=bottles, user_id="u1")
+    return batch.id
+
+
+def test_filters_and_pagination(db):
+    _events(db, 7, entity_id="b1")
+    _events(db, 3, entity_id="b2", user_id="u2", operation="discard")
+
+    page = crud.get_audit_events_page(db, entity_type="bottle", entity_id="b1", limit=5)
+    assert len(page["items"]) == 5 and page["next_cursor"]
+    rest = crud.get_audit_events_page(db, entity_type="bottle", entity_id="b1", limit=5, cursor=page["next_cursor"])
+    assert len(rest["items"]) == 2 and rest["next_cursor"] is None
+    assert len({e["id"] for e in page["items"] + rest["items"]}) == 7
+
+    assert len(crud.get_audit_events_page(db, user_id="u2")["items"]) == 3
+    assert len(crud.get_audit_events_page(db, operation="discard", user_id="u1")["items"]) == 0
+
+
+def test_entity_lookup_uses_composite_index(db):
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT * FROM audit_events WHERE entity_type = 'bottle' AND entity_id = 'b1' "
+        "ORDER BY timestamp DESC, id DESC LIMIT 50"
+    )).all()
+    assert any("ix_audit_events_entity_ts" in str(row) for row in plan)
+
+
+def test_archived_events_leave_recent_queries_and_keep_the_chain(db, audit_clock):
+    today = audit_clock.now
+    audit_clock.now = today - timedelta(days=400)
+    _bottle_events(db, "ARC-OLD", 4)
+    audit_clock.now = today
+    _bottle_events(db, "ARC-NEW", 2)
+
+    assert crud.archive_audit_events(db, today - timedelta(days=380), "admin1", "admin2") == 4
+    live = db.query(models.AuditEvent).all()
+    assert sorted(e.operation for e in live if e.entity_type == "bottle") == ["create", "create"]
+    assert crud.get_audit_events_page(db, time_to=today - timedelta(days=300))["items"] == []
+
+    window = crud.get_audit_events_page(db, time_to=today - timedelta(days=300), include_archive=True)
+    assert len(window["items"]) == 4
+
+    runs = crud.get_audit_events_page(db, entity_type="audit_log", operation="archive")["items"]
+    assert len(runs) == 1
+    assert runs[0]["user_id"] == "admin1"
+    assert runs[0]["after"]["archived"] == 4 and runs[0]["after"]["approved_by"] == ["admin1", "admin2"]
+
+
+def test_archive_needs_two_approvers_and_keeps_the_retention_window(db, audit_clock):
+    today = audit_clock.now
+    audit_clock.now = today - timedelta(days=400)
+    _bottle_events(db, "ARC-R", 2)
+    audit_clock.now = today
+
+    with pytest.raises(IntegrityError):
+        crud.archive_audit_events(db, today - timedelta(days=380), "admin1", None)
+    with pytest.raises(IntegrityError):
+        crud.archive_audit_events(db, today - timedelta(days=380), "admin1", "admin1")
+    with pytest.raises(IntegrityError) as exc:
+        crud.archive_audit_events(db, today - timedelta(days=30), "admin1", "admin2")
+    assert "at least" in str(exc.value)
+    assert db.query(models.AuditEventArchive).count() == 0
+
+
+def test_chain_verifies_across_archive_and_live_events(db, audit_clock):
+    start = audit_clock.now
+    _bottle_events(db, "ARC-C1", 5)
+    audit_clock.advance(days=400)
+    assert crud.archive_audit_events(db, start + timedelta(days=1), "admin1", "admin2") == 5
+    _bottle_events(db, "ARC-C2", 3)
+
+    result = audit.verify_chain(db, full=True)
+    # 5 archived, the archive run itself, then 3 more
+    assert result == {"ok": True, "verified_seq": 9, "checked": 9, "error": None}
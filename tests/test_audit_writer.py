@@ -0,0 +1,150 @@
+import json
+import pytest
+from sqlalchemy import create_engine, event
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.app import audit, crud, models
+
+
+@pytest.fixture
+def wal(tmp_path):
+    yield audit.configure_wal(str(tmp_path / "audit.wal"))
+    audit.configure_wal(None)
+
+
+@pytest.fixture
+def file_engine(tmp_path):
+    """A separate file database, e.g. the one the WAL drains into from its own thread."""
+    engine = create_engine(f"sqlite:///{tmp_path / 'drain.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    yield engine
+    engine.dispose()
+
+
+def _audit_rows(engine):
+    with engine.connect() as conn:
+        return conn.execute(models.AuditEvent.__table__.select()).all()
+
+
+def _batch(db):
+    batch = models.Batch(batch_code="AUD-B1")
+    db.add(batch)
+    db.commit()
+    return batch.id
+
+
+def test_unit_of_work_audits_are_one_insert(db, count_queries):
+    batch_id = _batch(db)
+    with count_queries() as statements:
+        crud.create_bottles_for_batch(db, batch_id, count=200, volume_ml=30.0, user_id="u1")
+    audit_inserts = [s for s in statements if s.startswith("INSERT INTO audit_events")]
+    assert len(audit_inserts) == 1
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.entity_type == "bottle").count() == 200
+
+
+def test_rolled_back_audits_are_discarded(file_engine):
+    with Session(file_engine) as session:
+        session.add(models.Batch(batch_code="AUD-RB"))
+        session.flush()
+        audit.record(session, "u1", "create", "batch", "AUD-RB")
+        session.rollback()
+        session.commit()
+        assert session.query(models.AuditEvent).count() == 0
+
+
+def _wal_lines(wal):
+    with open(wal.path) as f:
+        return [json.loads(line) for line in f]
+
+
+def test_wal_defers_audit_rows_until_drained(wal, file_engine):
+    with Session(file_engine) as session:
+        batch_id = _batch(session)
+        crud.create_bottles_for_batch(session, batch_id, count=3, user_id="u1")
+        assert session.query(models.AuditEvent).count() == 0
+    assert len(_wal_lines(wal)) == 3
+
+    assert wal.drain(file_engine) == 3
+    assert wal.drain(file_engine) == 0
+    assert len(_audit_rows(file_engine)) == 3
+    with file_engine.connect() as conn:
+        assert conn.execute(models.AuditWALCommit.__table__.select()).all() == []
+
+
+def test_wal_rows_are_on_disk_before_the_commit(wal, file_engine):
+    # A crash right after COMMIT must not lose the audit trail of what was committed
+    seen_at_commit = []
+    event.listen(file_engine, "commit", lambda conn: seen_at_commit.append(len(_wal_lines(wal))))
+    with Session(file_engine) as session:
+        audit.record(session, "u1", "create", "bottle", "b1")
+        session.commit()
+    assert seen_at_commit == [1]
+
+
+def test_wal_redrain_after_lost_offset_skips_existing_rows(wal, file_engine):
+    with Session(file_engine) as session:
+        audit.record(session, "u1", "create", "bottle", "b1")
+        session.commit()
+    wal.drain(file_engine)
+    # Simulate a crash after the insert but before the offset was saved
+    wal._write_offset(0)
+    assert wal.drain(file_engine) == 1
+    assert len(_audit_rows(file_engine)) == 1
+
+
+def test_drainer_waits_for_a_missing_marker_then_skips_it(wal, file_engine, audit_clock):
+    # Rows fsynced by a transaction whose process died before COMMIT
+    wal.append([{"id": "lost", "timestamp": audit_clock.now, "user_id": "u1", "operation": "create",
+                 "entity_type": "bottle", "entity_id": "lost", "before": None, "after": None, "reason": None}], "txn-lost")
+    with Session(file_engine) as session:
+        audit.record(session, "u1", "create", "bottle", "kept")
+        session.commit()
+
+    assert wal.drain(file_engine) == 0
+    assert _audit_rows(file_engine) == []
+    audit_clock.advance(seconds=61)
+    assert wal.drain(file_engine) == 1
+    assert [r.entity_id for r in _audit_rows(file_engine)] == ["kept"]
+
+
+def test_savepoint_rollback_discards_only_its_audits(file_engine):
+    with Session(file_engine) as session:
+        audit.record(session, "u1", "create", "batch", "kept")
+        savepoint = session.begin_nested()
+        audit.record(session, "u1", "create", "batch", "dropped")
+        savepoint.rollback()
+        with session.begin_nested():
+            audit.record(session, "u1", "create", "batch", "nested")
+        session.commit()
+        assert sorted(e.entity_id for e in session.query(models.AuditEvent)) == ["kept", "nested"]
+
+
+def test_failed_commit_is_never_drained(wal, file_engine):
+    with Session(file_engine) as session:
+        session.add(models.Batch(id="dup", batch_code="AUD-DUP-1"))
+        session.commit()
+
+    with Session(file_engine) as session:
+        session.add(models.Batch(id="dup", batch_code="AUD-DUP-2"))
+        audit.record(session, "u1", "create", "batch", "dup")
+        with pytest.raises(IntegrityError):
+            session.commit()
+        session.rollback()
+        audit.record(session, "u1", "create", "batch", "after-failure")
+        session.commit()
+
+    assert [line.get("aborted", False) for line in _wal_lines(wal)] == [False, True, False]
+    # The rollback line lets the drainer skip the failed commit without waiting for the grace period
+    assert wal.drain(file_engine) == 1
+    assert [r.entity_id for r in _audit_rows(file_engine)] == ["after-failure"]
+
+
+def test_chain_sealer_seals_in_committed_batches(file_engine):
+    with Session(file_engine) as session:
+        for i in range(7):
+            audit.record(session, "u1", "create", "bottle", f"s{i}")
+        session.commit()
+    assert audit.seal_all(file_engine, batch_size=3) == 7
+    rows = sorted(_audit_rows(file_engine), key=lambda r: r.seq)
+    assert [r.seq for r in rows] == list(range(1, 8))
+    assert all(r.hash for r in rows)
@@ -0,0 +1,46 @@
+from datetime import datetime
+import pytest
+from sqlalchemy.exc import IntegrityError
+from src.app import crud, models
+
+
+def _donations(db, n):
+    donor = models.Donor(first_name="Pool")
+    db.add(donor)
+    db.flush()
+    records = []
+    for i in range(n):
+        rec = models.DonationRecord(donation_id=f"H1-20240101-{i:03d}", donor_id=donor.id,
+                                    donation_date=datetime(2024, 1, 1), number_of_bottles=1, volume_ml=100.0)
+        db.add(rec)
+        records.append(rec)
+    db.commit()
+    return records
+
+
+def test_resolution_is_one_query_and_accepts_either_identifier(db, count_queries):
+    records = _donations(db, 60)
+    identifiers = [r.id if i % 2 else r.donation_id for i, r in enumerate(records)]
+    with count_queries() as statements:
+        resolved = crud._resolve_donations_for_batch(db, identifiers)
+    assert [d.id for d in resolved] == [r.id for r in records]
+    assert len(statements) == 1
+
+
+def test_resolution_reports_every_missing_identifier(db):
+    records = _donations(db, 2)
+    with pytest.raises(IntegrityError) as exc:
+        crud._resolve_donations_for_batch(db, [records[0].id, "NOPE-1", "NOPE-2"])
+    assert "NOPE-1" in str(exc.value) and "NOPE-2" in str(exc.value)
+
+
+def test_batch_bottles_and_audits_are_bulk_inserted(db, count_queries):
+    records = _donations(db, 3)
+    with count_queries() as statements:
+        batch = crud.assign_donations_to_batch(db, [r.id for r in records], batch_code="BULK-B1", user_id="u1",
+                                               number_of_bottles=40, bottle_volumes=[30.0] * 40)
+    bottle_inserts = [s for s in statements if s.startswith("INSERT INTO bottles")]
+    assert len(bottle_inserts) == 1
+    assert db.query(models.Bottle).filter(models.Bottle.batch_id == batch.id).count() == 40
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.entity_type == "bottle").count() == 40
+    assert batch.total_volume_ml == 300.0
@@ -0,0 +1,68 @@
+import time
+import pytest
+from sqlalchemy import insert, text
+from sqlalchemy.exc import IntegrityError
+from src.app import crud, models
+
+
+def _batch(db, code):
+    base_code, code_seq = crud.split_batch_code(code)
+    db.add(models.Batch(batch_code=code, base_code=base_code, code_seq=code_seq))
+    db.commit()
+
+
+def test_split_batch_code():
+    assert crud.split_batch_code("MB-240101") == ("MB", 240101)
+    assert crud.split_batch_code("MB-240101-007") == ("MB-240101", 7)
+    assert crud.split_batch_code("POOL") == ("POOL", 0)
+
+
+def test_next_code_follows_highest_suffix(db):
+    assert crud.get_next_batch_code(db, "POOL") == "POOL"
+    _batch(db, "POOL")
+    assert crud.get_next_batch_code(db, "POOL") == "POOL-001"
+    _batch(db, "POOL-001")
+    _batch(db, "POOL-005")
+    assert crud.get_next_batch_code(db, "POOL") == "POOL-006"
+
+
+def test_sequence_limit_is_configurable(db, monkeypatch):
+    _batch(db, "LIM")
+    _batch(db, "LIM-002")
+    monkeypatch.setattr(crud, "BATCH_CODE_MAX_SEQUENCE", 2)
+    with pytest.raises(IntegrityError):
+        crud.get_next_batch_code(db, "LIM")
+
+
+def _insert_batches(db, bases):
+    rows = []
+    for base in range(bases):
+        for seq in range(100):
+            code = f"B{base:04d}" if seq == 0 else f"B{base:04d}-{seq:03d}"
+            rows.append({"id": code, "batch_code": code, "base_code": f"B{base:04d}", "code_seq": seq,
+                         "status": models.BatchStatus.Created})
+    db.execute(insert(models.Batch), rows)
+    db.commit()
+
+
+def test_next_code_is_two_index_probes(db, count_queries):
+    _insert_batches(db, 10)
+    plan = db.execute(text(
+        "EXPLAIN QUERY PLAN SELECT max(code_seq) FROM batches WHERE base_code = 'B0005'"
+    )).all()
+    assert any("ix_batches_base_code_seq" in str(row) for row in plan)
+
+    with count_queries() as statements:
+        for _ in range(100):
+            assert crud.get_next_batch_code(db, "B0005") == "B0005-100"
+    assert len(statements) == 200
+
+
+@pytest.mark.benchmark
+def test_next_code_with_100k_existing_batches(db):
+    _insert_batches(db, 1000)
+    started = time.perf_counter()
+    for _ in range(100):
+        assert crud.get_next_batch_code(db, "B0500") == "B0500-100"
+    # Two index probes per lookup; a LIKE scan over 100k codes takes far longer
+    assert time.perf_counter() - started < 1.0
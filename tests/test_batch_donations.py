@@ -0,0 +1,56 @@
+from datetime import datetime
+from src.app import crud, models
+
+
+def _pooled_batch(db):
+    donor = models.Donor(first_name="Ada", last_name="Lovelace", hospital_number="H77")
+    db.add(donor)
+    db.flush()
+    records = [
+        models.DonationRecord(donation_id=f"H77-20240101-{i:03d}", donor_id=donor.id,
+                              donation_date=datetime(2024, 1, 1), number_of_bottles=1, volume_ml=50.0)
+        for i in range(3)
+    ]
+    db.add_all(records)
+    db.commit()
+    batch = crud.assign_donations_to_batch(db, [r.donation_id for r in reversed(records)], batch_code="BD-B1", user_id="u1")
+    return batch, records
+
+
+def test_assignment_writes_association_rows_in_order(db):
+    batch, records = _pooled_batch(db)
+    links = db.query(models.BatchDonation).filter(models.BatchDonation.batch_id == batch.id).order_by(models.BatchDonation.position).all()
+    assert [link.donation_record_id for link in links] == [r.id for r in reversed(records)]
+    assert batch.donation_ids is None
+
+
+def test_get_batch_reads_donations_and_donor_in_one_join(db, count_queries):
+    batch, records = _pooled_batch(db)
+    batch_id = batch.id
+    with count_queries() as statements:
+        data = crud.get_batch(db, batch_id)
+    assert len(statements) == 2
+    assert data["donation_ids"] == [r.donation_id for r in reversed(records)]
+    assert data["donor_name"] == "Ada Lovelace"
+    assert data["donor_hospital_number"] == "H77"
+
+
+def test_donation_to_batch_lookup(db, count_queries):
+    batch, records = _pooled_batch(db)
+    batch_id, donation_id = batch.id, records[1].donation_id
+    with count_queries() as statements:
+        batches = crud.get_batches_for_donation(db, donation_id)
+    assert len(statements) == 1
+    assert [b.id for b in batches] == [batch_id]
+    assert [b.id for b in crud.get_batches_for_donation(db, records[1].id)] == [batch.id]
+    assert crud.get_batches_for_donation(db, "unknown") is None
+
+
+def test_unpooled_donation_has_no_batches(db):
+    donor = models.Donor(first_name="Grace", hospital_number="H78")
+    db.add(donor)
+    db.flush()
+    db.add(models.DonationRecord(donation_id="H78-20240101-001", donor_id=donor.id,
+                                 donation_date=datetime(2024, 1, 1), number_of_bottles=1, volume_ml=50.0))
+    db.commit()
+    assert crud.get_batches_for_donation(db, "H78-20240101-001") == []
@@ -0,0 +1,44 @@
+from datetime import datetime, timezone
+from src.app import crud, models
+
+
+def _released_batch_with_bottles(db, code, count):
+    batch = models.Batch(batch_code=code, status=models.BatchStatus.Released)
+    db.add(batch)
+    db.flush()
+    db.add(models.PasteurisationRecord(batch_id=batch.id, end_time=datetime(2024, 1, 1, tzinfo=timezone.utc)))
+    db.add(models.PasteurisationRecord(batch_id=batch.id, end_time=datetime(2024, 1, 2, tzinfo=timezone.utc)))
+    for i in range(count):
+        db.add(models.Bottle(barcode=f"{code}-{i}", batch_id=batch.id, volume_ml=50.0))
+    db.commit()
+    return batch
+
+
+def test_get_all_bottles_enriches_from_batch_and_pasteurisation(db):
+    batch = _released_batch_with_bottles(db, "INV-B1", 2)
+    held = models.Batch(batch_code="INV-B2", status=models.BatchStatus.Tested)
+    db.add(held)
+    db.flush()
+    db.add(models.Bottle(barcode="INV-B2-0", batch_id=held.id, volume_ml=50.0))
+    db.commit()
+
+    bottles = crud.get_all_bottles(db)
+    assert len(bottles) == 2
+    for b in bottles:
+        assert b["batch_id"] == batch.id
+        assert b["batch_code"] == "INV-B1"
+        assert b["status"] == "Available"
+        assert b["pasteurisation_date"].day == 2
+
+
+def test_get_all_bottles_statement_count_is_constant(db, count_queries):
+    _released_batch_with_bottles(db, "INV-S1", 1)
+    with count_queries() as small:
+        assert len(crud.get_all_bottles(db)) == 1
+
+    for n in range(2, 12):
+        _released_batch_with_bottles(db, f"INV-S{n}", 25)
+    with count_queries() as large:
+        assert len(crud.get_all_bottles(db)) == 251
+
+    assert len(large) == len(small) == 1
@@ -0,0 +1,149 @@
+from datetime import datetime
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.app import crud, models
+
+
+def _dispatch(db, n=3):
+    hospital = models.Hospital(name="NICU")
+    batch = models.Batch(batch_code="BS-1", status=models.BatchStatus.Released)
+    db.add_all([hospital, batch])
+    db.flush()
+    bottles = [models.Bottle(barcode=f"BS-1-{i}", batch_id=batch.id, volume_ml=50.0) for i in range(n)]
+    db.add_all(bottles)
+    db.commit()
+    return crud.create_dispatch(db, [b.id for b in bottles], hospital.id, dispatch_code="BS-D1")
+
+
+def test_bulk_scan_reports_each_event_in_order(db):
+    disp = _dispatch(db)
+    when = datetime(2026, 1, 2, 3, 4, 5)
+    results = crud.bulk_scan_dispatch_items(db, disp.id, [
+        {"barcode": "BS-1-0", "scan_type": "out", "timestamp": when},
+        {"barcode": "BS-1-0", "scan_type": "out"},
+        {"barcode": "NOPE", "scan_type": "out"},
+        {"barcode": "BS-1-1", "scan_type": "sideways"},
+        {"barcode": "BS-1-1", "scan_type": "in"},
+    ], user_id="u1")
+    assert [r["result"] for r in results] == ["scanned", "duplicate", "unknown", "invalid", "scanned"]
+
+    item = db.query(models.DispatchItem).filter(models.DispatchItem.barcode == "BS-1-0").one()
+    assert item.scanned_out and item.scanned_out_at == when
+    assert db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == disp.id).count() == 2
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.operation == "dispatch_scan").count() == 2
+
+    again = crud.bulk_scan_dispatch_items(db, disp.id, [{"barcode": "BS-1-0", "scan_type": "out"}])
+    assert again[0]["result"] == "duplicate"
+
+
+def test_bulk_scan_unknown_dispatch(db):
+    with pytest.raises(IntegrityError):
+        crud.bulk_scan_dispatch_items(db, "missing", [{"barcode": "x", "scan_type": "out"}])
+
+
+def test_bulk_scan_statement_count_is_constant(db, count_queries):
+    dispatch_id = _dispatch(db, n=200).id
+    with count_queries() as small:
+        crud.bulk_scan_dispatch_items(db, dispatch_id, [{"barcode": f"BS-1-{i}", "scan_type": "out"} for i in range(2)])
+    with count_queries() as large:
+        crud.bulk_scan_dispatch_items(db, dispatch_id, [{"barcode": f"BS-1-{i}", "scan_type": "out"} for i in range(2, 200)])
+    assert len(large) == len(small)
+
+
+def test_journal_replay_is_idempotent(db):
+    disp = _dispatch(db)
+    dispatch_id = disp.id
+    journal = [
+        {"idempotency_key": "dev1-1", "barcode": "BS-1-0", "scan_type": "in", "timestamp": "2026-01-02T03:04:05"},
+        {"idempotency_key": "dev1-2", "barcode": "BS-1-1", "scan_type": "in"},
+        {"idempotency_key": "dev1-2", "barcode": "BS-1-1", "scan_type": "in"},
+    ]
+    first = crud.bulk_scan_dispatch_items(db, dispatch_id, journal, user_id="rec1")
+    assert [r["result"] for r in first] == ["scanned", "scanned", "replayed"]
+    again = crud.bulk_scan_dispatch_items(db, dispatch_id, journal, user_id="rec1")
+    assert [r["result"] for r in again] == ["replayed"] * 3
+    assert db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == dispatch_id).count() == 2
+
+    item = crud.scan_dispatch_item(db, dispatch_id, "BS-1-0", scan_type="in", idempotency_key="dev1-1")
+    assert item.scanned_in
+    assert db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == dispatch_id).count() == 2
+
+
+def test_unique_index_rejects_a_duplicate_key(db):
+    disp = _dispatch(db, n=1)
+    db.add(models.DispatchScan(dispatch_id=disp.id, scan_type="in", idempotency_key="k"))
+    db.commit()
+    db.add(models.DispatchScan(dispatch_id=disp.id, scan_type="in", idempotency_key="k"))
+    with pytest.raises(IntegrityError):
+        db.flush()
+    db.rollback()
+
+
+def test_concurrent_sync_of_the_same_keys_reads_as_replayed(tmp_path, monkeypatch):
+    engine = create_engine(f"sqlite:///{tmp_path / 'sync.db'}")
+    models.Base.metadata.create_all(bind=engine)
+    with Session(engine) as db:
+        dispatch_id = _dispatch(db, n=2).id
+    journal = [
+        {"idempotency_key": "dev1-1", "barcode": "BS-1-0", "scan_type": "in"},
+        {"idempotency_key": "dev1-2", "barcode": "BS-1-1", "scan_type": "in"},
+    ]
+    apply_scan_events = crud._apply_scan_events
+    attempts = []
+
+    def racing(db, *args, **kwargs):
+        results = apply_scan_events(db, *args, **kwargs)
+        attempts.append(results)
+        if len(attempts) == 1:
+            # the other device's sync of the first event commits in between
+            monkeypatch.setattr(crud, "_apply_scan_events", apply_scan_events)
+            with Session(engine) as other:
+                crud.bulk_scan_dispatch_items(other, dispatch_id, journal[:1], user_id="dev1")
+            monkeypatch.setattr(crud, "_apply_scan_events", racing)
+        return results
+
+    monkeypatch.setattr(crud, "_apply_scan_events", racing)
+    with Session(engine) as db:
+        results = crud.bulk_scan_dispatch_items(db, dispatch_id, journal, user_id="dev1")
+        assert len(attempts) == 2
+        assert [r["result"] for r in attempts[0]] == ["scanned", "scanned"]
+        assert [r["result"] for r in results] == ["replayed", "scanned"]
+        assert db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == dispatch_id).count() == 2
+    engine.dispose()
+
+
+def test_receive_replays_journal_in_the_same_transaction(db):
+    disp = _dispatch(db, n=2)
+    dispatch_id = disp.id
+    when = datetime(2026, 3, 4, 5, 6, 7)
+    journal = [{"idempotency_key": "cold-1", "barcode": "BS-1-0", "scan_type": "in", "timestamp": when}]
+    received, results = crud.receive_dispatch_with_journal(db, dispatch_id, received_by="rec1", journal=journal)
+    assert received.status == models.DispatchStatus.Received
+    assert [r["result"] for r in results] == ["scanned"]
+
+    items = {it.barcode: it for it in db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == dispatch_id)}
+    assert items["BS-1-0"].scanned_in_at == when
+    assert items["BS-1-1"].scanned_in
+
+    audits = db.query(models.AuditEvent).count()
+    _, retried = crud.receive_dispatch_with_journal(db, dispatch_id, received_by="rec1", journal=journal)
+    assert [r["result"] for r in retried] == ["replayed"]
+    assert db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == dispatch_id).count() == 1
+    assert db.query(models.AuditEvent).count() == audits
+
+
+def test_receive_journal_events_default_to_scan_in(db):
+    disp = _dispatch(db, n=1)
+    dispatch_id = disp.id
+    journal = [{"idempotency_key": "cold-2", "barcode": "BS-1-0"}]
+    _, results = crud.receive_dispatch_with_journal(db, dispatch_id, received_by="rec1", journal=journal)
+    assert [(r["scan_type"], r["result"]) for r in results] == [("in", "scanned")]
+    item = db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == dispatch_id).one()
+    assert item.scanned_in and not item.scanned_out
+    scan = db.query(models.DispatchScan).filter(models.DispatchScan.dispatch_id == dispatch_id).one()
+    assert scan.scan_type == "in"
+
+    _, retried = crud.receive_dispatch_with_journal(db, dispatch_id, received_by="rec1", journal=journal)
+    assert [(r["scan_type"], r["result"]) for r in retried] == [("in", "replayed")]
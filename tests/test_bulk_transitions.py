@@ -0,0 +1,190 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import create_engine
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import Session
+from src.app import crud, models, stats
+from src.app.database import configure_sqlite_transactions
+from src.app.models import gen_uuid
+
+
+def _batches(db, n, status=models.BatchStatus.Created):
+    batches = [models.Batch(id=gen_uuid(), batch_code=f"BT-{i}", status=status) for i in range(n)]
+    db.add_all(batches)
+    db.commit()
+    return [b.id for b in batches]
+
+
+def _bottles(db, n, status=models.BottleStatus.Available):
+    batch = models.Batch(id=gen_uuid(), batch_code="BT-BOTTLES", status=models.BatchStatus.Released)
+    bottles = [models.Bottle(id=gen_uuid(), barcode=f"BT-B-{i}", batch_id=batch.id, volume_ml=50.0, status=status) for i in range(n)]
+    db.add_all([batch] + bottles)
+    db.commit()
+    return [b.id for b in bottles]
+
+
+def test_pasteuriser_run_over_several_batches(db):
+    ids = _batches(db, 3)
+    ops = [{"entity_type": "batch", "id": bid, "trigger": "start_pasteurisation", "device_id": "P1"} for bid in ids]
+    ops += [{"entity_type": "batch", "id": bid, "trigger": "complete_pasteurisation"} for bid in ids]
+    out = crud.bulk_transition(db, ops, user_id="op1")
+    assert out["applied"] == 6 and out["failed"] == 0
+
+    for b in db.query(models.Batch).filter(models.Batch.id.in_(ids)):
+        assert b.status == models.BatchStatus.MicroTestPending
+    records = db.query(models.PasteurisationRecord).filter(models.PasteurisationRecord.batch_id.in_(ids)).all()
+    assert len(records) == 3 and all(r.end_time is not None and r.device_id == "P1" for r in records)
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.operation == "start_pasteurisation").count() == 3
+
+
+def test_atomic_failure_rolls_everything_back(tmp_path):
+    # A real rollback, which the shared test connection's outer transaction would swallow
+    engine = create_engine(f"sqlite:///{tmp_path / 'bulk.db'}")
+    configure_sqlite_transactions(engine)
+    models.Base.metadata.create_all(bind=engine)
+    db = Session(engine)
+    ids = _batches(db, 2)
+    out = crud.bulk_transition(db, [
+        {"entity_type": "batch", "id": ids[0], "trigger": "start_pasteurisation"},
+        {"entity_type": "batch", "id": ids[1], "trigger": "release", "approver2_id": "u2"},
+        {"entity_type": "batch", "id": "missing", "trigger": "dispose"},
+        {"entity_type": "pallet", "id": "x", "trigger": "dispose"},
+    ], user_id="u1")
+    assert [r["result"] for r in out["results"]] == ["rolled_back", "failed", "failed", "failed"]
+    assert "Invalid state transition" in out["results"][1]["error"]
+    assert out["applied"] == 0
+    assert {b.status for b in db.query(models.Batch).filter(models.Batch.id.in_(ids))} == {models.BatchStatus.Created}
+    assert db.query(models.PasteurisationRecord).count() == 0
+    assert db.query(models.AuditEvent).count() == 0
+    db.close()
+    engine.dispose()
+
+
+def test_partial_mode_applies_the_valid_operations(db):
+    ids = _batches(db, 2, status=models.BatchStatus.Tested)
+    out = crud.bulk_transition(db, [
+        {"entity_type": "batch", "id": ids[0], "trigger": "release", "approver2_id": "u2"},
+        {"entity_type": "batch", "id": ids[1], "trigger": "release"},
+    ], user_id="u1", atomic=False)
+    assert [r["result"] for r in out["results"]] == ["applied", "failed"]
+    assert out["results"][1]["error"] == "Two-person approval required"
+    statuses = {b.id: b.status for b in db.query(models.Batch).filter(models.Batch.id.in_(ids))}
+    assert statuses == {ids[0]: models.BatchStatus.Released, ids[1]: models.BatchStatus.Tested}
+
+
+def test_donation_accept_requires_an_approved_donor(db):
+    approved = models.Donor(id=gen_uuid(), first_name="A", status=models.DonorStatus.Approved)
+    pending = models.Donor(id=gen_uuid(), first_name="B", status=models.DonorStatus.Applied)
+    donations = [
+        models.DonationRecord(id=gen_uuid(), donor_id=donor.id, donation_date=datetime(2024, 1, 1, tzinfo=timezone.utc),
+                              number_of_bottles=1, status=models.DonationStatus.Collected)
+        for donor in (approved, pending)
+    ]
+    db.add_all([approved, pending] + donations)
+    db.commit()
+    out = crud.bulk_transition(db, [{"entity_type": "donation", "id": d.id, "trigger": "accept"} for d in donations], atomic=False)
+    assert [r["result"] for r in out["results"]] == ["applied", "failed"]
+    assert out["results"][1]["error"] == "Donor not approved"
+
+
+def test_end_of_day_disposal_keeps_counters_and_statement_count_flat(db, count_queries):
+    ids = _bottles(db, 300)
+    discard = lambda chunk: [{"entity_type": "bottle", "id": bid, "trigger": "discard", "reason": "expired"} for bid in chunk]
+    with count_queries() as small:
+        crud.bulk_transition(db, discard(ids[:2]), user_id="u1")
+    with count_queries() as large:
+        out = crud.bulk_transition(db, discard(ids[2:]), user_id="u1")
+    assert out["applied"] == 298
+    # Bottle UPDATEs go through executemany; the audit rows are multi-row INSERTs
+    assert len(large) <= len(small) + 1
+
+    bottles = stats.get_dashboard_stats(db)["bottles"]
+    assert bottles["counts"]["Discarded"] == 300 and bottles["counts"]["Available"] == 0
+    assert db.query(models.Bottle).filter(models.Bottle.status == models.BottleStatus.Discarded).count() == 300
+
+
+def test_administered_or_discarded_bottles_cannot_be_discarded(db):
+    administered = _bottles(db, 1, status=models.BottleStatus.Administered)[0]
+    out = crud.bulk_transition(db, [
+        {"entity_type": "bottle", "id": administered, "trigger": "discard"},
+    ], atomic=False)
+    assert out["results"][0]["result"] == "failed"
+    assert "Invalid state transition" in out["results"][0]["error"]
+    with pytest.raises(IntegrityError):
+        crud.discard_bottle(db, administered, "spilt")
+
+
+def test_non_atomic_run_undoes_only_the_operation_the_database_rejects(db, monkeypatch):
+    ids = _batches(db, 3)
+    real = crud._apply_transition_side_effects
+
+    def side_effects(db, op, entity, user_id, now):
+        extra = real(db, op, entity, user_id, now)
+        if entity.id == ids[1]:
+            # a record whose primary key is already taken fails at flush
+            db.add(models.PasteurisationRecord(id=extra["record_id"], batch_id=entity.id))
+        return extra
+
+    monkeypatch.setattr(crud, "_apply_transition_side_effects", side_effects)
+    out = crud.bulk_transition(db, [
+        {"entity_type": "batch", "id": bid, "trigger": "start_pasteurisation"} for bid in ids
+    ], user_id="op1", atomic=False)
+    assert [r["result"] for r in out["results"]] == ["applied", "failed", "applied"]
+    statuses = {b.id: b.status for b in db.query(models.Batch).filter(models.Batch.id.in_(ids))}
+    assert statuses[ids[1]] == models.BatchStatus.Created
+    assert statuses[ids[0]] == statuses[ids[2]] == models.BatchStatus.Pasteurising
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.entity_id == ids[1]).count() == 0
+
+
+def _bottle(db, batch_status=models.BatchStatus.Released, **fields):
+    batch = models.Batch(id=gen_uuid(), batch_code=f"BT-USE-{gen_uuid()[:8]}", status=batch_status)
+    bottle = models.Bottle(id=gen_uuid(), barcode=gen_uuid(), batch_id=batch.id, volume_ml=50.0, **fields)
+    db.add_all([batch, bottle])
+    db.commit()
+    return bottle.id
+
+
+_NOW = datetime.now(timezone.utc)
+_ALLOCATED = {"status": models.BottleStatus.Allocated, "allocated_to": "staff1"}
+_DEFROSTING = {"status": models.BottleStatus.Defrosting, "allocated_to": "staff1", "defrost_started_at": _NOW}
+_single = {
+    "allocate": lambda db, bid: crud.allocate_bottle(db, bid, baby_id="B1", user_id="u1"),
+    "start_defrosting": lambda db, bid: crud.defrost_bottle(db, bid, user_id="u1"),
+    "administer": lambda db, bid, admin_user2=None: crud.administer_bottle(db, bid, baby_id="B1", admin_user1="u1", admin_user2=admin_user2),
+}
+
+
+@pytest.mark.parametrize("trigger, batch_status, fields, op, error", [
+    ("allocate", models.BatchStatus.Tested, {}, {}, "Cannot allocate bottle - batch not released"),
+    ("allocate", models.BatchStatus.Released, {"allocated_to": "B0"}, {}, "Bottle already allocated to B0"),
+    ("start_defrosting", models.BatchStatus.Tested, _ALLOCATED, {}, "Cannot defrost bottle - batch not released"),
+    ("start_defrosting", models.BatchStatus.Released, {**_ALLOCATED, "defrost_started_at": _NOW}, {}, "Bottle already defrosted at"),
+    ("administer", models.BatchStatus.Tested, _DEFROSTING, {"admin_user2": "u2"}, "Bottle's batch not released"),
+    ("administer", models.BatchStatus.Released, _DEFROSTING, {}, "Two-person administration required"),
+    ("administer", models.BatchStatus.Released, _ALLOCATED, {"admin_user2": "u2"}, "Bottle not defrosted"),
+    ("administer", models.BatchStatus.Released, {**_DEFROSTING, "defrost_started_at": _NOW - timedelta(hours=25)},
+     {"admin_user2": "u2"}, "Defrost window exceeded (24 hour limit)"),
+])
+def test_bulk_bottle_use_makes_the_single_bottle_checks(db, trigger, batch_status, fields, op, error):
+    bottle_id = _bottle(db, batch_status, **fields)
+    out = crud.bulk_transition(db, [
+        {"entity_type": "bottle", "id": bottle_id, "trigger": trigger, "patient_id": "B1", **op},
+    ], user_id="u1", atomic=False)
+    assert out["results"][0]["result"] == "failed"
+    assert out["results"][0]["error"].startswith(error)
+
+    with pytest.raises(IntegrityError) as excinfo:
+        _single[trigger](db, bottle_id, **op)
+    assert error in str(excinfo.value)
+
+
+def test_bulk_defrost_then_administer_records_both_administrators(db):
+    bottle_id = _bottle(db, **_ALLOCATED)
+    out = crud.bulk_transition(db, [
+        {"entity_type": "bottle", "id": bottle_id, "trigger": "start_defrosting"},
+        {"entity_type": "bottle", "id": bottle_id, "trigger": "administer", "admin_user2": "u2"},
+    ], user_id="u1")
+    assert [r["result"] for r in out["results"]] == ["applied", "applied"]
+    assert out["results"][1]["admin_by"] == ["u1", "u2"]
+    bottle = db.query(models.Bottle).filter(models.Bottle.id == bottle_id).one()
+    assert bottle.status == models.BottleStatus.Administered and bottle.defrost_started_at is not None
@@ -0,0 +1,64 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from src.app import crud, models
+
+
+def _setup(db, released=3, held=0):
+    hospital = models.Hospital(name="NICU")
+    ok = models.Batch(batch_code="CD-R", status=models.BatchStatus.Released)
+    hold = models.Batch(batch_code="CD-H", status=models.BatchStatus.Tested)
+    db.add_all([hospital, ok, hold])
+    db.flush()
+    bottles = [models.Bottle(barcode=f"CD-R-{i}", batch_id=ok.id, volume_ml=50.0) for i in range(released)]
+    bottles += [models.Bottle(barcode=f"CD-H-{i}", batch_id=hold.id, volume_ml=50.0) for i in range(held)]
+    db.add_all(bottles)
+    db.commit()
+    return hospital.id, [b.id for b in bottles]
+
+
+def test_create_dispatch_writes_items_locations_and_audits(db):
+    hospital_id, ids = _setup(db)
+    disp = crud.create_dispatch(db, ids, hospital_id, dispatch_code="CD-001", created_by="u1")
+
+    items = db.query(models.DispatchItem).filter(models.DispatchItem.dispatch_id == disp.id).all()
+    assert sorted(it.bottle_id for it in items) == sorted(ids)
+    for bt in db.query(models.Bottle).filter(models.Bottle.id.in_(ids)):
+        assert bt.storage_location_id == f"InTransit:{disp.id}"
+    audits = db.query(models.AuditEvent).filter(models.AuditEvent.operation == "dispatch_assign").all()
+    assert sorted(a.entity_id for a in audits) == sorted(ids)
+
+
+def test_create_dispatch_reports_every_unreleased_bottle(db):
+    hospital_id, ids = _setup(db, released=1, held=2)
+    with pytest.raises(IntegrityError) as exc:
+        crud.create_dispatch(db, ids, hospital_id, dispatch_code="CD-002")
+    for bid in ids[1:]:
+        assert bid in str(exc.value)
+    assert db.query(models.DispatchItem).count() == 0
+
+
+def test_create_dispatch_reports_already_dispatched_bottles(db):
+    hospital_id, ids = _setup(db)
+    crud.create_dispatch(db, ids[:2], hospital_id, dispatch_code="CD-003")
+    with pytest.raises(IntegrityError) as exc:
+        crud.create_dispatch(db, ids, hospital_id, dispatch_code="CD-004")
+    assert ids[0] in str(exc.value) and ids[1] in str(exc.value)
+    assert ids[2] not in str(exc.value)
+
+
+def test_create_dispatch_reports_duplicate_bottles(db):
+    hospital_id, ids = _setup(db)
+    with pytest.raises(IntegrityError) as exc:
+        crud.create_dispatch(db, ids + [ids[1]], hospital_id, dispatch_code="CD-005")
+    assert "listed more than once" in str(exc.value) and ids[1] in str(exc.value)
+    assert db.query(models.DispatchItem).count() == 0
+
+
+def test_create_dispatch_statement_count_is_constant(db, count_queries):
+    hospital_id, ids = _setup(db, released=400)
+    with count_queries() as small:
+        crud.create_dispatch(db, ids[:2], hospital_id, dispatch_code="CD-S")
+    with count_queries() as large:
+        crud.create_dispatch(db, ids[2:], hospital_id, dispatch_code="CD-L")
+    # the first dispatch also seeds its status counter row
+    assert len(large) <= len(small)
@@ -0,0 +1,79 @@
+from src.app import crud, models, stats
+
+
+def _released_batch(db):
+    batch = models.Batch(batch_code="ST-B1", total_volume_ml=200.0)
+    db.add(batch)
+    db.commit()
+    return batch
+
+
+def test_counters_follow_creates_and_transitions(db):
+    db.add(models.Donor(first_name="A"))
+    db.add(models.Donor(first_name="B", status=models.DonorStatus.Approved))
+    db.commit()
+    batch = _released_batch(db)
+
+    dash = stats.get_dashboard_stats(db)
+    assert dash["donors"]["counts"]["Applied"] == 1
+    assert dash["donors"]["total"] == 2
+    assert dash["batches"]["counts"]["Created"] == 1
+    assert dash["batches"]["total_volume_ml"] == 200.0
+
+    rec = crud.start_pasteurisation(db, batch.id, operator_id="op1", device_id="dev1")
+    crud.complete_pasteurisation(db, batch.id, operator_id="op1", record_id=rec.id, log={})
+
+    counts = stats.get_dashboard_stats(db)["batches"]["counts"]
+    assert counts["Created"] == 0
+    assert counts["MicroTestPending"] == 1
+    assert stats.get_dashboard_stats(db)["batches"]["volume_ml"]["MicroTestPending"] == 200.0
+
+
+def test_counters_roll_back_with_the_change(db):
+    batch = _released_batch(db)
+    savepoint = db.begin_nested()
+    batch.status = models.BatchStatus.Quarantined
+    db.flush()
+    assert stats.get_dashboard_stats(db)["batches"]["counts"]["Quarantined"] == 1
+    savepoint.rollback()
+    counts = stats.get_dashboard_stats(db)["batches"]["counts"]
+    assert counts["Quarantined"] == 0
+    assert counts["Created"] == 1
+
+
+def test_rebuild_matches_incremental_counts(db):
+    _released_batch(db)
+    db.add(models.Bottle(barcode="ST-1", batch_id=db.query(models.Batch).first().id, volume_ml=50.0))
+    db.commit()
+    before = stats.get_dashboard_stats(db)
+    stats.rebuild_status_counts(db)
+    assert stats.get_dashboard_stats(db) == before
+
+
+def test_dashboard_read_is_a_single_statement(db, count_queries):
+    _released_batch(db)
+    with count_queries() as statements:
+        stats.get_dashboard_stats(db)
+    assert len(statements) == 1
+
+
+def test_counter_rows_are_updated_in_key_order(db):
+    from sqlalchemy import event
+
+    engine = db.get_bind().engine
+    deltas = stats.new_deltas()
+    stats.add_delta(deltas, "bottle", models.BottleStatus.Available, 1)
+    stats.add_delta(deltas, "batch", models.BatchStatus.Released, -1)
+    stats.add_delta(deltas, "batch", models.BatchStatus.Created, 1)
+    keys = []
+
+    def _record(conn, cursor, statement, parameters, context, executemany):
+        if statement.startswith("UPDATE status_counts"):
+            keys.append(tuple(p for p in parameters if isinstance(p, str)))
+
+    event.listen(engine, "before_cursor_execute", _record)
+    try:
+        stats.apply_status_deltas(db.connection(), deltas)
+    finally:
+        event.remove(engine, "before_cursor_execute", _record)
+    assert keys == [("batch", "Created"), ("batch", "Released"), ("bottle", "Available")]
@@ -0,0 +1,66 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from src.app import crud, models, schemas
+from src.app.database import Base, configure_sqlite_transactions
+
+
+def _donor(db, hospital_number="H1"):
+    donor = models.Donor(first_name="Seq", hospital_number=hospital_number)
+    db.add(donor)
+    db.commit()
+    return donor
+
+
+def _donation(donor_id, day=1):
+    return schemas.DonationCreate(donor_id=donor_id, donation_date=datetime(2024, 3, day, 9, 30), number_of_bottles=2)
+
+
+def test_ids_are_sequential_per_hospital_and_day(db):
+    donor = _donor(db)
+    ids = [crud.create_donation_record(db, _donation(donor.id), user_id="u1").donation_id for _ in range(3)]
+    assert ids == ["H1-20240301-001", "H1-20240301-002", "H1-20240301-003"]
+    assert crud.create_donation_record(db, _donation(donor.id, day=2)).donation_id == "H1-20240302-001"
+
+
+def test_counter_is_seeded_from_existing_ids(db):
+    donor = _donor(db)
+    db.add(models.DonationRecord(donation_id="H1-20240301-007", donor_id=donor.id,
+                                 donation_date=datetime(2024, 3, 1), number_of_bottles=1))
+    db.commit()
+    assert crud.create_donation_record(db, _donation(donor.id)).donation_id == "H1-20240301-008"
+
+
+def test_parallel_creates_never_duplicate_ids(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'seq.db'}", connect_args={"check_same_thread": False, "timeout": 60})
+    configure_sqlite_transactions(engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        donor_id = _donor(db).id
+
+    def create(_):
+        with Session() as db:
+            return crud.create_donation_record(db, _donation(donor_id)).donation_id
+
+    with ThreadPoolExecutor(max_workers=16) as pool:
+        ids = list(pool.map(create, range(300)))
+
+    assert len(set(ids)) == 300
+    assert sorted(ids)[-1] == "H1-20240301-300"
+    engine.dispose()
+
+
+def test_write_transaction_never_commits_the_callers_work(tmp_path):
+    engine = create_engine(f"sqlite:///{tmp_path / 'writer.db'}", connect_args={"check_same_thread": False})
+    configure_sqlite_transactions(engine)
+    Base.metadata.create_all(bind=engine)
+    Session = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+    with Session() as db:
+        db.add(models.Donor(first_name="Flushed", hospital_number="H1"))
+        db.flush()
+        crud._begin_write_transaction(db)
+        db.rollback()
+        assert db.query(models.Donor).count() == 0
+    engine.dispose()
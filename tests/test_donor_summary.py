@@ -0,0 +1,27 @@
+from src.app import crud, models, schemas
+
+
+def test_donor_page_projects_summary_columns_only(db, count_queries):
+    db.add(models.Donor(first_name="Ada", last_name="Lovelace", hospital_number="H1",
+                        comments="long free text", medical_history_notes="notes"))
+    db.commit()
+
+    with count_queries() as statements:
+        page = crud.get_donors_page(db)
+    assert len(statements) == 1
+    assert "comments" not in statements[0]
+    assert "medical_history_notes" not in statements[0]
+
+    item = page["items"][0]
+    assert set(item) == {c.key for c in crud.DONOR_SUMMARY_COLUMNS}
+    assert item["status"] == "Applied"
+    summary = schemas.DonorSummary.model_validate(item)
+    assert summary.first_name == "Ada"
+
+
+def test_full_record_still_available_per_donor(db):
+    donor = models.Donor(first_name="Ada", comments="long free text")
+    db.add(donor)
+    db.commit()
+    full = schemas.DonorRead.model_validate(crud.get_donor(db, donor.id))
+    assert full.comments == "long free text"
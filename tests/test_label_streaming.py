@@ -0,0 +1,67 @@
+from datetime import datetime, timezone
+from itertools import islice
+from src.app import api, models, streaming
+from src.app.labels import generate_batch_labels_zpl, iter_batch_labels_zpl
+from src.app.models import gen_uuid
+from src.app.printer import ZebraPrinterManager
+
+
+def test_chunks_end_on_label_boundaries():
+    chunks = list(streaming.text_chunks(iter_batch_labels_zpl("MB-1", 2000, "01/01/2026"), chunk_bytes=4096))
+    assert len(chunks) > 1
+    assert all(chunk.endswith(b"^XZ\n") for chunk in chunks)
+    assert b"".join(chunks).decode() == generate_batch_labels_zpl("MB-1", 2000, "01/01/2026")
+
+
+def test_first_chunk_of_a_huge_reprint_is_ready_immediately():
+    # Ten million labels would be ~2GB as one string; the generator only builds what is consumed
+    chunks = streaming.text_chunks(iter_batch_labels_zpl("MB-1", 10_000_000, "01/01/2026", stored_format=True))
+    first, second = islice(chunks, 2)
+    assert first.startswith(b"^XA\n^DF") and len(second) < 2 * streaming.CHUNK_BYTES
+
+
+def test_chunked_network_print_uses_one_connection(network_printer):
+    printer = network_printer
+    zpl = generate_batch_labels_zpl("MB-2", 3000, stored_format=True).encode()
+    result = ZebraPrinterManager.send_zpl_chunks(
+        streaming.text_chunks(iter_batch_labels_zpl("MB-2", 3000, stored_format=True), chunk_bytes=8192), printer.config()
+    )
+    assert result["success"]
+    assert printer.wait_for(len(zpl)) == zpl
+    assert printer.connections == 1
+
+
+def test_print_endpoint_streams_labels_without_writing(db, monkeypatch, network_printer):
+    batch = models.Batch(id=gen_uuid(), batch_code="PRN-1", number_of_bottles=3,
+                         batch_date=datetime(2026, 2, 3, tzinfo=timezone.utc))
+    db.add(batch)
+    db.commit()
+    printer = network_printer
+    monkeypatch.setattr(ZebraPrinterManager, "_current_printer", printer.config())
+
+    registered = db.query(models.BarcodeRegistry).count()
+    out = api.print_batch_labels(batch.id, db)
+    expected = generate_batch_labels_zpl("PRN-1", 3, "03/02/2026", stored_format=True).encode()
+    assert out["labels_printed"] == 3
+    assert printer.wait_for(len(expected)) == expected
+    codes = {r.code for r in db.query(models.BarcodeRegistry).filter(models.BarcodeRegistry.entity_type == "label")}
+    assert codes == {"PRN-1-1", "PRN-1-2", "PRN-1-3"}
+    assert db.query(models.BarcodeRegistry).count() == registered
+
+
+def test_zpl_download_is_streamed(db):
+    from fastapi.testclient import TestClient
+    from src.app.main import app
+
+    batch = models.Batch(id=gen_uuid(), batch_code="DL-1", number_of_bottles=2500)
+    db.add(batch)
+    db.commit()
+    app.dependency_overrides[api.get_db] = lambda: db
+    try:
+        with TestClient(app).stream("GET", f"/api/batches/{batch.id}/labels/zpl") as response:
+            assert response.status_code == 200
+            assert "content-length" not in response.headers
+            body = b"".join(response.iter_bytes())
+    finally:
+        app.dependency_overrides.clear()
+    assert body == generate_batch_labels_zpl("DL-1", 2500).encode()
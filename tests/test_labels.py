@@ -0,0 +1,122 @@
+import time
+import pytest
+from src.app.labels import (
+    bottle_format_name,
+    generate_batch_label_format_zpl,
+    generate_batch_label_recall_zpl,
+    generate_batch_labels_zpl,
+    get_label_template,
+    iter_batch_labels_zpl,
+    register_label_template,
+)
+
+
+def test_stored_format_downloads_the_layout_once():
+    zpl = generate_batch_labels_zpl("MB-001", 3, "01/01/2026", stored_format=True)
+    name = bottle_format_name("MB-001")
+    assert zpl.startswith(generate_batch_label_format_zpl("MB-001", "01/01/2026"))
+    assert zpl.count(f"^DF{name}") == 1
+    assert zpl.count(f"^XF{name}") == 3
+    assert zpl.count("^PW400") == 1
+    for i in range(1, 4):
+        assert f"^FN1^FDBottle {i}/3^FS^FN2^FDMB-001-{i}^FS" in zpl
+    assert zpl.endswith(f"^XA^ID{name}^FS^XZ\n")
+
+
+def test_each_batch_stores_its_format_under_its_own_name():
+    first, second = bottle_format_name("MB-001"), bottle_format_name("MB-002")
+    assert first != second
+    assert len(first.split(":")[1].split(".")[0]) <= 16
+    zpl = generate_batch_labels_zpl("MB-002", 2, "02/01/2026", stored_format=True)
+    assert first not in zpl and zpl.count(second) == 4
+
+
+def test_stored_format_without_date_only_sends_barcodes():
+    zpl = generate_batch_labels_zpl("MB-002", 2, stored_format=True)
+    assert "^FN1" not in zpl
+    assert zpl.count("^FN2^FDMB-002-") == 2
+
+
+def test_single_recall_matches_the_stored_format():
+    zpl = generate_batch_labels_zpl("MB-003", 3, "03/01/2026", stored_format=True)
+    recall = generate_batch_label_recall_zpl("MB-003", 2, 3, batch_date="03/01/2026")
+    assert recall == f"^XA^XF{bottle_format_name('MB-003')}^FS^FN1^FDBottle 2/3^FS^FN2^FDMB-003-2^FS^XZ\n"
+    assert recall in zpl
+    assert generate_batch_label_recall_zpl("MB-003", 2, 3) in generate_batch_labels_zpl("MB-003", 3, stored_format=True)
+
+
+def test_bottle_number_can_be_left_off_a_dated_label():
+    stored = generate_batch_label_format_zpl("MB-004", "04/01/2026", show_number=False)
+    assert "^FD04/01/2026^FS" in stored and "^FN1" not in stored
+    recall = generate_batch_label_recall_zpl("MB-004", 1, 2, batch_date="04/01/2026", show_number=False)
+    assert "^FN1" not in recall and "^FN2^FDMB-004-1^FS" in recall
+    inline = generate_batch_labels_zpl("MB-004", 2, "04/01/2026")
+    assert "Bottle 1/2" in inline
+    assert "Bottle" not in "".join(iter_batch_labels_zpl("MB-004", 2, "04/01/2026", show_number=False))
+
+
+def test_stored_format_sends_less_than_half_the_bytes():
+    for batch_date in ("01/01/2026", None):
+        inline = generate_batch_labels_zpl("MB-2026-001", 500, batch_date).encode()
+        stored = generate_batch_labels_zpl("MB-2026-001", 500, batch_date, stored_format=True).encode()
+        # Only the per-bottle fields are resent; the layout bytes are paid once
+        assert len(stored) * 2 < len(inline)
+
+
+def test_a_new_label_size_is_only_a_template():
+    register_label_template({
+        "name": "test_box", "version": 1, "width": 812, "height": 1218,
+        "fields": [
+            {"type": "text", "x": 40, "y": 40, "font": 60, "data": "{code}"},
+            {"type": "text", "x": 40, "y": 240, "font": 30, "data": "Box {box_number}/{number_of_boxes}", "when": "number_of_boxes"},
+            {"type": "qr", "x": 40, "y": 360, "data": "{code}"},
+        ],
+    })
+    box = get_label_template("test_box").render({"code": "DSP-9", "box_number": 1, "number_of_boxes": 2})
+    assert box.startswith("^XA\n^PW812\n^PH1218\n") and "^FDBox 1/2^FS" in box and "^FDQA,DSP-9^FS" in box
+    assert "^FDBox" not in get_label_template("test_box").render({"code": "DSP-9"})
+
+
+def test_templates_are_compiled_once_per_version():
+    first = get_label_template("bottle")
+    assert get_label_template("bottle") is first
+
+    register_label_template({
+        "name": "test_tube", "version": 1, "width": 200, "height": 100,
+        "fields": [{"type": "text", "x": 5, "y": 5, "font": 10, "data": "{code}"}],
+    })
+    v1 = get_label_template("test_tube")
+    assert v1.render({"code": "A"}) == "^XA\n^PW200\n^PH100\n^FO5,5\n^A0N,10,10\n^FDA^FS\n^XZ\n"
+    register_label_template({
+        "name": "test_tube", "version": 2, "width": 200, "height": 100,
+        "fields": [{"type": "code128", "x": 5, "y": 5, "data": "{code}"}],
+    })
+    v2 = get_label_template("test_tube")
+    assert v2 is not v1 and v2.version == 2 and "^BCN" in v2.render({"code": "A"})
+
+
+def _bottle_label_rows(n):
+    return [
+        {"batch_code": "MB-1", "batch_date": "01/01/2026", "show_number": True, "bottle_number": i, "number_of_bottles": n,
+         "bottle_code": f"MB-1-{i}"}
+        for i in range(1, n + 1)
+    ]
+
+
+def test_render_many_reuses_one_compiled_variant():
+    template = get_label_template("bottle")
+    template._variants.clear()
+    rows = _bottle_label_rows(10000)
+    zpl = template.render_many(rows)
+    assert zpl.count("^XZ") == 10000
+    assert len(template._variants) == 1
+    assert len(zpl) == sum(len(template.render(row)) for row in rows)
+
+
+@pytest.mark.benchmark
+def test_render_10k_labels_benchmark():
+    template = get_label_template("bottle")
+    rows = _bottle_label_rows(10000)
+    started = time.perf_counter()
+    template.render_many(rows)
+    assert time.perf_counter() - started < 0.5
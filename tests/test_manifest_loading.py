@@ -0,0 +1,46 @@
+from sqlalchemy import insert
+from src.app import crud, models
+from src.app.models import gen_uuid
+
+
+def _dispatch_with_bottles(db, count):
+    hospital = models.Hospital(name="NICU")
+    batch = models.Batch(batch_code="MAN-B1", status=models.BatchStatus.Released)
+    db.add_all([hospital, batch])
+    db.flush()
+    disp = models.Dispatch(dispatch_code="MAN-D1", hospital_id=hospital.id, shipper="Courier")
+    db.add(disp)
+    db.flush()
+    bottles = [
+        {"id": gen_uuid(), "barcode": f"MAN-B1-{i}", "batch_id": batch.id, "volume_ml": 50.0,
+         "status": models.BottleStatus.Available, "storage_location_id": f"InTransit:{disp.id}"}
+        for i in range(count)
+    ]
+    db.execute(insert(models.Bottle), bottles)
+    db.execute(insert(models.DispatchItem), [
+        {"id": gen_uuid(), "dispatch_id": disp.id, "bottle_id": b["id"], "barcode": b["barcode"],
+         "scanned_out": i % 2 == 0, "scanned_in": False}
+        for i, b in enumerate(bottles)
+    ])
+    db.commit()
+    return disp.id
+
+
+def test_manifest_lists_every_item(db):
+    dispatch_id = _dispatch_with_bottles(db, 3)
+    manifest = crud.get_dispatch_manifest(db, dispatch_id)
+    assert manifest["dispatch_code"] == "MAN-D1"
+    assert sorted(it["barcode"] for it in manifest["items"]) == ["MAN-B1-0", "MAN-B1-1", "MAN-B1-2"]
+    assert all(it["storage_location"] == f"InTransit:{dispatch_id}" for it in manifest["items"])
+
+
+def test_manifest_statement_count_is_bounded(db, count_queries):
+    dispatch_id = _dispatch_with_bottles(db, 2000)
+    db.expire_all()
+    with count_queries() as statements:
+        manifest = crud.get_dispatch_manifest(db, dispatch_id)
+        csv_data = crud.export_dispatch_manifest_csv(db, dispatch_id)
+    assert len(manifest["items"]) == 2000
+    assert csv_data.count(b"MAN-B1-") == 2000
+    # Dispatch + items/bottles for each of the two builds
+    assert len(statements) <= 4
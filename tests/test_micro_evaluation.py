@@ -0,0 +1,85 @@
+import pytest
+from sqlalchemy.exc import IntegrityError
+from src.app import crud, models, stats
+
+
+def _pending_batch(db, code, flags, bottles=2):
+    """A MicroTestPending batch with one post-pasteurisation sample per flag (None = no result yet)."""
+    batch = models.Batch(batch_code=code, status=models.BatchStatus.MicroTestPending)
+    db.add(batch)
+    db.flush()
+    for i in range(bottles):
+        db.add(models.Bottle(barcode=f"{code}-{i}", batch_id=batch.id, volume_ml=50.0, status=models.BottleStatus.Defrosting))
+    for i, flag in enumerate(flags):
+        sample = models.Sample(sample_barcode=f"{code}-S{i}", batch_id=batch.id, sample_type="post-pasteurisation")
+        db.add(sample)
+        db.flush()
+        if flag is not None:
+            db.add(models.MicroResult(sample_id=sample.id, organism="none", threshold_flag=flag))
+    db.commit()
+    return batch.id
+
+
+def test_negative_results_release_batch_and_bottles(db):
+    batch_id = _pending_batch(db, "MIC-1", [False, False])
+    b = crud.process_post_pasteurisation_results(db, batch_id, user_id="lab1")
+    assert b.status == models.BatchStatus.Released
+    bottles = db.query(models.Bottle).filter(models.Bottle.batch_id == batch_id).all()
+    assert {bt.status for bt in bottles} == {models.BottleStatus.Available}
+    assert stats.get_dashboard_stats(db)["bottles"]["counts"]["Available"] == 2
+
+
+def test_positive_result_fails_testing(db):
+    batch_id = _pending_batch(db, "MIC-2", [False, True])
+    b = crud.process_post_pasteurisation_results(db, batch_id)
+    assert b.status == models.BatchStatus.TestingFailed
+
+
+def test_missing_results_and_samples_are_rejected(db):
+    with pytest.raises(IntegrityError):
+        crud.process_post_pasteurisation_results(db, _pending_batch(db, "MIC-3", [False, None]))
+    with pytest.raises(IntegrityError):
+        crud.process_post_pasteurisation_results(db, _pending_batch(db, "MIC-4", [False]))
+
+
+def test_bulk_evaluation_closes_out_every_pending_batch(db, count_queries):
+    released = [_pending_batch(db, f"MIC-R{i}", [False, False]) for i in range(5)]
+    failed = _pending_batch(db, "MIC-F", [True, False])
+    waiting = _pending_batch(db, "MIC-W", [None, False])
+
+    results = {r["batch_id"]: r for r in crud.process_pending_post_pasteurisation_results(db, user_id="lab1")}
+    assert all(results[bid]["status"] == "Released" for bid in released)
+    assert results[failed]["status"] == "TestingFailed"
+    assert results[waiting]["processed"] is False
+    assert results[waiting]["status"] == "MicroTestPending"
+    assert stats.get_dashboard_stats(db)["bottles"]["counts"]["Available"] == 10
+
+    more = [_pending_batch(db, f"MIC-M{i}", [False, False]) for i in range(20)]
+    with count_queries() as statements:
+        results = crud.process_pending_post_pasteurisation_results(db)
+    assert sum(r["processed"] for r in results) == len(more)
+    # batches + one aggregate + bottle counts/update, independent of how many batches
+    assert len([s for s in statements if s.lstrip().upper().startswith("SELECT")]) <= 4
+
+
+def test_bulk_evaluation_rolls_back_a_batch_that_fails_mid_transition(db, monkeypatch):
+    from src.app import state_machines
+    from transitions.core import MachineError
+
+    ok = _pending_batch(db, "MIC-OK", [False, False])
+    broken = _pending_batch(db, "MIC-BRK", [False, False])
+    transition = state_machines.transition_batch_state
+
+    def failing_release(batch, name):
+        if name == "release" and batch.id == broken:
+            raise MachineError("release refused")
+        return transition(batch, name)
+
+    monkeypatch.setattr(state_machines, "transition_batch_state", failing_release)
+    results = {r["batch_id"]: r for r in crud.process_pending_post_pasteurisation_results(db, user_id="lab1")}
+
+    assert results[ok]["status"] == "Released"
+    assert results[broken]["processed"] is False
+    assert db.get(models.Batch, broken).status == models.BatchStatus.MicroTestPending
+    assert db.query(models.AuditEvent).filter(models.AuditEvent.entity_id == broken).count() == 0
+    assert stats.get_dashboard_stats(db)["batches"]["counts"]["Tested"] == 0
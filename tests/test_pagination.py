@@ -0,0 +1,87 @@
+import pytest
+from src.app import crud, models
+
+
+def _donors(db, n, hospital_number="H1", status=models.DonorStatus.Applied):
+    for i in range(n):
+        db.add(models.Donor(first_name=f"D{i}", hospital_number=hospital_number, status=status))
+    db.commit()
+
+
+def _walk(fetch, **kwargs):
+    seen, cursor, pages = [], None, 0
+    while True:
+        page = fetch(cursor=cursor, **kwargs)
+        seen.extend(page["items"])
+        pages += 1
+        cursor = page["next_cursor"]
+        if cursor is None:
+            return seen, pages
+
+
+def test_donor_pages_cover_every_row_once(db):
+    # server_default timestamps collide within a second, so the id tie-break matters
+    _donors(db, 23)
+    donors, pages = _walk(lambda **kw: crud.get_donors_page(db, limit=5, **kw))
+    assert pages == 5
+    assert len({d["id"] for d in donors}) == 23
+
+
+def test_rows_without_created_at_are_paged_last(db):
+    _donors(db, 4)
+    for i in range(3):
+        db.add(models.Donor(first_name=f"Legacy{i}", hospital_number="H1"))
+        db.flush()
+        db.query(models.Donor).filter(models.Donor.first_name == f"Legacy{i}").update({"created_at": None})
+    db.commit()
+
+    donors, _ = _walk(lambda **kw: crud.get_donors_page(db, limit=2, **kw))
+    assert len({d["id"] for d in donors}) == 7
+    assert [d["first_name"].startswith("Legacy") for d in donors] == [False] * 4 + [True] * 3
+
+
+def test_page_filters_apply_before_pagination(db):
+    _donors(db, 4, hospital_number="H1")
+    _donors(db, 3, hospital_number="H2", status=models.DonorStatus.Approved)
+
+    page = crud.get_donors_page(db, hospital_number="H2")
+    assert len(page["items"]) == 3
+    assert page["next_cursor"] is None
+
+    page = crud.get_donors_page(db, status="Approved", limit=2)
+    assert len(page["items"]) == 2
+    assert page["next_cursor"] is not None
+
+
+def test_donor_search_matches_substrings_beyond_the_first_page(db):
+    _donors(db, 60, hospital_number="H1")
+    db.add(models.Donor(first_name="Amina", last_name="O'Neill", hospital_number="RX-4471"))
+    db.add(models.Donor(first_name="Ben", last_name="Aminu", hospital_number="RX-9000"))
+    db.commit()
+
+    found, _ = _walk(lambda **kw: crud.get_donors_page(db, limit=50, name_contains="AMIN", **kw))
+    assert sorted(d["first_name"] for d in found) == ["Amina", "Ben"]
+    assert [d["first_name"] for d in crud.get_donors_page(db, name_contains="amina o'n")["items"]] == ["Amina"]
+    assert [d["first_name"] for d in crud.get_donors_page(db, hospital_number_contains="x-44")["items"]] == ["Amina"]
+    # LIKE wildcards in the term are matched literally
+    assert crud.get_donors_page(db, name_contains="%")["items"] == []
+
+
+def test_bottle_pages_use_inventory_projection(db):
+    batch = models.Batch(batch_code="PG-B1", status=models.BatchStatus.Released, hospital_number="H9")
+    db.add(batch)
+    db.flush()
+    for i in range(7):
+        db.add(models.Bottle(barcode=f"PG-{i}", batch_id=batch.id, volume_ml=30.0))
+    db.commit()
+
+    bottles, _ = _walk(lambda **kw: crud.get_bottles_page(db, limit=3, hospital_number="H9", **kw))
+    assert len({b["id"] for b in bottles}) == 7
+    assert all(b["batch_code"] == "PG-B1" and "cursor_id" not in b for b in bottles)
+
+
+def test_invalid_cursor_and_status_are_rejected(db):
+    with pytest.raises(ValueError):
+        crud.get_batches_page(db, cursor="not-a-cursor")
+    with pytest.raises(ValueError):
+        crud.get_dispatches_page(db, status="Lost")
@@ -0,0 +1,185 @@
+import socket
+import threading
+import time
+import pytest
+from src.app.printer import PrinterConnectionPool, ZebraPrinterManager
+
+
+def _label(n: int) -> bytes:
+    return f"^XA^XFR:MBBOTTLE.ZPL^FS^FN2^FDS-{n}^FS^XZ\n".encode()
+
+
+def _wait_for_connections(printer, count):
+    deadline = time.monotonic() + 5
+    while printer.connections < count and time.monotonic() < deadline:
+        time.sleep(0.005)
+
+
+def test_small_jobs_reuse_one_connection(network_printer):
+    pool = PrinterConnectionPool()
+    jobs = [_label(i) for i in range(50)]
+    for job in jobs:
+        pool.send(network_printer.config(), [job])
+    assert network_printer.wait_for(sum(map(len, jobs))) == b"".join(jobs)
+    assert network_printer.connections == 1
+    pool.close_all()
+
+
+def test_reconnects_after_the_printer_drops_the_connection(network_printer):
+    pool = PrinterConnectionPool()
+    config = network_printer.config()
+    pool.send(config, [_label(1)])
+    network_printer.wait_for(len(_label(1)))
+    network_printer.drop_connections()
+    time.sleep(0.05)
+
+    pool.send(config, [_label(2)])
+    assert network_printer.wait_for(2 * len(_label(1))) == _label(1) + _label(2)
+    assert network_printer.connections == 2
+    pool.close_all()
+
+
+def test_idle_connections_expire(network_printer):
+    pool = PrinterConnectionPool(idle_timeout=0)
+    for i in range(3):
+        pool.send(network_printer.config(), [_label(i)])
+        time.sleep(0.01)
+    _wait_for_connections(network_printer, 3)
+    assert network_printer.connections == 3
+
+
+def test_concurrent_jobs_never_share_a_connection(network_printer):
+    pool = PrinterConnectionPool(max_idle=4)
+    config = network_printer.config()
+    jobs = [[f"^XA^FDT{t}-J{j}-{'x' * 2000}^FS^XZ\n".encode()[i:i + 500] for i in range(0, 2020, 500)]
+            for t in range(8) for j in range(10)]
+
+    def worker(t):
+        for j in range(10):
+            pool.send(config, jobs[t * 10 + j])
+
+    threads = [threading.Thread(target=worker, args=(t,)) for t in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    network_printer.wait_for(sum(len(b"".join(job)) for job in jobs))
+    streams = [bytes(stream) for stream in network_printer.streams]
+    for job in jobs:
+        assert any(b"".join(job) in stream for stream in streams)
+    pool.close_all()
+
+
+def _send_all(pool, config, jobs):
+    for job in jobs:
+        pool.send(config, [job])
+
+
+def test_pool_opens_one_connection_where_fresh_sends_open_one_per_job(network_printer):
+    config = network_printer.config()
+    jobs = [_label(i) for i in range(200)]
+    _send_all(PrinterConnectionPool(max_idle=0), config, jobs)  # a new connection per job, like the old sender
+    pooled = PrinterConnectionPool()
+    _send_all(pooled, config, jobs)
+    pooled.close_all()
+
+    _wait_for_connections(network_printer, len(jobs) + 1)
+    network_printer.wait_for(2 * sum(map(len, jobs)))
+    # each connection is read on its own thread, so compare what arrived per connection
+    assert sorted(bytes(stream) for stream in network_printer.streams) == sorted(jobs + [b"".join(jobs)])
+    assert network_printer.connections == len(jobs) + 1
+
+
+@pytest.mark.benchmark
+def test_pooled_printing_benchmark(network_printer):
+    config = network_printer.config()
+    jobs = [_label(i) for i in range(200)]
+    started = time.perf_counter()
+    _send_all(PrinterConnectionPool(max_idle=0), config, jobs)
+    fresh_seconds = time.perf_counter() - started
+    pooled = PrinterConnectionPool()
+    started = time.perf_counter()
+    _send_all(pooled, config, jobs)
+    pooled_seconds = time.perf_counter() - started
+    pooled.close_all()
+    assert pooled_seconds < fresh_seconds
+
+
+def test_keepalive_notices_a_dead_printer_within_the_idle_timeout(network_printer):
+    pool = PrinterConnectionPool()
+    sock = pool._connect(network_printer.config())
+    try:
+        assert sock.getsockopt(socket.SOL_SOCKET, socket.SO_KEEPALIVE)
+        if hasattr(socket, "TCP_KEEPCNT"):
+            idle = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPIDLE)
+            interval = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPINTVL)
+            count = sock.getsockopt(socket.IPPROTO_TCP, socket.TCP_KEEPCNT)
+            assert idle + interval * count < pool.idle_timeout
+    finally:
+        sock.close()
+
+
+class _BrokenAfter:
+    """A pooled socket that accepts ``accepted`` bytes and then fails."""
+
+    def __init__(self, accepted):
+        self.accepted = accepted
+        self.closed = False
+
+    def settimeout(self, timeout):
+        pass
+
+    def send(self, data):
+        if not self.accepted:
+            raise ConnectionResetError("connection reset")
+        n = min(len(data), self.accepted)
+        self.accepted -= n
+        return n
+
+    def close(self):
+        self.closed = True
+
+
+def test_a_partly_sent_job_is_not_resent(network_printer, monkeypatch):
+    pool = PrinterConnectionPool()
+    config = network_printer.config()
+    monkeypatch.setattr(pool, "_acquire", lambda key: _BrokenAfter(accepted=10))
+    with pytest.raises(ConnectionResetError):
+        pool.send(config, [_label(1)])
+    assert network_printer.connections == 0
+
+    monkeypatch.setattr(pool, "_acquire", lambda key: _BrokenAfter(accepted=0))
+    pool.send(config, [_label(2)])
+    assert network_printer.wait_for(len(_label(2))) == _label(2)
+    pool.close_all()
+
+
+def test_app_shutdown_closes_pooled_connections(network_printer, monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.app import api, audit
+    from src.app.main import app
+
+    class _Writer:
+        def stop(self):
+            pass
+
+    monkeypatch.setattr(api, "backfill_read_models", lambda: None)
+    monkeypatch.setattr(audit, "start_background_writer", lambda engine: _Writer())
+    pool = PrinterConnectionPool()
+    monkeypatch.setattr(ZebraPrinterManager, "_pool", pool)
+    with TestClient(app):
+        pool.send(network_printer.config(), [_label(1)])
+        assert pool._idle
+    assert pool._idle == {}
+
+
+def test_manager_reports_failures_after_reconnect_fails(network_printer, monkeypatch):
+    config = network_printer.config()
+    monkeypatch.setattr(ZebraPrinterManager, "_pool", PrinterConnectionPool())
+    assert ZebraPrinterManager.send_zpl(_label(1).decode(), config)["success"]
+    network_printer.close()
+    time.sleep(0.05)
+    result = ZebraPrinterManager.send_zpl(_label(2).decode(), config)
+    assert not result["success"]
+    assert "refused" in result["message"].lower()
@@ -0,0 +1,80 @@
+import time
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from src.app import crud, models
+from src.app.models import gen_uuid
+
+
+def _recall_fixture(db, bottles=200, hospitals=10):
+    donors = [models.Donor(id=gen_uuid(), first_name=f"Donor{i}", hospital_number=f"H{i}") for i in range(2)]
+    db.add_all(donors)
+    donations = [
+        models.DonationRecord(id=gen_uuid(), donation_id=f"H{i}-1", donor_id=donors[i % 2].id,
+                              donation_date=datetime(2024, 1, 1, tzinfo=timezone.utc), number_of_bottles=1, volume_ml=500.0)
+        for i in range(3)
+    ]
+    batch = models.Batch(id=gen_uuid(), batch_code="REC-B1", status=models.BatchStatus.Released)
+    other = models.Batch(id=gen_uuid(), batch_code="REC-B2", status=models.BatchStatus.Released)
+    sites = [models.Hospital(id=gen_uuid(), name=f"Hospital {i}") for i in range(hospitals)]
+    db.add_all(donations + [batch, other] + sites)
+    db.flush()
+    db.add_all([models.BatchDonation(batch_id=batch.id, donation_record_id=d.id, position=i) for i, d in enumerate(donations)])
+    db.add(models.BatchDonation(batch_id=other.id, donation_record_id=donations[0].id, position=0))
+
+    dispatches = [{"id": gen_uuid(), "dispatch_code": f"REC-D{i}", "hospital_id": h.id, "status": models.DispatchStatus.Created}
+                  for i, h in enumerate(sites)]
+    db.execute(insert(models.Dispatch), dispatches)
+    bottle_rows = [
+        {"id": gen_uuid(), "barcode": f"REC-{i:03d}", "batch_id": batch.id, "volume_ml": 50.0,
+         "status": models.BottleStatus.Allocated, "patient_id": f"P{i % 25}"}
+        for i in range(bottles)
+    ]
+    db.execute(insert(models.Bottle), bottle_rows)
+    db.execute(insert(models.DispatchItem), [
+        {"id": gen_uuid(), "dispatch_id": dispatches[i % hospitals]["id"], "bottle_id": b["id"], "barcode": b["barcode"]}
+        for i, b in enumerate(bottle_rows)
+    ])
+    db.commit()
+    return batch.id, other.id, donors[0].id
+
+
+def test_batch_lineage_resolves_the_whole_graph(db, count_queries):
+    batch_id, _, _ = _recall_fixture(db)
+    with count_queries() as statements:
+        lineage = crud.get_batch_lineage(db, batch_id)
+
+    assert len(statements) == 3
+    assert [d["donation_id"] for d in lineage["donations"]] == ["H0-1", "H1-1", "H2-1"]
+    assert len(lineage["donors"]) == 2
+    assert len(lineage["bottles"]) == 200
+    assert all(b["dispatch"]["hospital_name"] for b in lineage["bottles"])
+    assert len(lineage["hospitals"]) == 10
+    assert sum(len(h["bottle_ids"]) for h in lineage["hospitals"]) == 200
+    assert len(lineage["patients"]) == 25
+
+
+@pytest.mark.benchmark
+def test_batch_lineage_benchmark(db):
+    batch_id, _, _ = _recall_fixture(db)
+    started = time.perf_counter()
+    crud.get_batch_lineage(db, batch_id)
+    assert time.perf_counter() - started < 1.0
+
+
+def test_donor_exposure_walks_to_every_batch_and_hospital(db, count_queries):
+    batch_id, other_id, donor_id = _recall_fixture(db)
+    with count_queries() as statements:
+        exposure = crud.get_donor_exposure(db, donor_id)
+    assert len(statements) == 3
+    assert exposure["donor"]["name"] == "Donor0"
+    assert len(exposure["donations"]) == 2
+    assert {b["id"] for b in exposure["batches"]} == {batch_id, other_id}
+    by_id = {b["id"]: b for b in exposure["batches"]}
+    assert len(by_id[batch_id]["bottles"]) == 200 and by_id[other_id]["bottles"] == []
+    assert len(exposure["hospitals"]) == 10
+
+
+def test_missing_entities_return_none(db):
+    assert crud.get_batch_lineage(db, "nope") is None
+    assert crud.get_donor_exposure(db, "nope") is None
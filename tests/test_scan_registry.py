@@ -0,0 +1,80 @@
+from src.app import crud, models, registry
+
+
+def _released_batch(db, code="SCN-B1", bottles=2):
+    batch = models.Batch(batch_code=code, status=models.BatchStatus.Released, number_of_bottles=bottles)
+    db.add(batch)
+    db.commit()
+    return batch, crud.create_bottles_for_batch(db, batch.id, count=bottles, volume_ml=40.0)
+
+
+def test_codes_are_registered_on_create(db):
+    batch, bottles = _released_batch(db)
+    sample = crud.create_micro_sample(db, batch.id, "post-pasteurisation")
+    hospital = models.Hospital(name="NICU")
+    db.add(hospital)
+    db.commit()
+    disp = crud.create_dispatch(db, [bottles[0].id], hospital.id, dispatch_code="SCN-D1")
+
+    (match,) = registry.resolve(db, bottles[0].barcode)
+    assert match["entity_type"] == "bottle" and match["entity_id"] == bottles[0].id
+    assert match["summary"]["status"] == "Available"
+    assert match["summary"]["storage_location"] == f"InTransit:{disp.id}"
+
+    assert registry.resolve(db, "SCN-B1")[0]["summary"]["batch_code"] == "SCN-B1"
+    assert registry.resolve(db, sample.sample_barcode)[0]["summary"]["batch_id"] == batch.id
+    assert registry.resolve(db, "SCN-D1")[0]["summary"]["hospital_id"] == hospital.id
+    assert registry.resolve(db, "nothing") == []
+
+
+def test_label_codes_are_registered_with_the_batch(db):
+    batch, _ = _released_batch(db, bottles=3)
+
+    (match,) = registry.resolve(db, "SCN-B1-2")
+    assert match["entity_type"] == "label"
+    assert match["entity_id"] == batch.id
+    assert match["summary"]["label_number"] == 2
+    assert registry.resolve(db, "SCN-B1-4") == []
+
+    batch.number_of_bottles = 4
+    db.commit()
+    assert registry.resolve(db, "SCN-B1-4")[0]["summary"]["label_number"] == 4
+    batch.batch_code = "SCN-B9"
+    db.commit()
+    assert registry.resolve(db, "SCN-B1-1") == []
+    assert registry.resolve(db, "SCN-B9-1")[0]["entity_id"] == batch.id
+
+
+def test_label_download_does_not_write(db, monkeypatch):
+    from fastapi.testclient import TestClient
+    from src.app import api
+    from src.app.main import app
+    batch, _ = _released_batch(db, bottles=3)
+    before = db.query(models.BarcodeRegistry).count()
+    app.dependency_overrides[api.get_db] = lambda: db
+    try:
+        writes = []
+        monkeypatch.setattr(db, "commit", lambda: writes.append("commit"))
+        response = TestClient(app).get(f"/api/batches/{batch.id}/labels/zpl")
+    finally:
+        app.dependency_overrides.clear()
+    assert response.status_code == 200
+    assert writes == [] and not db.new and not db.dirty
+    assert db.query(models.BarcodeRegistry).count() == before
+
+
+def test_resolve_is_one_statement(db, count_queries):
+    _, bottles = _released_batch(db, bottles=50)
+    with count_queries() as statements:
+        registry.resolve(db, bottles[25].barcode)
+    assert len(statements) == 1
+
+
+def test_rebuild_backfills_existing_rows(db):
+    batch, bottles = _released_batch(db)
+    db.query(models.BarcodeRegistry).delete()
+    db.commit()
+    registry.ensure_registry(db)
+    assert registry.resolve(db, bottles[1].barcode)[0]["entity_id"] == bottles[1].id
+    assert registry.resolve(db, f"{batch.batch_code}-2")[0]["entity_type"] == "label"
+    assert registry.resolve(db, batch.batch_code)[0]["entity_type"] == "batch"
@@ -0,0 +1,105 @@
+import json
+import subprocess
+import sys
+import tracemalloc
+import pytest
+from datetime import datetime, timezone
+from sqlalchemy import insert
+from src.app import crud, models, streaming
+from src.app.models import gen_uuid
+
+
+def _synthetic_rows(n):
+    created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+    for i in range(n):
+        yield {"id": f"row-{i}", "barcode": f"BC{i:07d}", "volume_ml": 50.0, "status": models.BottleStatus.Available, "created_at": created}
+
+
+def _peak_bytes(chunks):
+    tracemalloc.start()
+    total = 0
+    for chunk in chunks:
+        total += len(chunk)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return total, peak
+
+
+def test_encoders_produce_valid_output():
+    rows = list(_synthetic_rows(3))
+    lines = b"".join(streaming.ndjson_chunks(rows, chunk_bytes=10)).decode().splitlines()
+    assert [json.loads(line)["id"] for line in lines] == ["row-0", "row-1", "row-2"]
+    array = json.loads(b"".join(streaming.json_array_chunks(rows, chunk_bytes=10)))
+    assert array[2] == {"id": "row-2", "barcode": "BC0000002", "volume_ml": 50.0, "status": "Available",
+                        "created_at": "2024-01-01T00:00:00+00:00"}
+    assert json.loads(b"".join(streaming.json_array_chunks([]))) == []
+
+
+_RSS_SCRIPT = """
+import resource, sys
+from datetime import datetime, timezone
+from src.app import streaming
+n, fmt = int(sys.argv[1]), sys.argv[2]
+created = datetime(2024, 1, 1, tzinfo=timezone.utc)
+rows = ({"id": f"row-{i}", "barcode": f"BC{i:07d}", "volume_ml": 50.0, "created_at": created} for i in range(n))
+encode = streaming.ndjson_chunks if fmt == "ndjson" else streaming.json_array_chunks
+total = sum(len(chunk) for chunk in encode(rows))
+print(total, resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+"""
+
+
+def _stream_in_subprocess(n, fmt):
+    out = subprocess.run([sys.executable, "-c", _RSS_SCRIPT, str(n), fmt], capture_output=True, text=True, check=True)
+    total, max_rss_kb = map(int, out.stdout.split())
+    return total, max_rss_kb
+
+
+@pytest.mark.parametrize("fmt", ["ndjson", "json"])
+def test_memory_stays_flat_for_a_million_rows(fmt):
+    # Encoding in a fresh interpreter keeps the peak RSS free of whatever the test run allocated
+    _, baseline_kb = _stream_in_subprocess(1_000, fmt)
+    total, peak_kb = _stream_in_subprocess(1_000_000, fmt)
+    assert total > 90 * 1024 * 1024
+    assert peak_kb - baseline_kb < 8 * 1024
+
+
+def test_export_streams_table_rows_in_partitions(db):
+    batch = models.Batch(batch_code="EXP-B1", status=models.BatchStatus.Released)
+    db.add(batch)
+    db.flush()
+    db.execute(insert(models.Bottle), [
+        {"id": gen_uuid(), "barcode": f"EXP-{i}", "batch_id": batch.id, "volume_ml": 30.0, "status": models.BottleStatus.Available}
+        for i in range(5000)
+    ])
+    db.commit()
+
+    stmt = crud.get_export_query("bottles", status="Available")
+    total, peak = _peak_bytes(streaming.export_chunks(db, stmt, "ndjson", batch_size=500))
+    assert peak < 4 * 1024 * 1024
+
+    lines = b"".join(streaming.export_chunks(db, stmt, "ndjson")).decode().splitlines()
+    assert len(lines) == 5000
+    assert json.loads(lines[0])["status"] == "Available"
+
+
+def test_audit_log_exports_with_the_archive(db, audit_clock):
+    from datetime import timedelta
+    from src.app import audit
+    start = audit_clock.now
+    for i in range(3):
+        audit.record(db, "u1", "create", "bottle", f"exp-{i}")
+        audit_clock.advance(seconds=1)
+    db.commit()
+    audit_clock.advance(days=400)
+    audit.archive_events(db, start + timedelta(days=1))
+    audit.record(db, "u1", "create", "bottle", "exp-live")
+    db.commit()
+
+    live = b"".join(streaming.export_chunks(db, crud.get_export_query("audit"), "ndjson")).decode().splitlines()
+    assert [json.loads(line)["entity_id"] for line in live] == ["exp-live"]
+
+    stmt = crud.get_export_query("audit", include_archive=True)
+    rows = [json.loads(line) for line in b"".join(streaming.export_chunks(db, stmt, "ndjson")).decode().splitlines()]
+    assert [r["entity_id"] for r in rows] == ["exp-0", "exp-1", "exp-2", "exp-live"]
+    with pytest.raises(ValueError):
+        crud.get_export_query("audit", status="Available")
@@ -0,0 +1,78 @@
+import time
+import pytest
+from transitions.core import MachineError
+from src.app import state_machines as sm
+from src.app.models import Donor, Batch, DonorStatus, DonationStatus, BatchStatus, DonationRecord
+
+MACHINES = [
+    (sm.DonorStateMachine, sm.DONOR_TABLE, sm.DONOR_TRANSITIONS, DonorStatus, lambda s: Donor(status=s)),
+    (sm.DonationStateMachine, sm.DONATION_TABLE, sm.DONATION_TRANSITIONS, DonationStatus, lambda s: DonationRecord(status=s)),
+    (sm.BatchStateMachine, sm.BATCH_TABLE, sm.BATCH_TRANSITIONS, BatchStatus, lambda s: Batch(status=s)),
+]
+
+
+@pytest.mark.parametrize("machine_cls, table, transitions, status_enum, make", MACHINES)
+def test_table_matches_transitions_machine(machine_cls, table, transitions, status_enum, make):
+    triggers = {t for t, _, _ in transitions}
+    for state in status_enum:
+        for trigger in triggers:
+            machine = machine_cls(make(state))
+            try:
+                getattr(machine, trigger)()
+                expected = status_enum[machine.state]
+            except MachineError as e:
+                expected = str(e)
+            try:
+                got = sm.next_state(table, state, trigger)
+            except MachineError as e:
+                got = str(e)
+            assert got == expected, (state, trigger)
+
+
+def test_transition_functions_keep_error_semantics():
+    donor = Donor(status=DonorStatus.Approved)
+    with pytest.raises(MachineError):
+        sm.transition_donor_state(donor, "approve")
+    assert donor.status == DonorStatus.Approved
+    with pytest.raises(ValueError):
+        sm.transition_donor_state(donor, "no_such_trigger")
+
+    batch = Batch(status=BatchStatus.Tested)
+    assert sm.transition_batch_state(batch, "release")
+    assert batch.status == BatchStatus.Released
+
+
+def test_compiled_table_builds_no_machine(monkeypatch):
+    built = []
+
+    class CountingMachine(sm.Machine):
+        def __init__(self, *args, **kwargs):
+            built.append(1)
+            super().__init__(*args, **kwargs)
+
+    monkeypatch.setattr(sm, "Machine", CountingMachine)
+    for batch in [Batch(status=BatchStatus.Tested) for _ in range(300)]:
+        sm.transition_batch_state(batch, "release")
+    assert built == []
+
+    sm.BatchStateMachine(Batch(status=BatchStatus.Tested)).release()
+    assert built == [1]
+
+
+@pytest.mark.benchmark
+def test_compiled_table_microbenchmark():
+    n = 300
+
+    started = time.perf_counter()
+    for _ in range(n):
+        machine = sm.BatchStateMachine(Batch(status=BatchStatus.Tested))
+        machine.release()
+    per_machine = (time.perf_counter() - started) / n
+
+    batches = [Batch(status=BatchStatus.Tested) for _ in range(n)]
+    started = time.perf_counter()
+    for batch in batches:
+        sm.transition_batch_state(batch, "release")
+    per_table = (time.perf_counter() - started) / n
+
+    assert per_table * 10 < per_machine